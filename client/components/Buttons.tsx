@@ -55,7 +55,7 @@ import { ButtonsProps } from "@/types";
             <>
               <input
                 type="text"
-                placeholder="Search by title..."
+                placeholder="Search recipes..."
                 value={searchQuery}
                 onChange={(e) => setSearchQuery(e.target.value)}
                 className="px-3 py-2 rounded-md"
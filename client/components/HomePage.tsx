@@ -17,6 +17,8 @@ export default function HomePage() {
   const [isSearchMode, setIsSearchMode] = useState(false); // For search mode
   const [searchQuery, setSearchQuery] = useState(""); // Search query state
   const [activeTab, setActiveTab] = useState<string>("all"); // To track the selected tab
+  const [nextCursor, setNextCursor] = useState<string | null>(null); // Cursor for the next page of recipes
+  const [searchedRecipes, setSearchedRecipes] = useState<Recipe[]>([]); // Server-side search results
   const router = useRouter();
 
   useEffect(() => {
@@ -39,6 +41,7 @@ export default function HomePage() {
         const data: Recipe[] = await response.json();
         setAllRecipes(data);
         setFilteredRecipes(data); // Initially, show all recipes
+        setNextCursor(response.headers.get("X-Next-Cursor"));
       } catch (error) {
         setError("An unexpected error occurred while fetching all recipes.");
         console.error("Error fetching all recipes:", error);
@@ -74,6 +77,37 @@ export default function HomePage() {
     fetchCategories();
   }, []);
 
+  // Fetch the next page of recipes for the "All" tab
+  const handleLoadMore = async () => {
+    if (!nextCursor) return;
+
+    try {
+      const response = await fetch(
+        `http://127.0.0.1:5555/recipes?after=${encodeURIComponent(nextCursor)}`,
+        {
+          method: "GET",
+          headers: {
+            "Content-Type": "application/json",
+          },
+        }
+      );
+
+      if (!response.ok) {
+        const errorData = await response.json();
+        setError(errorData.error || "Failed to fetch recipes");
+        return;
+      }
+
+      const data: Recipe[] = await response.json();
+      setAllRecipes((prev) => [...prev, ...data]);
+      setFilteredRecipes((prev) => [...prev, ...data]);
+      setNextCursor(response.headers.get("X-Next-Cursor"));
+    } catch (error) {
+      setError("An unexpected error occurred while fetching more recipes.");
+      console.error("Error fetching more recipes:", error);
+    }
+  };
+
   const handleLogout = async () => {
     try {
       router.push("/login");
@@ -120,16 +154,56 @@ export default function HomePage() {
 
       const data: Recipe[] = await response.json();
       setFilteredRecipes(data);
+      if (categoryId === "all") {
+        setNextCursor(response.headers.get("X-Next-Cursor"));
+      }
     } catch (error) {
       setError("An unexpected error occurred while fetching recipes.");
       console.error("Error fetching recipes:", error);
     }
   };
 
-  // Filter recipes by title for search mode
-  const searchedRecipes = filteredRecipes.filter((recipe) =>
-    recipe.title?.toLowerCase().includes(searchQuery.toLowerCase())
-  );
+  // Search recipes on the server as the user types
+  useEffect(() => {
+    if (!isSearchMode || !searchQuery.trim()) {
+      setSearchedRecipes([]);
+      return;
+    }
+
+    const controller = new AbortController();
+    const timeout = setTimeout(async () => {
+      try {
+        const response = await fetch(
+          `http://127.0.0.1:5555/recipes/search?q=${encodeURIComponent(searchQuery)}`,
+          {
+            method: "GET",
+            headers: {
+              "Content-Type": "application/json",
+            },
+            signal: controller.signal,
+          }
+        );
+
+        if (!response.ok) {
+          const errorData = await response.json();
+          setError(errorData.error || "Failed to search recipes");
+          return;
+        }
+
+        const data: Recipe[] = await response.json();
+        setSearchedRecipes(data);
+      } catch (error) {
+        if ((error as Error).name === "AbortError") return;
+        setError("An unexpected error occurred while searching recipes.");
+        console.error("Error searching recipes:", error);
+      }
+    }, 250); // Debounce keystrokes
+
+    return () => {
+      clearTimeout(timeout);
+      controller.abort();
+    };
+  }, [isSearchMode, searchQuery]);
 
   const tabContent = [
     {
@@ -146,6 +220,14 @@ export default function HomePage() {
               recipe ? <RecipeCard key={index} recipe={recipe} /> : null
             )
           )}
+          {nextCursor && (
+            <button
+              onClick={handleLoadMore}
+              className="bg-purple-600 hover:bg-purple-700 text-white font-bold py-2 px-4 rounded"
+            >
+              Load More
+            </button>
+          )}
         </div>
       ),
     },
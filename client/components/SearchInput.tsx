@@ -13,7 +13,7 @@ import { SearchInputProps } from "@/types";
           <>
             <input
               type="text"
-              placeholder="Search by title..."
+              placeholder="Search recipes..."
               value={searchQuery}
               onChange={(e) => setSearchQuery(e.target.value)}
               className="px-3 py-2 rounded-md"
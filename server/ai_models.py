@@ -1,20 +1,205 @@
-import openai
+import hashlib
 import os
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+import openai
 from dotenv import load_dotenv
 
+from metrics import Sampled, registry
+
 load_dotenv()
 openai.api_key = os.getenv("OPENAI_API_KEY")
 
-def use_gpt_for_parsing(text):
-    try:
+SYSTEM_PROMPT = "Extract the recipe details from the following text."
+DEFAULT_MODEL = "gpt-3.5-turbo"
+
+
+class OpenAIBackend:
+    def __init__(self, model=DEFAULT_MODEL):
+        self.model = model
+
+    def complete(self, system_prompt, text):
         response = openai.ChatCompletion.create(
-            model="gpt-3.5-turbo",
+            model=self.model,
             messages=[
-                {"role": "system", "content": "Extract the recipe details from the following text."},
+                {"role": "system", "content": system_prompt},
                 {"role": "user", "content": text}
             ]
         )
         return response.choices[0].message['content'].strip()
+
+
+class StubBackend:
+    # Deterministic offline stand-in for the model: same input, same answer,
+    # in the layout parsers.parse_with_ai expects. Used for local development
+    # and for benchmarking the parse pipeline without network calls.
+    model = "local-stub"
+
+    QUANTITY_PATTERN = re.compile(r"^(\d|½|¼|¾|⅓|⅔|a |an |one |two |pinch)", re.IGNORECASE)
+
+    def complete(self, system_prompt, text):
+        lines = [line.strip() for line in text.split("\n") if line.strip()]
+        title = lines[0] if lines else "Untitled"
+        description = lines[1] if len(lines) > 1 else ""
+        ingredients = [line for line in lines[2:] if self.QUANTITY_PATTERN.match(line) and len(line) < 80]
+        instructions = [line for line in lines[2:] if line not in ingredients and len(line) >= 40]
+        return "\n".join(
+            [title, description, "Instructions:"] + instructions
+            + ["Ingredients:"] + ingredients
+            + ["Categories:"]
+        )
+
+
+class CompletionCache:
+    # Two-tier memo for model completions: a bounded in-memory LRU in front of
+    # a SQLite table with a TTL. Keys hash the model, the prompt and the
+    # whitespace-normalized input text.
+
+    def __init__(self, path=None, max_entries=256, ttl=30 * 24 * 3600):
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with self._connect() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS completions ("
+                    "key TEXT PRIMARY KEY, model TEXT NOT NULL, response TEXT NOT NULL, created REAL NOT NULL)"
+                )
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:  # commits on success, rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def make_key(model, prompt, text):
+        normalized = " ".join(text.split())
+        return hashlib.sha256("\0".join([model, prompt, normalized]).encode()).hexdigest()
+
+    def get(self, key):
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self.memory_hits += 1
+                return self._memory[key]
+
+        if self.path:
+            with self._connect() as conn:
+                row = conn.execute(
+                    "SELECT response FROM completions WHERE key = ? AND created > ?",
+                    (key, time.time() - self.ttl),
+                ).fetchone()
+            if row is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                self._remember(key, row[0])
+                return row[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, key, model, response):
+        self._remember(key, response)
+        if self.path:
+            with self._connect() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO completions (key, model, response, created) VALUES (?, ?, ?, ?)",
+                    (key, model, response, time.time()),
+                )
+
+    def _remember(self, key, response):
+        with self._lock:
+            self._memory[key] = response
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.max_entries:
+                self._memory.popitem(last=False)
+
+    def purge_expired(self):
+        if not self.path:
+            return 0
+        with self._connect() as conn:
+            return conn.execute(
+                "DELETE FROM completions WHERE created <= ?", (time.time() - self.ttl,)
+            ).rowcount
+
+    def stats(self):
+        with self._lock:
+            return {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "memory_entries": len(self._memory),
+            }
+
+
+def make_backend(name):
+    if name == "stub":
+        return StubBackend()
+    return OpenAIBackend(os.getenv("OPENAI_MODEL", DEFAULT_MODEL))
+
+
+# AI_BACKEND=stub swaps the model for the deterministic local stand-in.
+# AI_CACHE=0 disables memoization; AI_CACHE_PATH moves the SQLite tier.
+backend = make_backend(os.getenv("AI_BACKEND", "openai"))
+completion_cache = None
+if os.getenv("AI_CACHE", "1") != "0":
+    completion_cache = CompletionCache(
+        path=os.getenv("AI_CACHE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "ai_cache.sqlite")),
+        max_entries=int(os.getenv("AI_CACHE_SIZE", 256)),
+        ttl=int(os.getenv("AI_CACHE_TTL", 30 * 24 * 3600)),
+    )
+
+
+def _lookup_counts():
+    if completion_cache is None:
+        return {}
+    stats = completion_cache.stats()
+    return {("memory_hit",): stats["memory_hits"], ("disk_hit",): stats["disk_hits"], ("miss",): stats["misses"]}
+
+
+def _memory_entries():
+    return {(): completion_cache.stats()["memory_entries"]} if completion_cache is not None else {}
+
+
+registry.register(Sampled(
+    "smartchef_ai_cache_lookups_total", "AI completion cache lookups, by result (memory_hit, disk_hit, miss).",
+    _lookup_counts, labels=("result",),
+))
+registry.register(Sampled(
+    "smartchef_ai_cache_memory_entries", "AI completions held in memory.", _memory_entries, kind="gauge",
+))
+
+
+def use_gpt_for_parsing(text):
+    try:
+        key = None
+        if completion_cache is not None:
+            key = CompletionCache.make_key(backend.model, SYSTEM_PROMPT, text)
+            cached = completion_cache.get(key)
+            if cached is not None:
+                return cached
+
+        result = backend.complete(SYSTEM_PROMPT, text)
+
+        if key is not None and result:
+            completion_cache.set(key, backend.model, result)
+        return result
     except Exception as e:
         print(f"Error using GPT for parsing: {e}")
         return None
@@ -3,41 +3,56 @@
 # Standard library imports
 import os
 # Remote library imports
-from flask import request, jsonify, session
+from flask import request, jsonify, session, url_for
 from flask_restful import Resource
-from flask_bcrypt import Bcrypt
 # Local imports
-from config import app, db
-from models import User, Recipe, Ingredient, Category  # Import models
+from config import app, db, response_cache, password_hasher
+from models import User, Recipe, Ingredient, INGREDIENT_POSITION_GAP, Category, ParseJob, association_table, recipe_documents  # Import models
 from parsers import parse_recipe_from_url 
-# Initialize Bcrypt
-bcrypt = Bcrypt(app)
-
+from passwords import HasherBusyError
+from pagination import PaginationError, parse_page_args, keyset_page, encode_cursor
+from search import index_recipe, unindex_recipe, search_recipe_ids
+from jobs import ParseJobQueue, QueueFullError, fail_unfinished_jobs
+from ingest import ingest_urls, shared_parser_pool
+from serializers import render, render_encoded, join_json, loads_json, encode_recipe, encode_category, encode_parse_job
+from streaming import wants_stream, wants_ndjson, stream_query
+from bulk_import import import_ndjson, MAX_CHUNK_SIZE
+from categories import get_or_create_categories, insert_ignore_duplicates
+from recipe_diff import sync_ingredients, sync_categories
+from pantry import index_ingredients, rebuild_pantry_index, find_cookable_recipes, DEFAULT_RESULT_LIMIT, MAX_RESULT_LIMIT, MAX_PANTRY_ITEMS
+from maintenance import maintenance_cli
+from documents import refresh_documents, get_documents, get_document
+from similarity import queue_similar, queue_similar_holders, similar_recipe_ids, similar_refresher
+from quantities import clean_servings, scale_ingredients, SYSTEMS
+from shopping import build_shopping_list
 # Views go here!
 
 @app.route("/register", methods=["POST"])
 def register_user():
-    data = request.json
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "All fields are required"}), 400
     first_name = data.get("first_name")
     last_name = data.get("last_name")
     email = data.get("email")
     password = data.get("password")
 
-    if not all([first_name, last_name, email, password]):
+    # Anything but non-empty strings would fail in the query or the hasher
+    fields = [first_name, last_name, email, password]
+    if not all(isinstance(field, str) and field for field in fields):
         return jsonify({"error": "All fields are required"}), 400
 
     user_exists = User.query.filter_by(email=email).first() is not None
     if user_exists:
         return jsonify({"error": "User already exists"}), 409
 
-    new_user = User(
-        first_name=first_name,
-        last_name=last_name,
-        email=email,
-        password=password
-    )
-
     try:
+        new_user = User(
+            first_name=first_name,
+            last_name=last_name,
+            email=email,
+            password=password
+        )
         db.session.add(new_user)
         db.session.commit()
         return jsonify({
@@ -46,6 +61,9 @@ def register_user():
             "last_name": new_user.last_name,
             "email": new_user.email
         }), 201
+    except HasherBusyError:
+        db.session.rollback()
+        return jsonify({"error": "The server is busy. Try again later."}), 503, {"Retry-After": "1"}
     except Exception as e:
         db.session.rollback()
         print(f"Error: {e}")
@@ -53,17 +71,32 @@ def register_user():
 
 @app.route("/login", methods=["POST"])
 def login_user():
-    data = request.json
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Email and password are required"}), 400
     email = data.get("email")
     password = data.get("password")
 
-    user = User.query.filter_by(email=email).first()
+    if not isinstance(email, str) or not isinstance(password, str) or not email or not password:
+        return jsonify({"error": "Email and password are required"}), 400
 
-    if user is None:
-        return jsonify({"error": "Unauthorized"}), 401
+    user = User.query.filter_by(email=email).first()
 
-    if not user.verify_password(password):
-        return jsonify({"error": "Unauthorized"}), 401
+    try:
+        if user is None:
+            password_hasher.burn(password)  # Same timing as a wrong password
+            return jsonify({"error": "Unauthorized"}), 401
+
+        if not user.verify_password(password):
+            return jsonify({"error": "Unauthorized"}), 401
+
+        # Upgrade plain passwords and hashes made with an old work factor
+        if user.password_needs_rehash():
+            user.password = password
+            db.session.commit()
+    except HasherBusyError:
+        db.session.rollback()
+        return jsonify({"error": "The server is busy. Try again later."}), 503, {"Retry-After": "1"}
 
     session["user_id"] = user.id
 
@@ -80,6 +113,10 @@ def create_recipe():
     instructions = data.getlist("instructions")  # Expecting instructions to be a list
     categories = data.get("categories", "").split(",")  # Assuming categories are comma-separated
     ingredients = []
+    try:
+        servings = clean_servings(data.get("servings"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
 
     # Process ingredients from the form
     for key in request.form:
@@ -96,42 +133,37 @@ def create_recipe():
             title=title,
             description=description,
             instructions=instructions,
+            servings=servings,
         )
         db.session.add(new_recipe)
-        db.session.commit()
+        # Flush for the id; the recipe, its ingredients, categories and
+        # index rows are committed together below
+        db.session.flush()
 
-        # Process and add categories
-        for category_name in categories:
-            # Check if the category already exists in the database
-            category = Category.query.filter_by(name=category_name.strip()).first()
-            if not category:
-                # If the category does not exist, create a new one
-                category = Category(name=category_name.strip())
-                db.session.add(category)
-                db.session.commit()
-            # Add the category to the new recipe
-            new_recipe.categories.append(category)
+        # Process and add categories, creating the ones that don't exist yet
+        new_recipe.categories.extend(
+            get_or_create_categories([name.strip() for name in categories if name.strip()])
+        )
 
         # Process and add ingredients
-        for ingredient_data in ingredients:
+        for index, ingredient_data in enumerate(ingredients):
             ingredient = Ingredient(
                 name=ingredient_data["name"],
                 quantity=ingredient_data["quantity"],
+                position=index * INGREDIENT_POSITION_GAP,
                 recipe_id=new_recipe.id
             )
             db.session.add(ingredient)
 
-        # Final commit to save all changes
+        index_recipe(new_recipe)
+        index_ingredients(new_recipe.id)
+        refresh_documents([new_recipe.id])
+        queue_similar([new_recipe.id])
+
         db.session.commit()
+        response_cache.bump("recipes", "categories")
 
-        return jsonify({
-            "id": new_recipe.id,
-            "title": new_recipe.title,
-            "description": new_recipe.description,
-            "instructions": new_recipe.instructions,
-            "ingredients": [{"name": ing.name, "quantity": ing.quantity} for ing in new_recipe.ingredients],
-            "categories": [cat.name for cat in new_recipe.categories],
-        }), 201
+        return jsonify(encode_recipe(new_recipe)), 201
 
     except Exception as e:
         db.session.rollback()
@@ -139,49 +171,235 @@ def create_recipe():
         return jsonify({"error": "An error occurred while creating the recipe."}), 500
 
 
+@app.route("/recipes/bulk", methods=["POST"])
+def bulk_import_recipes():
+    try:
+        chunk_size = int(request.args.get("chunk_size", app.config["BULK_IMPORT_CHUNK_SIZE"]))
+    except ValueError:
+        return jsonify({"error": "chunk_size must be an integer."}), 400
+    if chunk_size < 1:
+        return jsonify({"error": "chunk_size must be positive."}), 400
+    chunk_size = min(chunk_size, MAX_CHUNK_SIZE)
+
+    # Read the body line by line instead of buffering the whole upload
+    summary = import_ndjson(request.stream, chunk_size)
+    if summary["created"]:
+        response_cache.bump("recipes", "categories")
+
+    return jsonify(summary), 200
+
 @app.route("/recipes", methods=["GET"])
+@response_cache.cached(["recipes", "categories"])
 def get_recipes():
     category_id = request.args.get("category_id")  # Fetch category_id from query parameters
+    stream = wants_stream(request)
+    if not stream:
+        try:
+            limit, after_id = parse_page_args(request.args)
+        except PaginationError as e:
+            return jsonify({"error": str(e)}), 400
+
     try:
+        # Page through ids only; the recipes themselves come pre-encoded
+        # from recipe_documents
+        query = db.session.query(Recipe.id)
         if category_id:
             # Filter recipes by the provided category_id
-            recipes = Recipe.query.join(Recipe.categories).filter(Category.id == category_id).all()
-        else:
-            # Fetch all recipes if no category is provided
-            recipes = Recipe.query.all()
-
-        return jsonify([
-            {
-                "id": recipe.id,
-                "title": recipe.title,
-                "description": recipe.description,
-                "instructions": recipe.instructions,
-                "ingredients": [{"name": ing.name, "quantity": ing.quantity} for ing in recipe.ingredients],
-                "categories": [cat.name for cat in recipe.categories]
-            } for recipe in recipes
-        ]), 200
+            query = query.join(association_table, association_table.c.recipe_id == Recipe.id).filter(
+                association_table.c.category_id == category_id
+            )
+
+        if stream:
+            # Whole catalog, written out document by document as it is read
+            query = query.add_columns(recipe_documents.c.body).outerjoin(
+                recipe_documents, recipe_documents.c.recipe_id == Recipe.id
+            )
+            return stream_query(
+                query.order_by(Recipe.id),
+                lambda row: row.body if row.body is not None else get_document(row.id),
+                ndjson=wants_ndjson(request),
+                encoded=True,
+            )
+
+        rows, next_cursor = keyset_page(query, Recipe.id, limit, after_id)
+
+        response = render_encoded(join_json(get_documents(row.id for row in rows)))
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
+            next_args = request.args.to_dict()
+            next_args.update(limit=limit, after=next_cursor)
+            response.headers["Link"] = f'<{url_for("get_recipes", _external=True, **next_args)}>; rel="next"'
+        return response, 200
     except Exception as e:
         print(f"Error: {e}")
         return jsonify({"error": "An error occurred while retrieving recipes."}), 500
 
+@app.route("/recipes/search", methods=["GET"])
+def search_recipes():
+    q = request.args.get("q", "").strip()
+    if not q:
+        return jsonify({"error": "Search query is required."}), 400
+    try:
+        limit, offset = parse_page_args(request.args, kind="offset")
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+    offset = offset or 0
+
+    try:
+        recipe_ids, has_more = search_recipe_ids(q, limit, offset)
+
+        # Documents come back in ranking order
+        response = render_encoded(join_json(get_documents(recipe_ids)))
+        if has_more:
+            next_cursor = encode_cursor(offset + limit, kind="offset")
+            response.headers["X-Next-Cursor"] = next_cursor
+            response.headers["Link"] = f'<{url_for("search_recipes", _external=True, q=q, limit=limit, after=next_cursor)}>; rel="next"'
+        return response, 200
+    except Exception as e:
+        print(f"Error: {e}")
+        return jsonify({"error": "An error occurred while searching recipes."}), 500
+
+@app.route("/what-can-i-cook", methods=["POST"])
+def what_can_i_cook():
+    data = request.json or {}
+    pantry = data.get("ingredients")
+
+    if not isinstance(pantry, list) or not pantry:
+        return jsonify({"error": "A list of ingredients is required."}), 400
+    if len(pantry) > MAX_PANTRY_ITEMS:
+        return jsonify({"error": f"At most {MAX_PANTRY_ITEMS} ingredients per request."}), 400
+
+    try:
+        limit = min(int(data.get("limit", DEFAULT_RESULT_LIMIT)), MAX_RESULT_LIMIT)
+        min_coverage = float(data.get("min_coverage", 0))
+    except (TypeError, ValueError):
+        return jsonify({"error": "limit and min_coverage must be numbers."}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be at least 1."}), 400
+
+    try:
+        return render(find_cookable_recipes([str(item) for item in pantry], limit, min_coverage))
+    except Exception as e:
+        print(f"Error: {e}")
+        return jsonify({"error": "An error occurred while matching recipes."}), 500
+
+@app.route("/shopping-list", methods=["POST"])
+def shopping_list():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "A JSON object is required."}), 400
+
+    recipe_ids = data.get("recipe_ids")
+    if not isinstance(recipe_ids, list) or not recipe_ids or not all(
+        isinstance(recipe_id, int) and not isinstance(recipe_id, bool) for recipe_id in recipe_ids
+    ):
+        return jsonify({"error": "recipe_ids must be a non-empty list of recipe ids."}), 400
+    max_recipes = app.config["SHOPPING_LIST_MAX_RECIPES"]
+    if len(recipe_ids) > max_recipes:
+        return jsonify({"error": f"At most {max_recipes} recipes per shopping list."}), 400
+    units = data.get("units") or None
+    if units is not None and units not in SYSTEMS:
+        return jsonify({"error": f"units must be one of: {', '.join(SYSTEMS)}."}), 400
+
+    try:
+        return render(build_shopping_list(recipe_ids, units))
+    except Exception as e:
+        print(f"Error: {e}")
+        return jsonify({"error": "An error occurred while building the shopping list."}), 500
+
 @app.route("/recipes/<int:recipe_id>", methods=["GET"])
+@response_cache.cached(lambda recipe_id: ["categories", f"recipe:{recipe_id}"])
 def get_recipe(recipe_id):
+    # ?servings=N scales the ingredients and ?units=metric|us converts them
     try:
-        recipe = Recipe.query.get(recipe_id)
-        if not recipe:
+        servings = clean_servings(request.args.get("servings"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    units = request.args.get("units") or None
+    if units is not None and units not in SYSTEMS:
+        return jsonify({"error": f"units must be one of: {', '.join(SYSTEMS)}."}), 400
+
+    try:
+        document = get_document(recipe_id)
+        if document is None:
             
             return jsonify({"error": "Recipe not found."}), 404
 
-        return recipe.to_dict()
+        if servings is None and units is None:
+            return render_encoded(document)
+
+        recipe = loads_json(document)
+        factor = 1.0
+        if servings is not None:
+            if not recipe.get("servings"):
+                return jsonify({"error": "This recipe has no servings to scale from."}), 400
+            factor = servings / recipe["servings"]
+            recipe["servings"] = servings
+        recipe["ingredients"] = scale_ingredients(recipe["ingredients"], factor, units)
+        return render(recipe)
     except Exception as e:
         print(f"Error: {e}")
         return jsonify({"error": "An error occurred while retrieving the recipe."}), 500
 
+# Not response-cached: the lists change in the background after writes,
+# where no request bumps a cache version
+@app.route("/recipes/<int:recipe_id>/similar", methods=["GET"])
+def get_similar_recipes(recipe_id):
+    top_k = app.config["SIMILAR_TOP_K"]
+    try:
+        limit = int(request.args.get("limit", top_k))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer."}), 400
+    if limit < 1:
+        return jsonify({"error": "limit must be positive."}), 400
+
+    try:
+        if db.session.get(Recipe, recipe_id) is None:
+            return jsonify({"error": "Recipe not found."}), 404
+
+        # Precomputed by the background refresher, so this is one indexed lookup
+        return render_encoded(join_json(get_documents(similar_recipe_ids(recipe_id, min(limit, top_k)))))
+    except Exception as e:
+        print(f"Error: {e}")
+        return jsonify({"error": "An error occurred while finding similar recipes."}), 500
+
+def apply_recipe_update(recipe, changes):
+    # Apply the fields present in `changes`, writing only rows that differ,
+    # and commit everything in one transaction
+    searchable_changed = False
+    for field in ("title", "description", "instructions"):
+        if field in changes and getattr(recipe, field) != changes[field]:
+            setattr(recipe, field, changes[field])
+            searchable_changed = True
+
+    servings_changed = "servings" in changes and recipe.servings != changes["servings"]
+    if servings_changed:
+        recipe.servings = changes["servings"]
+
+    ingredients_changed = False
+    categories_changed = False
+    if "ingredients" in changes:
+        ingredients_changed = sync_ingredients(recipe, changes["ingredients"])
+    if "categories" in changes:
+        categories_changed = sync_categories(recipe, changes["categories"])
+
+    if searchable_changed or ingredients_changed:
+        index_recipe(recipe)
+    if ingredients_changed:
+        index_ingredients(recipe.id)
+    if searchable_changed or ingredients_changed or categories_changed or servings_changed:
+        refresh_documents([recipe.id])
+    if ingredients_changed or categories_changed:
+        queue_similar([recipe.id])
+
+    db.session.commit()
+    response_cache.bump("recipes", "categories", f"recipe:{recipe.id}")
+
 @app.route("/recipes/<int:recipe_id>", methods=["PUT"])
 def update_recipe(recipe_id):
     title = request.form.get("title")
     description = request.form.get("description")
-    instructions = request.form.get("instructions").split("\n")  # Assuming instructions are sent as a multiline string
+    instructions = request.form.get("instructions", "").split("\n")  # Assuming instructions are sent as a multiline string
     categories = request.form.get("categories", "").split(",")  # Assuming categories are comma-separated
     ingredients = []
 
@@ -193,52 +411,82 @@ def update_recipe(recipe_id):
             quantity = request.form.get(f"ingredients[{index}][quantity]")
             ingredients.append({"name": name, "quantity": quantity})
 
+    # Blank title/description/instructions/servings leave the stored values alone
+    changes = {"ingredients": ingredients, "categories": categories}
+    try:
+        servings = clean_servings(request.form.get("servings"))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if servings is not None:
+        changes["servings"] = servings
+    if title:
+        changes["title"] = title
+    if description:
+        changes["description"] = description
+    if any(step.strip() for step in instructions):
+        changes["instructions"] = instructions
+
     try:
         recipe = Recipe.query.get(recipe_id)
         if not recipe:
             return jsonify({"error": "Recipe not found."}), 404
 
-        # Update the basic fields
-        if title:
-            recipe.title = title
-        if description:
-            recipe.description = description
-        if instructions:
-            recipe.instructions = instructions
-
-        # Update ingredients
-        Ingredient.query.filter_by(recipe_id=recipe_id).delete()  # Clear existing ingredients
-        for ingredient_data in ingredients:
-            ingredient = Ingredient(
-                name=ingredient_data["name"],
-                quantity=ingredient_data["quantity"],
-                recipe_id=recipe_id
-            )
-            db.session.add(ingredient)
+        apply_recipe_update(recipe, changes)
 
-        # Update categories
-        recipe.categories.clear()  # Clear existing categories
-        for category_name in categories:
-            category_name = category_name.strip()
-            if category_name:  # Ensure it's not an empty string
-                category = Category.query.filter_by(name=category_name).first()
-                if not category:
-                    category = Category(name=category_name)
-                    db.session.add(category)
-                    db.session.commit()
-                recipe.categories.append(category)
-
-        # Commit the changes
-        db.session.commit()
+        return jsonify(encode_recipe(recipe)), 200
 
-        return jsonify({
-            "id": recipe.id,
-            "title": recipe.title,
-            "description": recipe.description,
-            "instructions": recipe.instructions,
-            "ingredients": [{"name": ing.name, "quantity": ing.quantity} for ing in recipe.ingredients],
-            "categories": [cat.name for cat in recipe.categories]
-        }), 200
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error: {e}")
+        return jsonify({"error": "An error occurred while updating the recipe."}), 500
+
+@app.route("/recipes/<int:recipe_id>", methods=["PATCH"])
+def patch_recipe(recipe_id):
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "A JSON object is required."}), 400
+
+    # Only the keys sent are changed
+    changes = {}
+    if "title" in data:
+        if not isinstance(data["title"], str) or not data["title"].strip():
+            return jsonify({"error": "title cannot be empty."}), 400
+        changes["title"] = data["title"]
+    if "description" in data:
+        changes["description"] = data["description"]
+    if "instructions" in data:
+        instructions = data["instructions"]
+        if isinstance(instructions, str):
+            instructions = instructions.split("\n")
+        if not isinstance(instructions, list):
+            return jsonify({"error": "instructions must be a list or a string."}), 400
+        changes["instructions"] = instructions
+    if "servings" in data:
+        try:
+            changes["servings"] = clean_servings(data["servings"])  # null clears it
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+    if "ingredients" in data:
+        ingredients = data["ingredients"]
+        if not isinstance(ingredients, list) or not all(isinstance(ing, dict) and ing.get("name") for ing in ingredients):
+            return jsonify({"error": "Each ingredient needs a name."}), 400
+        changes["ingredients"] = [{"name": ing["name"], "quantity": ing.get("quantity") or ""} for ing in ingredients]
+    if "categories" in data:
+        categories = data["categories"]
+        if isinstance(categories, str):
+            categories = categories.split(",")
+        if not isinstance(categories, list):
+            return jsonify({"error": "categories must be a list or a string."}), 400
+        changes["categories"] = [str(name) for name in categories]
+
+    try:
+        recipe = Recipe.query.get(recipe_id)
+        if not recipe:
+            return jsonify({"error": "Recipe not found."}), 404
+
+        apply_recipe_update(recipe, changes)
+
+        return jsonify(encode_recipe(recipe)), 200
 
     except Exception as e:
         db.session.rollback()
@@ -252,8 +500,12 @@ def delete_recipe(recipe_id):
         if not recipe:
             return jsonify({"error": "Recipe not found."}), 404
 
+        # Pantry postings, documents and similar lists go with ON DELETE CASCADE
+        queue_similar_holders(recipe_id)
         db.session.delete(recipe)
+        unindex_recipe(recipe_id)
         db.session.commit()
+        response_cache.bump("recipes", f"recipe:{recipe_id}")
 
         return jsonify({"message": "Recipe deleted successfully."}), 200
 
@@ -270,14 +522,14 @@ def create_category():
     if not name:
         return jsonify({"error": "Category name is required."}), 400
 
-    category_exists = Category.query.filter_by(name=name).first()
-    if category_exists:
-        return jsonify({"error": "Category already exists."}), 409
-
     try:
-        new_category = Category(name=name)
-        db.session.add(new_category)
+        # Insert and duplicate check in one statement, so concurrent requests can't both create it
+        if not insert_ignore_duplicates([{"name": name}]):
+            db.session.rollback()
+            return jsonify({"error": "Category already exists."}), 409
+        new_category = Category.query.filter_by(name=name).one()
         db.session.commit()
+        response_cache.bump("categories")
 
         return jsonify({
             "id": new_category.id,
@@ -290,15 +542,11 @@ def create_category():
         return jsonify({"error": "An error occurred while creating the category."}), 500
 
 @app.route("/categories", methods=["GET"])
+@response_cache.cached(["categories"])
 def get_categories():
     try:
         categories = Category.query.all()
-        return jsonify([
-            {
-                "id": category.id,
-                "name": category.name
-            } for category in categories
-        ]), 200
+        return render([encode_category(category) for category in categories])
     except Exception as e:
         print(f"Error: {e}")
         return jsonify({"error": "An error occurred while retrieving categories."}), 500
@@ -310,8 +558,15 @@ def delete_category(category_id):
         if not category:
             return jsonify({"error": "Category not found."}), 404
 
+        # The recipes in this category list it in their documents
+        recipe_ids = db.session.execute(
+            db.select(association_table.c.recipe_id).where(association_table.c.category_id == category_id)
+        ).scalars().all()
         db.session.delete(category)
+        refresh_documents(recipe_ids)
+        queue_similar(recipe_ids)
         db.session.commit()
+        response_cache.bump("categories")
 
         return jsonify({"message": "Category deleted successfully."}), 200
     except Exception as e:
@@ -319,6 +574,56 @@ def delete_category(category_id):
         print(f"Error: {e}")
         return jsonify({"error": "An error occurred while deleting the category."}), 500
 
+def save_parsed_recipe(recipe_data):
+    # Create and save the new recipe in the database
+    new_recipe = Recipe(
+        title=recipe_data["title"],
+        description=recipe_data["description"],
+        instructions=recipe_data["instructions"],
+        servings=recipe_data.get("servings"),
+    )
+    db.session.add(new_recipe)
+    # Flush for the id; everything is committed in one transaction below
+    db.session.flush()
+
+    # Add ingredients to the recipe
+    for index, ingredient_data in enumerate(recipe_data["ingredients"]):
+        ingredient = Ingredient(
+            name=ingredient_data["name"],
+            quantity=ingredient_data.get("quantity", ""),
+            position=index * INGREDIENT_POSITION_GAP,
+            recipe_id=new_recipe.id
+        )
+        db.session.add(ingredient)
+
+    # Process categories
+    new_recipe.categories.extend(get_or_create_categories(recipe_data.get("categories", [])))
+
+    index_recipe(new_recipe)
+    index_ingredients(new_recipe.id)
+    refresh_documents([new_recipe.id])
+    queue_similar([new_recipe.id])
+
+    db.session.commit()
+    response_cache.bump("recipes", "categories")
+    return new_recipe
+
+def run_parse_job(url):
+    # Worker-side body of an async /parse-recipe request
+    recipe_data = parse_recipe_from_url(url)
+    if not recipe_data:
+        raise ValueError("Failed to parse recipe from URL")
+    return save_parsed_recipe(recipe_data).id
+
+similar_refresher.init_app(app)
+
+parse_queue = ParseJobQueue(
+    app,
+    run_parse_job,
+    max_workers=app.config["PARSE_WORKERS"],
+    max_queued=app.config["PARSE_QUEUE_DEPTH"],
+)
+
 @app.route("/parse-recipe", methods=["POST"])
 def parse_recipe():
     data = request.json
@@ -327,6 +632,20 @@ def parse_recipe():
     if not url:
         return jsonify({"error": "URL is required"}), 400
 
+    # Clients opt into a background job with {"async": true} or Prefer: respond-async
+    if data.get("async") or "respond-async" in request.headers.get("Prefer", ""):
+        try:
+            job = parse_queue.enqueue(url)
+        except QueueFullError:
+            return jsonify({"error": "Too many recipes are being parsed. Try again later."}), 503, {"Retry-After": "5"}
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error: {e}")
+            return jsonify({"error": "An error occurred while queueing the recipe"}), 500
+
+        status_url = url_for("get_parse_job", job_id=job.id)
+        return jsonify({"job_id": job.id, "status": job.status, "status_url": status_url}), 202, {"Location": status_url}
+
     # Use the parser to extract recipe data from the URL
     recipe_data = parse_recipe_from_url(url)
 
@@ -334,59 +653,70 @@ def parse_recipe():
         return jsonify({"error": "Failed to parse recipe from URL"}), 500
 
     try:
-        # Create and save the new recipe in the database
-        new_recipe = Recipe(
-            title=recipe_data["title"],
-            description=recipe_data["description"],
-            instructions=recipe_data["instructions"]
-        )
-        db.session.add(new_recipe)
-        db.session.commit()
+        new_recipe = save_parsed_recipe(recipe_data)
 
-        # Add ingredients to the recipe
-        for ingredient_data in recipe_data["ingredients"]:
-            ingredient = Ingredient(
-                name=ingredient_data["name"],
-                quantity=ingredient_data.get("quantity", ""),
-                recipe_id=new_recipe.id
-            )
-            db.session.add(ingredient)
+        # Return the created recipe
+        return jsonify(encode_recipe(new_recipe)), 201
 
-        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error: {e}")
+        return jsonify({"error": "An error occurred while saving the recipe"}), 500
 
-        # Process categories
-        categories = []  # List of categories to add to the recipe
-        for category_name in recipe_data.get("categories", []):
-            category = Category.query.filter_by(name=category_name).first()
-            if not category:
-                category = Category(name=category_name)
-                db.session.add(category)
-            categories.append(category)
+@app.route("/parse-recipes", methods=["POST"])
+def parse_recipes():
+    data = request.json or {}
+    urls = data.get("urls")
 
-        for category in categories:
-            if category not in new_recipe.categories:
-                new_recipe.categories.append(category)
+    if not isinstance(urls, list) or not urls or not all(isinstance(url, str) and url for url in urls):
+        return jsonify({"error": "A list of URLs is required"}), 400
+    if len(urls) > app.config["INGEST_MAX_URLS"]:
+        return jsonify({"error": f"At most {app.config['INGEST_MAX_URLS']} URLs can be parsed per request"}), 400
 
-        db.session.commit()
+    try:
+        results = ingest_urls(
+            urls,
+            fetch_workers=app.config["INGEST_FETCH_WORKERS"],
+            per_host=app.config["INGEST_PER_HOST"],
+            parse_workers=app.config["INGEST_PARSE_WORKERS"],
+            batch_size=app.config["INGEST_BATCH_SIZE"],
+            parser_pool=shared_parser_pool(app.config["INGEST_PARSE_WORKERS"]),
+        )
+    except Exception as e:
+        db.session.rollback()
+        print(f"Error: {e}")
+        return jsonify({"error": "An error occurred while parsing the recipes"}), 500
 
-        # Return the created recipe
-        return jsonify({
-            "id": new_recipe.id,
-            "title": new_recipe.title,
-            "description": new_recipe.description,
-            "instructions": new_recipe.instructions,
-            "ingredients": [{"name": ing.name, "quantity": ing.quantity} for ing in new_recipe.ingredients],
-            "categories": [cat.name for cat in new_recipe.categories]
-        }), 201
+    if any(result["status"] == "created" for result in results):
+        response_cache.bump("recipes", "categories")
+    return jsonify(results), 200
+
+@app.route("/parse-jobs/<job_id>", methods=["GET"])
+def get_parse_job(job_id):
+    try:
+        job = db.session.get(ParseJob, job_id)
+        if not job:
+            return jsonify({"error": "Job not found."}), 404
 
+        recipe = Recipe.query.get(job.recipe_id) if job.recipe_id else None
+        return render(encode_parse_job(job, recipe))
     except Exception as e:
-        db.session.rollback()
         print(f"Error: {e}")
-        return jsonify({"error": "An error occurred while saving the recipe"}), 500
+        return jsonify({"error": "An error occurred while retrieving the job."}), 500
 
 @app.route('/')
 def index():
     return '<h1>Project Server</h1>'
 
+@app.cli.command("rebuild-pantry-index")
+def rebuild_pantry_index_command():
+    count = rebuild_pantry_index()
+    print(f"Indexed {count} ingredient tokens.")
+
+app.cli.add_command(maintenance_cli)
+
 if __name__ == '__main__':
+    # Jobs the last run (or the reloader's last child) left behind
+    with app.app_context():
+        fail_unfinished_jobs()
     app.run(port=5555, debug=True)
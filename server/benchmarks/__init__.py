@@ -0,0 +1,2 @@
+# Benchmarks for the server. Run each module from the server directory,
+# e.g. `python -m benchmarks.parsing`.
@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+
+import argparse
+import itertools
+import json
+import random
+import sys
+import time
+
+from faker import Faker
+
+# Ordered roughly by how often they show up in recipes; the generator
+# draws from them with a Zipf-like skew, so salt and onion are everywhere
+# and saffron is rare, as in real catalogs
+INGREDIENTS = (
+    "salt", "olive oil", "garlic", "onion", "butter", "black pepper", "sugar", "all-purpose flour", "eggs", "water",
+    "milk", "lemon juice", "vegetable oil", "brown sugar", "baking powder", "vanilla extract", "tomatoes", "parsley",
+    "chicken breast", "carrots", "celery", "baking soda", "honey", "soy sauce", "parmesan cheese", "cinnamon",
+    "ground beef", "heavy cream", "red pepper flakes", "cumin", "paprika", "oregano", "basil", "thyme", "ginger",
+    "chicken broth", "cheddar cheese", "sour cream", "lime juice", "cilantro", "green onions", "bell pepper",
+    "potatoes", "rice", "spinach", "mushrooms", "zucchini", "cream cheese", "mozzarella", "bacon", "shallots",
+    "red onion", "jalapeno", "chili powder", "dijon mustard", "mayonnaise", "worcestershire sauce", "rosemary",
+    "bay leaves", "nutmeg", "cornstarch", "white wine", "red wine vinegar", "balsamic vinegar", "apple cider vinegar",
+    "maple syrup", "coconut milk", "chickpeas", "black beans", "kidney beans", "lentils", "quinoa", "pasta",
+    "spaghetti", "bread crumbs", "yogurt", "feta cheese", "avocado", "cucumber", "lettuce", "cabbage", "broccoli",
+    "cauliflower", "sweet potatoes", "pumpkin", "corn", "peas", "green beans", "asparagus", "eggplant", "kale",
+    "salmon", "shrimp", "cod", "tuna", "pork chops", "sausage", "ham", "lamb", "turkey", "tofu", "tempeh",
+    "almonds", "walnuts", "pecans", "peanut butter", "sesame oil", "sesame seeds", "fish sauce", "curry powder",
+    "turmeric", "coriander", "cardamom", "cloves", "star anise", "fennel", "leeks", "capers", "olives",
+    "sun-dried tomatoes", "pine nuts", "chocolate chips", "cocoa powder", "raisins", "cranberries", "blueberries",
+    "strawberries", "bananas", "apples", "pears", "peaches", "mango", "pineapple", "oranges", "coconut", "saffron",
+)
+UNITS = ("", "cup", "cups", "tbsp", "tsp", "g", "ml", "oz", "lb", "cloves", "pinch", "can", "slices")
+AMOUNTS = ("1", "2", "3", "4", "1/2", "1/4", "3/4", "1 1/2", "2 1/2", "100", "200", "250", "500")
+CATEGORIES = (
+    "Dinner", "Quick", "Vegetarian", "Lunch", "Healthy", "Dessert", "Breakfast", "Italian", "Chicken", "Soup",
+    "Baking", "Vegan", "Mexican", "Salad", "Pasta", "Asian", "Gluten-Free", "Side Dish", "Seafood", "Snack",
+    "Indian", "Slow Cooker", "Beef", "Grilling", "Holiday", "Comfort Food", "Mediterranean", "Drinks", "Thai",
+    "Low Carb", "Kid Friendly", "Pork", "Brunch", "Appetizer", "French", "Japanese", "Middle Eastern", "Sauce",
+    "Bread", "Spicy",
+)
+DISHES = ("Soup", "Stew", "Salad", "Pasta", "Curry", "Casserole", "Tacos", "Pie", "Cake", "Bread", "Stir-Fry",
+          "Risotto", "Bowl", "Skillet", "Bake", "Muffins", "Cookies", "Pancakes", "Sandwich", "Roast")
+STYLES = ("Easy", "Classic", "Spicy", "Creamy", "Quick", "Roasted", "Grilled", "One-Pot", "Crispy", "Rustic",
+          "Homemade", "Lemon", "Garlic", "Smoky", "Sheet-Pan", "Slow-Cooker", "Weeknight", "Healthy")
+SENTENCE_POOL = 4000
+
+
+def zipf_weights(count, exponent=1.1):
+    return list(itertools.accumulate(1 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+class CatalogGenerator:
+    # Fast synthetic recipes. Faker fills pools of text up front and the
+    # per-recipe work is only random choices, so a million recipes take
+    # seconds to generate rather than hours.
+
+    def __init__(self, seed=7):
+        self.rng = random.Random(seed)
+        fake = Faker()
+        fake.seed_instance(seed)
+        self.sentences = [fake.sentence(nb_words=12) for _ in range(SENTENCE_POOL)]
+        self.descriptions = [fake.paragraph(nb_sentences=2) for _ in range(SENTENCE_POOL // 4)]
+        self.names = [fake.first_name() for _ in range(200)]
+        self.ingredient_weights = zipf_weights(len(INGREDIENTS))
+        self.category_weights = zipf_weights(len(CATEGORIES), exponent=0.9)
+
+    def recipe(self):
+        rng = self.rng
+        count = max(3, min(25, int(rng.gauss(9, 3))))
+        names = set()
+        while len(names) < count:
+            names.update(rng.choices(INGREDIENTS, cum_weights=self.ingredient_weights, k=count - len(names)))
+        categories = set()
+        wanted = rng.choice((1, 1, 2, 2, 2, 3, 3, 4))
+        while len(categories) < wanted:
+            categories.update(rng.choices(CATEGORIES, cum_weights=self.category_weights, k=wanted - len(categories)))
+        names = sorted(names)  # Sets iterate in hash order; keep runs reproducible
+        rng.shuffle(names)
+        title = f"{rng.choice(STYLES)} {rng.choice(names).title()} {rng.choice(DISHES)}"
+        if rng.random() < 0.3:
+            title = f"{rng.choice(self.names)}'s {title}"
+        return {
+            "title": title,
+            "description": rng.choice(self.descriptions),
+            "instructions": rng.sample(self.sentences, max(2, min(15, int(rng.gauss(6, 2))))),
+            "servings": rng.choice((2, 4, 4, 4, 6, 6, 8, 12)),
+            "ingredients": [
+                {"name": name, "quantity": f"{rng.choice(AMOUNTS)} {rng.choice(UNITS)}".strip()}
+                for name in names
+            ],
+            "categories": sorted(categories),
+        }
+
+    def recipes(self, count):
+        for _ in range(count):
+            yield self.recipe()
+
+
+def populate(count, batch_size=2000, seed=7, progress=None):
+    # Load `count` generated recipes into the app's database through the
+    # bulk import path (one executemany per table per batch). Needs an app
+    # context. Returns the number of recipes inserted.
+    from bulk_import import insert_recipe_batch
+    from config import db, response_cache
+
+    generator = CatalogGenerator(seed)
+    inserted = 0
+    batch = []
+    for recipe in generator.recipes(count):
+        batch.append(recipe)
+        if len(batch) >= batch_size:
+            insert_recipe_batch(batch)
+            db.session.commit()
+            inserted += len(batch)
+            batch = []
+            if progress:
+                progress(inserted)
+    if batch:
+        insert_recipe_batch(batch)
+        db.session.commit()
+        inserted += len(batch)
+    response_cache.bump("recipes", "categories")
+    return inserted
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic recipe catalog.")
+    parser.add_argument("--recipes", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--ndjson", metavar="FILE", help="Write NDJSON for POST /recipes/bulk ('-' for stdout) instead of loading the database")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.ndjson:
+        out = sys.stdout if args.ndjson == "-" else open(args.ndjson, "w")
+        try:
+            for recipe in CatalogGenerator(args.seed).recipes(args.recipes):
+                out.write(json.dumps(recipe) + "\n")
+        finally:
+            if out is not sys.stdout:
+                out.close()
+        print(f"Wrote {args.recipes} recipes in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+        return
+
+    # Loads whatever DATABASE_URL points at; use a scratch database
+    from config import app
+    with app.app_context():
+        inserted = populate(
+            args.recipes, args.batch_size, args.seed,
+            progress=lambda n: print(f"  {n} recipes ({n / (time.perf_counter() - started):.0f}/s)", file=sys.stderr),
+        )
+    print(f"Inserted {inserted} recipes in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
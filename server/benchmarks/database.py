@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+
+from sqlalchemy import Column, ForeignKey, Integer, MetaData, String, Table, Text, create_engine, func, insert, select
+from sqlalchemy.exc import OperationalError
+
+from config import app
+from database import apply_sqlite_pragmas, engine_options, engine_profile, sqlite_pragmas
+
+# Stand-ins for the recipes and ingredients tables, under their own names so
+# the benchmark can be pointed at a scratch server database without touching
+# application data
+metadata = MetaData()
+recipes = Table(
+    "bench_recipes", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("title", String(255), nullable=False),
+    Column("description", Text),
+)
+ingredients = Table(
+    "bench_ingredients", metadata,
+    Column("id", Integer, primary_key=True),
+    Column("recipe_id", Integer, ForeignKey("bench_recipes.id", ondelete="CASCADE"), nullable=False, index=True),
+    Column("name", String(255), nullable=False),
+    Column("quantity", String(100), nullable=False),
+)
+
+
+def make_engine(url, tuned):
+    # tuned: the profile from database.py with the app's settings;
+    # otherwise SQLAlchemy's defaults, as the app ran before profiles
+    if not tuned:
+        return create_engine(url)
+    config = dict(app.config, SQLALCHEMY_DATABASE_URI=url)
+    engine = create_engine(url, **engine_options(config))
+    apply_sqlite_pragmas(engine, sqlite_pragmas(config))
+    return engine
+
+
+def write_recipe(conn, rng):
+    recipe_id = conn.execute(
+        insert(recipes).values(title=f"Recipe {rng.random():.6f}", description="x" * 200)
+    ).inserted_primary_key[0]
+    conn.execute(insert(ingredients), [
+        {"recipe_id": recipe_id, "name": f"ingredient {i}", "quantity": "1 cup"} for i in range(5)
+    ])
+
+
+def seed(engine, count):
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    rng = random.Random(0)
+    with engine.begin() as conn:
+        for _ in range(count):
+            write_recipe(conn, rng)
+
+
+def run(engine, threads, seconds, write_ratio):
+    # Each thread loops over reads (one recipe with its ingredients) and
+    # writes (one recipe plus five ingredients in a transaction)
+    with engine.connect() as conn:
+        max_id = conn.execute(select(func.max(recipes.c.id))).scalar()
+    stop = time.perf_counter() + seconds
+    lock = threading.Lock()
+    totals = {"reads": 0, "writes": 0, "errors": 0, "latencies": []}
+
+    def worker(index):
+        rng = random.Random(index)
+        counts = {"reads": 0, "writes": 0, "errors": 0}
+        latencies = []
+        while time.perf_counter() < stop:
+            kind = "writes" if rng.random() < write_ratio else "reads"
+            started = time.perf_counter()
+            try:
+                if kind == "writes":
+                    with engine.begin() as conn:
+                        write_recipe(conn, rng)
+                else:
+                    with engine.connect() as conn:
+                        recipe_id = rng.randint(1, max_id)
+                        conn.execute(select(recipes).where(recipes.c.id == recipe_id)).first()
+                        conn.execute(select(ingredients).where(ingredients.c.recipe_id == recipe_id)).all()
+            except OperationalError:
+                counts["errors"] += 1  # "database is locked" and friends
+                continue
+            counts[kind] += 1
+            latencies.append(time.perf_counter() - started)
+        with lock:
+            for key, value in counts.items():
+                totals[key] += value
+            totals["latencies"].extend(latencies)
+
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+
+    latencies = sorted(totals["latencies"]) or [0]
+    return {
+        "reads/s": totals["reads"] / seconds,
+        "writes/s": totals["writes"] / seconds,
+        "errors": totals["errors"],
+        "p50 ms": latencies[len(latencies) // 2] * 1000,
+        "p99 ms": latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent read/write throughput with and without the database engine profile.")
+    parser.add_argument("--url", help="Scratch database URL (default: a temporary SQLite file). bench_* tables are dropped and recreated.")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="Fraction of operations that are writes")
+    parser.add_argument("--seed-recipes", type=int, default=1000)
+    args = parser.parse_args()
+
+    scratch = None
+    url = args.url
+    if url is None:
+        scratch = tempfile.mkdtemp()
+        url = f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+
+    columns = ("reads/s", "writes/s", "errors", "p50 ms", "p99 ms")
+    print(f"{engine_profile(url)} profile, {args.threads} threads, {args.write_ratio:.0%} writes, {args.seconds:g}s per run")
+    print(f"{'engine':<10}" + "".join(f"{column:>12}" for column in columns))
+    try:
+        for name, tuned in (("default", False), ("profile", True)):
+            if scratch:
+                # Start each run from a fresh file so the journal mode of
+                # one run doesn't carry over to the next
+                for filename in os.listdir(scratch):
+                    os.remove(os.path.join(scratch, filename))
+            engine = make_engine(url, tuned)
+            seed(engine, args.seed_recipes)
+            result = run(engine, args.threads, args.seconds, args.write_ratio)
+            print(f"{name:<10}" + "".join(f"{result[column]:>12.1f}" for column in columns))
+            if not scratch:
+                metadata.drop_all(engine)
+            engine.dispose()
+    finally:
+        if scratch:
+            shutil.rmtree(scratch)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+
+import argparse
+import http.server
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+BASELINE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines")
+
+# Recipe pages for /parse-recipe: half carry schema.org JSON-LD, the other
+# half are plain HTML that goes to the (stub) model
+JSONLD_PAGE = """<html><head><title>{title}</title><script type="application/ld+json">{data}</script></head>
+<body><header><nav>Home Recipes About</nav></header><h1>{title}</h1><p>{description}</p></body></html>"""
+PLAIN_PAGE = """<html><head><title>{title}</title><meta name="description" content="{description}"></head>
+<body><nav>Home Recipes About</nav><article><h1>{title}</h1><p>{description}</p>
+<h2>Ingredients</h2><p>{ingredients}</p><h2>Method</h2><p>{instructions}</p></article></body></html>"""
+
+
+class StubSite:
+    # Local recipe site on a random port, so /parse-recipe can be measured
+    # without the network
+
+    def __init__(self, generator):
+        self.generator = generator
+        self.lock = threading.Lock()
+        site = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = site.page(self.path).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.base_url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def page(self, path):
+        with self.lock:
+            recipe = self.generator.recipe()
+        lines = [f"{ingredient['quantity']} {ingredient['name']}".strip() for ingredient in recipe["ingredients"]]
+        if path.startswith("/jsonld/"):
+            data = {
+                "@context": "https://schema.org", "@type": "Recipe", "name": recipe["title"],
+                "description": recipe["description"], "recipeIngredient": lines,
+                "recipeInstructions": [{"@type": "HowToStep", "text": step} for step in recipe["instructions"]],
+                "recipeCategory": recipe["categories"],
+            }
+            return JSONLD_PAGE.format(title=recipe["title"], description=recipe["description"], data=json.dumps(data))
+        return PLAIN_PAGE.format(
+            title=recipe["title"], description=recipe["description"],
+            ingredients="<br>".join(lines), instructions="<br>".join(recipe["instructions"]),
+        )
+
+    def close(self):
+        self.server.shutdown()
+
+
+class QueryCounter:
+    # SQL statements per request, counted on the thread that runs it
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+        self.local = threading.local()
+        event.listen(engine, "before_cursor_execute", self._count)
+
+    def _count(self, *args):
+        self.local.count = getattr(self.local, "count", 0) + 1
+
+    def reset(self):
+        self.local.count = 0
+
+    def value(self):
+        return getattr(self.local, "count", 0)
+
+
+def form_for(recipe):
+    form = {
+        "title": recipe["title"],
+        "description": recipe["description"],
+        "instructions": "\n".join(recipe["instructions"]),
+        "categories": ",".join(recipe["categories"]),
+        "servings": recipe["servings"],
+    }
+    for index, ingredient in enumerate(recipe["ingredients"]):
+        form[f"ingredients[{index}][name]"] = ingredient["name"]
+        form[f"ingredients[{index}][quantity]"] = ingredient["quantity"]
+    return form
+
+
+def build_scenarios(state):
+    # name -> (expected status, function(client, rng) -> response)
+    generator = state["generator"]
+
+    def list_recipes(client, rng):
+        return client.get("/recipes?limit=50")
+
+    def list_next_page(client, rng):
+        return client.get(f"/recipes?limit=50&after={state['cursor'](rng.randint(1, state['max_id']))}")
+
+    def filtered_list(client, rng):
+        return client.get(f"/recipes?limit=50&category_id={rng.choice(state['category_ids'])}")
+
+    def recipe_detail(client, rng):
+        return client.get(f"/recipes/{rng.randint(1, state['max_id'])}")
+
+    def scaled(client, rng):
+        return client.get(f"/recipes/{rng.randint(1, state['max_id'])}?servings={rng.randint(1, 12)}&units={rng.choice(['metric', 'us'])}")
+
+    def similar(client, rng):
+        return client.get(f"/recipes/{rng.randint(1, state['max_id'])}/similar")
+
+    def search(client, rng):
+        return client.get(f"/recipes/search?q={rng.choice(['garlic', 'chicken soup', 'lemon', 'spicy curry', 'pasta'])}")
+
+    def what_can_i_cook(client, rng):
+        return client.post("/what-can-i-cook", json={"ingredients": rng.sample(state["pantry"], 8)})
+
+    def shopping_list(client, rng):
+        recipe_ids = [rng.randint(1, state["max_id"]) for _ in range(30)]
+        return client.post("/shopping-list", json={"recipe_ids": recipe_ids, "units": "metric"})
+
+    def categories(client, rng):
+        return client.get("/categories")
+
+    def create(client, rng):
+        response = client.post("/recipes", data=form_for(generator.recipe()))
+        if response.status_code == 201:
+            state["created"].append(response.get_json()["id"])
+        return response
+
+    def update(client, rng):
+        return client.put(f"/recipes/{rng.randint(1, state['max_id'])}", data=form_for(generator.recipe()))
+
+    def patch(client, rng):
+        return client.patch(f"/recipes/{rng.randint(1, state['max_id'])}", json={"description": generator.recipe()["description"]})
+
+    def delete(client, rng):
+        # Deletes the recipes made by the create run
+        try:
+            recipe_id = state["created"].pop()
+        except IndexError:
+            return None
+        return client.delete(f"/recipes/{recipe_id}")
+
+    def parse_jsonld(client, rng):
+        return client.post("/parse-recipe", json={"url": f"{state['site']}/jsonld/{rng.random()}"})
+
+    def parse_with_model(client, rng):
+        return client.post("/parse-recipe", json={"url": f"{state['site']}/plain/{rng.random()}"})
+
+    return {
+        "GET /recipes": (200, list_recipes),
+        "GET /recipes (page N)": (200, list_next_page),
+        "GET /recipes?category_id": (200, filtered_list),
+        "GET /recipes/<id>": (200, recipe_detail),
+        "GET /recipes/<id>?servings": (200, scaled),
+        "GET /recipes/<id>/similar": (200, similar),
+        "GET /recipes/search": (200, search),
+        "POST /what-can-i-cook": (200, what_can_i_cook),
+        "POST /shopping-list": (200, shopping_list),
+        "GET /categories": (200, categories),
+        "POST /recipes": (201, create),
+        "PUT /recipes/<id>": (200, update),
+        "PATCH /recipes/<id>": (200, patch),
+        "DELETE /recipes/<id>": (200, delete),
+        "POST /parse-recipe (JSON-LD)": (201, parse_jsonld),
+        "POST /parse-recipe (model)": (201, parse_with_model),
+    }
+
+
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run_scenario(app, counter, expected, scenario, requests, threads, seed, warmup):
+    latencies = []
+    queries = []
+    errors = [0]
+    lock = threading.Lock()
+    per_thread = max(1, requests // threads)
+
+    def worker(index):
+        rng = random.Random(seed * 1000 + index)
+        client = app.test_client()
+        mine, counts, failed = [], [], 0
+        for _ in range(warmup):
+            scenario(client, rng)  # Fill caches and the connection pool first
+        for _ in range(per_thread):
+            counter.reset()
+            started = time.perf_counter()
+            response = scenario(client, rng)
+            elapsed = time.perf_counter() - started
+            if response is None:
+                continue
+            if response.status_code != expected:
+                failed += 1
+            mine.append(elapsed)
+            counts.append(counter.value())
+        with lock:
+            latencies.extend(mine)
+            queries.extend(counts)
+            errors[0] += failed
+
+    started = time.perf_counter()
+    workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    wall = time.perf_counter() - started
+
+    latencies.sort()
+    if not latencies:
+        return None
+    return {
+        "requests": len(latencies),
+        "req/s": len(latencies) / wall,
+        "p50 ms": percentile(latencies, 0.50) * 1000,
+        "p95 ms": percentile(latencies, 0.95) * 1000,
+        "p99 ms": percentile(latencies, 0.99) * 1000,
+        "queries": sum(queries) / len(queries),
+        "errors": errors[0],
+    }
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    # Slower p95 beyond the tolerance (and by more than min_delta_ms, so
+    # jitter on millisecond routes isn't flagged), more queries per request
+    # or new errors count as regressions; routes missing from the baseline
+    # are skipped
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        slower = result["p95 ms"] - before["p95 ms"]
+        if result["p95 ms"] > before["p95 ms"] * (1 + tolerance) and slower > min_delta_ms:
+            regressions.append(f"{name}: p95 {before['p95 ms']:.1f} -> {result['p95 ms']:.1f} ms")
+        if result["queries"] > before["queries"] + 0.5:
+            regressions.append(f"{name}: queries/request {before['queries']:.1f} -> {result['queries']:.1f}")
+        if result["errors"] > before["errors"]:
+            regressions.append(f"{name}: errors {before['errors']} -> {result['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load every API route against a synthetic catalog and report latency, throughput and query counts.")
+    parser.add_argument("--recipes", type=int, default=10000, help="Catalog size to generate")
+    parser.add_argument("--requests", type=int, default=200, help="Requests per route")
+    parser.add_argument("--threads", type=int, default=1, help="Concurrent clients per route")
+    parser.add_argument("--warmup", type=int, default=10, help="Unmeasured requests per client before each route")
+    parser.add_argument("--only", nargs="+", metavar="ROUTE", help="Run only routes whose name contains one of these strings")
+    parser.add_argument("--response-cache", action="store_true", help="Leave the response cache on (off by default, to measure the database paths)")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--save-baseline", metavar="NAME", help="Save the results as benchmarks/baselines/NAME.json")
+    parser.add_argument("--compare", metavar="NAME", help="Flag regressions against benchmarks/baselines/NAME.json")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="Allowed p95 slowdown before flagging, as a fraction")
+    parser.add_argument("--min-delta", type=float, default=10, help="Ignore p95 slowdowns smaller than this many ms")
+    args = parser.parse_args()
+
+    # A scratch database, the stub model and no caches in front of the
+    # parser, all set before the app modules read their configuration
+    scratch = tempfile.mkdtemp()
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+    os.environ["AI_BACKEND"] = "stub"
+    os.environ["AI_CACHE"] = "0"
+    os.environ["FETCH_CACHE"] = "0"
+    os.environ["RESPONSE_CACHE_ENABLED"] = "1" if args.response_cache else "0"
+
+    from flask_migrate import upgrade
+
+    from app import app, db
+    from benchmarks.catalog import CatalogGenerator, INGREDIENTS, populate
+    from models import Category
+    from pagination import encode_cursor
+    from similarity import rebuild_similar, similarity_available
+
+    started = time.perf_counter()
+    with app.app_context():
+        upgrade(directory=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations"))
+        populate(args.recipes, seed=args.seed)
+        if similarity_available():
+            rebuild_similar()
+        category_ids = [category_id for (category_id,) in db.session.query(Category.id)]
+        counter = QueryCounter(db.engine)
+    print(f"Catalog of {args.recipes} recipes ready in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    generator = CatalogGenerator(args.seed + 1)
+    site = StubSite(CatalogGenerator(args.seed + 2))
+    state = {
+        "generator": generator,
+        "max_id": args.recipes,
+        "category_ids": category_ids,
+        "pantry": list(INGREDIENTS[:40]),
+        "cursor": encode_cursor,
+        "created": [],
+        "site": site.base_url,
+    }
+
+    columns = ("requests", "req/s", "p50 ms", "p95 ms", "p99 ms", "queries", "errors")
+    print(f"{args.recipes} recipes, {args.requests} requests per route, {args.threads} thread(s)")
+    print(f"{'route':<30}" + "".join(f"{column:>10}" for column in columns))
+    results = {}
+    try:
+        for name, (expected, scenario) in build_scenarios(state).items():
+            if args.only and not any(part in name for part in args.only):
+                continue
+            result = run_scenario(app, counter, expected, scenario, args.requests, args.threads, args.seed, args.warmup)
+            if result is None:
+                continue
+            results[name] = result
+            print(f"{name:<30}" + "".join(
+                f"{result[column]:>10.0f}" if column in ("requests", "errors") else f"{result[column]:>10.1f}"
+                for column in columns
+            ))
+    finally:
+        site.close()
+        shutil.rmtree(scratch, ignore_errors=True)
+
+    if args.save_baseline:
+        os.makedirs(BASELINE_DIR, exist_ok=True)
+        path = os.path.join(BASELINE_DIR, f"{args.save_baseline}.json")
+        with open(path, "w") as f:
+            rounded = {name: {key: round(value, 2) for key, value in result.items()} for name, result in results.items()}
+            json.dump({"recipes": args.recipes, "threads": args.threads, "results": rounded}, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"Saved baseline to {path}")
+
+    if args.compare:
+        with open(os.path.join(BASELINE_DIR, f"{args.compare}.json")) as f:
+            baseline = json.load(f)
+        if baseline["recipes"] != args.recipes or baseline["threads"] != args.threads:
+            print(f"Note: baseline was run with {baseline['recipes']} recipes and {baseline['threads']} thread(s)")
+        regressions = compare(results, baseline["results"], args.tolerance, args.min_delta)
+        if regressions:
+            print("Regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print(f"No regressions against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+
+import argparse
+import glob
+import os
+import random
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+from parsers import extract_recipe, SOUP_FEATURES
+
+WORDS = ("salt pepper garlic onion butter flour sugar tomato basil chicken lemon oil "
+         "stir bake simmer chop whisk fold season roast serve until golden minutes").split()
+
+
+def baseline_extract(content):
+    # The parser as it was before the single-pass scanner: a full
+    # html.parser tree and repeated searches over it
+    soup = BeautifulSoup(content, "html.parser")
+    title = soup.find("h1").get_text(strip=True) if soup.find("h1") else "Untitled"
+    description = soup.find("meta", {"name": "description"}).get("content", "") if soup.find("meta", {"name": "description"}) else ""
+    instructions = [step.get_text(strip=True) for step in soup.find_all("li", {"class": "instruction"})]
+    ingredients = [{"name": ing.get_text(strip=True), "quantity": ""} for ing in soup.find_all("li", {"class": "ingredient"})]
+    categories = [cat.get_text(strip=True) for cat in soup.find_all("a", {"class": "category"})]
+    text_content = None
+    if not instructions or not ingredients:
+        text_content = soup.get_text(separator="\n", strip=True)
+    return {"title": title, "description": description, "instructions": instructions,
+            "ingredients": ingredients, "categories": categories}, text_content
+
+
+def _sentence(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def synthetic_page(rng):
+    # Roughly the shape of a real recipe page: lots of chrome, scripts and
+    # comments around a small recipe, sometimes marked up only with classes
+    chrome = "".join(f'<div class="ad"><a href="/p/{i}">{_sentence(rng, 6)}</a></div>' for i in range(rng.randint(50, 150)))
+    comments = "".join(f"<div class='comment'><p>{_sentence(rng, 25)}</p></div>" for _ in range(rng.randint(20, 80)))
+    ingredients = "".join(f'<li class="ingredient">{rng.randint(1, 4)} cups {rng.choice(WORDS)}</li>' for _ in range(rng.randint(5, 15)))
+    instructions = "".join(f'<li class="instruction">{_sentence(rng, 15)}</li>' for _ in range(rng.randint(4, 10)))
+    script = "<script>" + "var x = {};".join(_sentence(rng, 5) for _ in range(200)) + "</script>"
+    return (
+        f'<html><head><title>Recipe</title><meta name="description" content="{_sentence(rng, 12)}">{script}</head>'
+        f'<body><header><nav>{chrome}</nav></header><article><h1>{_sentence(rng, 3)}</h1>'
+        f'<ul>{ingredients}</ul><ol>{instructions}</ol><a class="category">Dinner</a></article>'
+        f'<section>{comments}</section><footer>{chrome}</footer></body></html>'
+    ).encode()
+
+
+def measure(extract, pages):
+    # CPU time per page, then peak traced memory for the largest page
+    started = time.process_time()
+    for page in pages:
+        extract(page)
+    cpu_ms = (time.process_time() - started) * 1000 / len(pages)
+
+    largest = max(pages, key=len)
+    tracemalloc.start()
+    extract(largest)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return cpu_ms, peak / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the recipe page parser against the old BeautifulSoup path.")
+    parser.add_argument("--pages", help="Directory of saved .html pages to use as the corpus")
+    parser.add_argument("--synthetic", type=int, default=100, help="Number of generated pages when no corpus is given")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    if args.pages:
+        pages = []
+        for path in sorted(glob.glob(os.path.join(args.pages, "*.htm*"))):
+            with open(path, "rb") as f:
+                pages.append(f.read())
+    else:
+        rng = random.Random(args.seed)
+        pages = [synthetic_page(rng) for _ in range(args.synthetic)]
+    if not pages:
+        parser.error("no pages found")
+
+    print(f"{len(pages)} pages, {sum(map(len, pages)) / len(pages) / 1024:.0f} KiB on average; tree builder: {SOUP_FEATURES}")
+    print(f"{'parser':<12}{'CPU ms/page':>14}{'peak KiB':>12}")
+    results = {}
+    for name, extract in (("baseline", baseline_extract), ("scanner", extract_recipe)):
+        results[name] = measure(extract, pages)
+        print(f"{name:<12}{results[name][0]:>14.2f}{results[name][1]:>12.0f}")
+    cpu_gain = results["baseline"][0] / results["scanner"][0]
+    memory_gain = results["baseline"][1] / results["scanner"][1]
+    print(f"scanner is {cpu_gain:.1f}x faster and uses {memory_gain:.1f}x less memory per page")
+
+
+if __name__ == '__main__':
+    main()
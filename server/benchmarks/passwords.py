@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+
+import argparse
+import os
+import threading
+import time
+
+from flask import Flask
+
+from passwords import HasherBusyError, PasswordHasher
+
+
+def make_hasher(rounds, workers, queue):
+    app = Flask(__name__)
+    app.config.update(
+        BCRYPT_LOG_ROUNDS=rounds,
+        BCRYPT_HANDLE_LONG_PASSWORDS=True,
+        PASSWORD_HASH_WORKERS=workers,
+        PASSWORD_HASH_QUEUE=queue,
+    )
+    return PasswordHasher(app)
+
+
+def run(hasher, clients, seconds):
+    # `clients` request threads each log in over and over with the right
+    # password, as /login does for a known user
+    stored = hasher.hash("correct horse battery staple")
+    started_at = time.perf_counter()
+    stop = started_at + seconds
+    lock = threading.Lock()
+    latencies = []
+    rejected = [0]
+
+    def client():
+        mine = []
+        refused = 0
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            try:
+                hasher.verify("correct horse battery staple", stored)
+            except HasherBusyError:
+                refused += 1
+                continue
+            mine.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(mine)
+            rejected[0] += refused
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started_at  # Includes hashes still queued at the deadline
+
+    latencies.sort()
+    latencies = latencies or [0]
+    return {
+        "logins/s": len(latencies) / elapsed,
+        "p50 ms": latencies[len(latencies) // 2] * 1000,
+        "p95 ms": latencies[int(len(latencies) * 0.95)] * 1000,
+        "rejected": rejected[0],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Login (bcrypt verify) throughput by work factor and hashing threads.")
+    parser.add_argument("--rounds", type=int, nargs="+", default=[10, 11, 12], help="bcrypt work factors to try")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, min(4, os.cpu_count() or 1), os.cpu_count() or 1}))
+    parser.add_argument("--clients", type=int, default=32, help="Concurrent request threads")
+    parser.add_argument("--queue", type=int, default=32, help="PASSWORD_HASH_QUEUE")
+    parser.add_argument("--seconds", type=float, default=3)
+    args = parser.parse_args()
+
+    columns = ("logins/s", "p50 ms", "p95 ms", "rejected")
+    print(f"{args.clients} concurrent clients, {args.seconds:g}s per run, {os.cpu_count()} CPUs")
+    print(f"{'rounds':>6}{'workers':>8}" + "".join(f"{column:>12}" for column in columns))
+    for rounds in args.rounds:
+        for workers in args.workers:
+            hasher = make_hasher(rounds, workers, args.queue)
+            result = run(hasher, args.clients, args.seconds)
+            hasher.shutdown()
+            print(f"{rounds:>6}{workers:>8}" + "".join(f"{result[column]:>12.1f}" for column in columns))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+
+import argparse
+import json
+import random
+import time
+
+from config import app
+from models import Category, Ingredient, Recipe
+from serializers import dumps_json, dumps_msgpack, encode_recipe, msgpack, orjson
+
+WORDS = ("salt pepper garlic onion butter flour sugar tomato basil chicken lemon oil "
+         "stir bake simmer chop whisk fold season roast serve until golden minutes").split()
+
+
+def _sentence(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+
+
+def build_recipes(count, seed):
+    # Transient model instances shaped like the catalog; no database needed
+    rng = random.Random(seed)
+    categories = [Category(id=i, name=name) for i, name in enumerate(["Dinner", "Vegan", "Quick", "Dessert", "Soup"], 1)]
+    recipes = []
+    for i in range(1, count + 1):
+        recipe = Recipe(
+            id=i,
+            title=_sentence(rng, 3),
+            description=_sentence(rng, 20),
+            instructions=[_sentence(rng, 15) for _ in range(rng.randint(4, 10))],
+        )
+        recipe.ingredients = [
+            Ingredient(id=i * 100 + j, name=rng.choice(WORDS), quantity=f"{rng.randint(1, 4)} cups")
+            for j in range(rng.randint(5, 15))
+        ]
+        recipe.categories = rng.sample(categories, 2)
+        recipes.append(recipe)
+    return recipes
+
+
+def measure(encode, recipes, repeat):
+    best = None
+    size = 0
+    for _ in range(repeat):
+        started = time.perf_counter()
+        body = encode(recipes)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+        size = len(body)
+    return len(recipes) / best, size / len(recipes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare recipe encode throughput of the old and new serializers.")
+    parser.add_argument("--recipes", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    recipes = build_recipes(args.recipes, args.seed)
+    candidates = [
+        # What GET /recipes/<id> did before: SerializerMixin plus indented, key-sorted JSON
+        ("to_dict + json indent", lambda rows: json.dumps([row.to_dict() for row in rows], indent=2, sort_keys=True).encode()),
+        ("encoder + json", lambda rows: json.dumps([encode_recipe(row) for row in rows], separators=(",", ":")).encode()),
+    ]
+    if orjson is not None:
+        candidates.append(("encoder + orjson", lambda rows: dumps_json([encode_recipe(row) for row in rows])))
+    if msgpack is not None:
+        candidates.append(("encoder + msgpack", lambda rows: dumps_msgpack([encode_recipe(row) for row in rows])))
+
+    print(f"{len(recipes)} recipes, best of {args.repeat}; orjson: {'yes' if orjson else 'no'}, msgpack: {'yes' if msgpack else 'no'}")
+    print(f"{'serializer':<24}{'recipes/s':>12}{'bytes/recipe':>14}")
+    baseline = None
+    with app.app_context():
+        for name, encode in candidates:
+            rate, size = measure(encode, recipes, args.repeat)
+            baseline = baseline or rate
+            print(f"{name:<24}{rate:>12.0f}{size:>14.0f}   {rate / baseline:.1f}x")
+
+
+if __name__ == '__main__':
+    main()
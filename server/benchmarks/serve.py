@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+
+import argparse
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import requests
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SEARCH_TERMS = ("garlic", "chicken", "soup", "lemon", "pasta", "creamy", "curry", "cake")
+
+
+def client(base_url, max_id, seconds, seed):
+    # One load-generating process: read routes in a fixed mix until time is up
+    rng = random.Random(seed)
+    session = requests.Session()
+    stop = time.perf_counter() + seconds
+    latencies = []
+    errors = 0
+    while time.perf_counter() < stop:
+        roll = rng.random()
+        if roll < 0.6:
+            path = f"/recipes/{rng.randint(1, max_id)}"
+        elif roll < 0.85:
+            path = f"/recipes?limit=50&category_id={rng.randint(1, 20)}"
+        else:
+            path = f"/recipes/search?q={rng.choice(SEARCH_TERMS)}"
+        started = time.perf_counter()
+        try:
+            ok = session.get(base_url + path, timeout=30).status_code == 200
+        except requests.RequestException:
+            ok = False
+        if ok:
+            latencies.append(time.perf_counter() - started)
+        else:
+            errors += 1
+    return latencies, errors
+
+
+def wait_until_up(base_url, timeout=60):
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        try:
+            requests.get(base_url + "/", timeout=1)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError("gunicorn didn't start")
+
+
+def run(workers, clients, seconds, port, env, max_id):
+    env = dict(env, WEB_CONCURRENCY=str(workers), BIND=f"127.0.0.1:{port}")
+    server = subprocess.Popen(["gunicorn"], cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_up(base_url)
+        # Spawned, so the clients share nothing with this process's app
+        with multiprocessing.get_context("spawn").Pool(clients) as pool:
+            started = time.perf_counter()
+            results = pool.starmap(client, [(base_url, max_id, seconds, seed) for seed in range(clients)])
+            elapsed = time.perf_counter() - started
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait()
+
+    latencies = sorted(latency for mine, _ in results for latency in mine) or [0]
+    return {
+        "req/s": len(latencies) / elapsed,
+        "p50 ms": latencies[len(latencies) // 2] * 1000,
+        "p95 ms": latencies[int(len(latencies) * 0.95)] * 1000,
+        "errors": sum(errors for _, errors in results),
+    }
+
+
+def main():
+    cpus = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description="Read throughput of the gunicorn server by worker count.")
+    parser.add_argument("--recipes", type=int, default=10000, help="Catalog size to generate")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, cpus, cpus * 2 + 1}))
+    parser.add_argument("--clients", type=int, default=max(4, cpus * 2), help="Concurrent client processes")
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--worker-class", default="sync", help="WORKER_CLASS for gunicorn: sync, gthread or gevent")
+    parser.add_argument("--port", type=int, default=5601)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp()
+    env = dict(
+        os.environ,
+        DATABASE_URL=f"sqlite:///{os.path.join(scratch, 'bench.db')}",
+        METRICS_DIR=os.path.join(scratch, "metrics"),
+        RESPONSE_CACHE_ENABLED="0",  # Measure the database paths
+        MAX_REQUESTS="0",
+        WORKER_CLASS=args.worker_class,
+    )
+    os.environ["DATABASE_URL"] = env["DATABASE_URL"]
+
+    from flask_migrate import upgrade
+
+    from app import app
+    from benchmarks.catalog import populate
+
+    started = time.perf_counter()
+    with app.app_context():
+        upgrade(directory=os.path.join(SERVER_DIR, "migrations"))
+        populate(args.recipes, seed=args.seed)
+    print(f"Catalog of {args.recipes} recipes ready in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    columns = ("req/s", "p50 ms", "p95 ms", "errors")
+    print(f"{args.worker_class} workers, {args.clients} client processes, {args.seconds:g}s per run, {cpus} CPUs")
+    print(f"{'workers':>8}" + "".join(f"{column:>10}" for column in columns) + f"{'speedup':>10}")
+    first = None
+    for workers in args.workers:
+        result = run(workers, args.clients, args.seconds, args.port, env, args.recipes)
+        first = first or result["req/s"]
+        print(f"{workers:>8}" + "".join(f"{result[column]:>10.1f}" for column in columns[:3]) + f"{result['errors']:>10}{result['req/s'] / first:>9.2f}x")
+
+
+if __name__ == '__main__':
+    main()
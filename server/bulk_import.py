@@ -0,0 +1,200 @@
+import json
+from collections import defaultdict
+
+from sqlalchemy import insert
+
+from config import db
+from models import Recipe, Ingredient, INGREDIENT_POSITION_GAP, association_table, recipe_documents
+from categories import resolve_category_ids
+from search import index_recipes_bulk
+from pantry import index_ingredients_bulk
+from serializers import dumps_json
+from similarity import queue_similar
+from quantities import clean_servings, quantity_columns
+
+DEFAULT_CHUNK_SIZE = 500
+MAX_CHUNK_SIZE = 5000
+
+
+class RecipeLineError(ValueError):
+    pass
+
+
+def parse_recipe_line(line):
+    # Validate one NDJSON line into the fields the insert needs
+    try:
+        data = json.loads(line)
+    except ValueError as e:
+        raise RecipeLineError(f"Invalid JSON: {e}")
+    if not isinstance(data, dict):
+        raise RecipeLineError("Each line must be a JSON object.")
+
+    title = data.get("title")
+    if not isinstance(title, str) or not title.strip():
+        raise RecipeLineError("title is required.")
+
+    instructions = data.get("instructions") or []
+    if isinstance(instructions, str):
+        instructions = [step for step in instructions.split("\n") if step.strip()]
+    if not isinstance(instructions, list):
+        raise RecipeLineError("instructions must be a list or a string.")
+
+    ingredients = []
+    for ingredient in data.get("ingredients") or []:
+        if not isinstance(ingredient, dict) or not ingredient.get("name"):
+            raise RecipeLineError("Each ingredient needs a name.")
+        ingredients.append({
+            "name": str(ingredient["name"]),
+            "quantity": str(ingredient.get("quantity") or ""),
+        })
+
+    try:
+        servings = clean_servings(data.get("servings"))
+    except ValueError as e:
+        raise RecipeLineError(str(e))
+
+    categories = data.get("categories") or []
+    if isinstance(categories, str):
+        categories = categories.split(",")
+    categories = [str(name).strip() for name in categories if str(name).strip()]
+
+    return {
+        "title": title,
+        "description": data.get("description"),
+        "instructions": instructions,
+        "servings": servings,
+        "ingredients": ingredients,
+        "categories": list(dict.fromkeys(categories)),
+    }
+
+
+def insert_returning_ids(model, rows):
+    # Bulk insert and return the new primary keys in row order
+    if db.engine.dialect.name != "sqlite":
+        return db.session.execute(
+            insert(model).returning(model.id, sort_by_parameter_order=True), rows
+        ).scalars().all()
+
+    # SQLite can only keep RETURNING in order by inserting row at a time.
+    # Instead use a plain executemany: the transaction holds the write lock,
+    # and each new rowid is max(rowid) + 1, so the ids are the last len(rows)
+    db.session.execute(insert(model), rows)
+    last_id = db.session.execute(db.select(db.func.max(model.id))).scalar()
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+
+def insert_recipe_batch(batch):
+    # Insert a batch of parsed recipes with one executemany per table and
+    # return the new recipe ids, in batch order
+    category_ids = resolve_category_ids(sorted({name for recipe in batch for name in recipe["categories"]}))
+
+    recipe_ids = insert_returning_ids(Recipe, [
+        {
+            "title": recipe["title"],
+            "description": recipe["description"],
+            "instructions": recipe["instructions"],
+            "servings": recipe.get("servings"),
+        }
+        for recipe in batch
+    ])
+
+    ingredient_rows = [
+        {
+            "recipe_id": recipe_id, "name": ingredient["name"], "quantity": ingredient["quantity"],
+            "position": index * INGREDIENT_POSITION_GAP, **quantity_columns(ingredient["quantity"]),
+        }
+        for recipe_id, recipe in zip(recipe_ids, batch)
+        for index, ingredient in enumerate(recipe["ingredients"])
+    ]
+    if ingredient_rows:
+        ingredient_ids = insert_returning_ids(Ingredient, ingredient_rows)
+        index_ingredients_bulk(
+            (row["recipe_id"], ingredient_id, row["name"])
+            for ingredient_id, row in zip(ingredient_ids, ingredient_rows)
+        )
+
+    link_rows = [
+        {"recipe_id": recipe_id, "category_id": category_ids[name]}
+        for recipe_id, recipe in zip(recipe_ids, batch)
+        for name in recipe["categories"]
+    ]
+    if link_rows:
+        db.session.execute(association_table.insert(), link_rows)
+
+    index_recipes_bulk([
+        {
+            "id": recipe_id,
+            "title": recipe["title"],
+            "description": recipe["description"],
+            "instructions": recipe["instructions"],
+            "ingredients": [ingredient["name"] for ingredient in recipe["ingredients"]],
+        }
+        for recipe_id, recipe in zip(recipe_ids, batch)
+    ])
+
+    # Documents straight from the batch, shaped like encode_recipe() output;
+    # categories in id order, as the relationship loads them
+    ingredients_by_recipe = defaultdict(list)
+    for row in ingredient_rows:
+        ingredients_by_recipe[row["recipe_id"]].append(
+            {key: row[key] for key in ("name", "quantity", "amount", "amount_max", "unit", "note")}
+        )
+    db.session.execute(recipe_documents.insert(), [
+        {
+            "recipe_id": recipe_id,
+            "body": dumps_json({
+                "id": recipe_id,
+                "title": recipe["title"],
+                "description": recipe["description"],
+                "instructions": recipe["instructions"],
+                "servings": recipe.get("servings"),
+                "ingredients": ingredients_by_recipe[recipe_id],
+                "categories": sorted(recipe["categories"], key=category_ids.get),
+            }),
+        }
+        for recipe_id, recipe in zip(recipe_ids, batch)
+    ])
+    return recipe_ids
+
+
+def import_ndjson(lines, chunk_size=DEFAULT_CHUNK_SIZE):
+    # Consume an iterable of NDJSON lines, committing one transaction per
+    # chunk. Bad lines are reported and skipped; a chunk that fails in the
+    # database is rolled back and reported line by line.
+    summary = {"created": 0, "failed": 0, "errors": []}
+    batch, line_numbers = [], []
+
+    def flush():
+        try:
+            queue_similar(insert_recipe_batch(batch))
+            db.session.commit()
+            summary["created"] += len(batch)
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error: {e}")
+            summary["failed"] += len(batch)
+            summary["errors"].extend(
+                {"line": number, "error": "Database error while inserting this chunk."}
+                for number in line_numbers
+            )
+        batch.clear()
+        line_numbers.clear()
+
+    for number, line in enumerate(lines, start=1):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        if not line.strip():
+            continue
+        try:
+            batch.append(parse_recipe_line(line))
+            line_numbers.append(number)
+        except RecipeLineError as e:
+            summary["failed"] += 1
+            summary["errors"].append({"line": number, "error": str(e)})
+            continue
+        if len(batch) >= chunk_size:
+            flush()
+
+    if batch:
+        flush()
+    return summary
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from functools import wraps
+
+from flask import request, current_app, Response
+
+# Headers worth replaying from a cached response
+CACHED_HEADERS = ("X-Next-Cursor", "Link", "Vary")
+
+
+class LRUBackend:
+    # Bounded in-process store. Only correct with a single server process,
+    # since a write in one process can't bump another process's versions.
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # Versions live outside the LRU so eviction can never roll one back
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def get_versions(self, scopes):
+        with self._lock:
+            return [self._versions.get(scope, 0) for scope in scopes]
+
+    def bump(self, scopes):
+        with self._lock:
+            for scope in scopes:
+                self._versions[scope] = self._versions.get(scope, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class RedisBackend:
+    # Shared store for multi-process deployments; needs the `redis` package
+
+    def __init__(self, url, ttl=3600, prefix="smartchef:cache:"):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.ttl = ttl
+        self.prefix = prefix
+
+    def get(self, key):
+        return self.client.get(self.prefix + key)
+
+    def set(self, key, value):
+        self.client.set(self.prefix + key, value, ex=self.ttl)
+
+    def get_versions(self, scopes):
+        values = self.client.mget([self.prefix + "v:" + scope for scope in scopes])
+        return [int(value) if value else 0 for value in values]
+
+    def bump(self, scopes):
+        pipe = self.client.pipeline()
+        for scope in scopes:
+            pipe.incr(self.prefix + "v:" + scope)
+        pipe.execute()
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + "*"):
+            self.client.delete(key)
+
+
+def make_backend(config):
+    url = config.get("RESPONSE_CACHE_URL")
+    if url:
+        return RedisBackend(url, ttl=config.get("RESPONSE_CACHE_TTL", 3600))
+    return LRUBackend(max_entries=config.get("RESPONSE_CACHE_SIZE", 1024))
+
+
+def _pack(response, etag):
+    meta = {
+        "status": response.status_code,
+        "mimetype": response.mimetype,
+        "etag": etag,
+        "headers": {name: response.headers[name] for name in CACHED_HEADERS if name in response.headers},
+    }
+    return json.dumps(meta).encode() + b"\n" + response.get_data()
+
+
+def _unpack(value):
+    meta, _, body = value.partition(b"\n")
+    meta = json.loads(meta)
+    response = Response(body, status=meta["status"], mimetype=meta["mimetype"], headers=meta["headers"])
+    response.set_etag(meta["etag"])
+    return response
+
+
+class ResponseCache:
+    def __init__(self, app=None):
+        self.backend = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.backend = make_backend(app.config)
+        app.extensions["response_cache"] = self
+
+    def bump(self, *scopes):
+        # Call after a write commits; every cached response that depends on
+        # one of these scopes stops being served
+        if self.backend is not None and current_app.config.get("RESPONSE_CACHE_ENABLED", True):
+            self.backend.bump(scopes)
+
+    def bump_shared(self, *scopes):
+        # For CLI commands and scripts, which run in a process of their own:
+        # only a shared (Redis) backend reaches the server's cache. Returns
+        # False when the server may keep serving responses cached before the
+        # change, which only a server restart clears.
+        if self.backend is None or not current_app.config.get("RESPONSE_CACHE_ENABLED", True):
+            return True
+        if not isinstance(self.backend, RedisBackend):
+            return False
+        self.backend.bump(scopes)
+        return True
+
+    def cached(self, scopes):
+        # `scopes` maps the view's URL arguments to the version scopes the
+        # response depends on, e.g. lambda recipe_id: ["categories", f"recipe:{recipe_id}"]
+        def decorator(view):
+            @wraps(view)
+            def wrapper(**kwargs):
+                if not current_app.config.get("RESPONSE_CACHE_ENABLED", True):
+                    return view(**kwargs)
+
+                view_scopes = scopes(**kwargs) if callable(scopes) else list(scopes)
+                versions = self.backend.get_versions(view_scopes)
+                key = "{}?{}|{}|{}".format(
+                    request.path,
+                    "&".join(f"{k}={v}" for k, v in sorted(request.args.items(multi=True))),
+                    request.headers.get("Accept", ""),  # The same URL may be sent in several formats
+                    ",".join(f"{scope}={version}" for scope, version in zip(view_scopes, versions)),
+                )
+
+                packed = self.backend.get(key)
+                if packed is not None:
+                    return _unpack(packed).make_conditional(request)
+
+                response = current_app.make_response(view(**kwargs))
+                if response.status_code != 200 or response.is_streamed:
+                    return response
+
+                etag = hashlib.sha256(response.get_data()).hexdigest()
+                response.set_etag(etag)
+                self.backend.set(key, _pack(response, etag))
+                return response.make_conditional(request)
+            return wrapper
+        return decorator
@@ -0,0 +1,49 @@
+from sqlalchemy import insert
+from sqlalchemy.dialects import postgresql, sqlite
+
+from config import db
+from models import Category
+
+
+def insert_ignore_duplicates(rows):
+    # INSERT ... ON CONFLICT (name) DO NOTHING, so two requests creating the
+    # same category at once both succeed and end up sharing one row.
+    # Returns the number of rows actually inserted.
+    table = Category.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == "sqlite":
+        stmt = sqlite.insert(table).on_conflict_do_nothing(index_elements=["name"])
+    elif dialect == "postgresql":
+        stmt = postgresql.insert(table).on_conflict_do_nothing(index_elements=["name"])
+    elif dialect in ("mysql", "mariadb"):
+        stmt = insert(table).prefix_with("IGNORE")
+    else:
+        stmt = insert(table)
+    return db.session.execute(stmt, rows).rowcount
+
+
+def resolve_category_ids(names):
+    # Map category names to ids, creating the missing ones: one lookup for
+    # all of them and one executemany for the new ones
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+    found = dict(db.session.execute(
+        db.select(Category.name, Category.id).where(Category.name.in_(names))
+    ).all())
+    missing = [name for name in names if name not in found]
+    if missing:
+        insert_ignore_duplicates([{"name": name} for name in missing])
+        found.update(db.session.execute(
+            db.select(Category.name, Category.id).where(Category.name.in_(missing))
+        ).all())
+    return found
+
+
+def get_or_create_categories(names):
+    # Same as resolve_category_ids but returns Category objects, in order
+    ids = resolve_category_ids(names)
+    if not ids:
+        return []
+    by_id = {category.id: category for category in Category.query.filter(Category.id.in_(ids.values()))}
+    return [by_id[ids[name]] for name in dict.fromkeys(names)]
@@ -6,23 +6,98 @@ from flask_restful import Api
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy import MetaData
 
+from cache import ResponseCache
+from serializers import make_json_provider
+from database import engine_options, init_engine_profile
+from passwords import PasswordHasher
+from metrics import Metrics
+
 # Instantiate app, set attributes
 app = Flask(__name__)
-app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///app.db'
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///app.db')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SECRET_KEY'] = 'my_secret_key'
-app.json.compact = False
+app.json = make_json_provider(app)  # Compact JSON, via orjson when installed
+
+# Recipes inserted per transaction by POST /recipes/bulk
+app.config['BULK_IMPORT_CHUNK_SIZE'] = int(os.environ.get('BULK_IMPORT_CHUNK_SIZE', 500))
+
+# Background /parse-recipe jobs: worker threads and how many may wait
+app.config['PARSE_WORKERS'] = int(os.environ.get('PARSE_WORKERS', 4))
+app.config['PARSE_QUEUE_DEPTH'] = int(os.environ.get('PARSE_QUEUE_DEPTH', 100))
+
+# Batch URL ingestion (POST /parse-recipes and ingest.py)
+app.config['INGEST_MAX_URLS'] = int(os.environ.get('INGEST_MAX_URLS', 500))
+app.config['INGEST_FETCH_WORKERS'] = int(os.environ.get('INGEST_FETCH_WORKERS', 16))
+app.config['INGEST_PER_HOST'] = int(os.environ.get('INGEST_PER_HOST', 2))
+app.config['INGEST_PARSE_WORKERS'] = int(os.environ.get('INGEST_PARSE_WORKERS', os.cpu_count() or 1))
+app.config['INGEST_BATCH_SIZE'] = int(os.environ.get('INGEST_BATCH_SIZE', 50))
+
+# Response cache: in-process LRU by default, shared Redis when a URL is set
+app.config['RESPONSE_CACHE_ENABLED'] = os.environ.get('RESPONSE_CACHE_ENABLED', '1') != '0'
+app.config['RESPONSE_CACHE_URL'] = os.environ.get('RESPONSE_CACHE_URL')
+app.config['RESPONSE_CACHE_SIZE'] = int(os.environ.get('RESPONSE_CACHE_SIZE', 1024))
+app.config['RESPONSE_CACHE_TTL'] = int(os.environ.get('RESPONSE_CACHE_TTL', 3600))
+
+# Database engine profile, picked from the URL. SQLite: pragmas set on
+# every connection. Server databases: connection pool limits.
+app.config['SQLITE_JOURNAL_MODE'] = os.environ.get('SQLITE_JOURNAL_MODE', 'WAL')
+app.config['SQLITE_SYNCHRONOUS'] = os.environ.get('SQLITE_SYNCHRONOUS', 'NORMAL')
+app.config['SQLITE_BUSY_TIMEOUT'] = int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000))  # milliseconds
+app.config['SQLITE_MMAP_SIZE'] = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+app.config['SQLITE_CACHE_SIZE'] = int(os.environ.get('SQLITE_CACHE_SIZE', -64000))  # negative means KiB
+app.config['DB_POOL_SIZE'] = int(os.environ.get('DB_POOL_SIZE', 10))
+app.config['DB_MAX_OVERFLOW'] = int(os.environ.get('DB_MAX_OVERFLOW', 20))
+app.config['DB_POOL_TIMEOUT'] = int(os.environ.get('DB_POOL_TIMEOUT', 30))
+app.config['DB_POOL_RECYCLE'] = int(os.environ.get('DB_POOL_RECYCLE', 1800))
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+# Password hashing: bcrypt work factor (stored hashes with another cost are
+# upgraded on login), hashing threads and how many hashes may wait
+app.config['BCRYPT_LOG_ROUNDS'] = int(os.environ.get('BCRYPT_LOG_ROUNDS', 12))
+app.config['BCRYPT_HANDLE_LONG_PASSWORDS'] = True  # bcrypt only reads the first 72 bytes
+app.config['PASSWORD_HASH_WORKERS'] = int(os.environ.get('PASSWORD_HASH_WORKERS', min(4, os.cpu_count() or 1)))
+app.config['PASSWORD_HASH_QUEUE'] = int(os.environ.get('PASSWORD_HASH_QUEUE', 32))
+
+# Similar recipes: neighbours kept per recipe, whether each server process
+# recomputes queued lists in a background worker process, how long (seconds) it waits
+# after a write to gather others, and how long it keeps its model before
+# refitting it
+app.config['SIMILAR_TOP_K'] = int(os.environ.get('SIMILAR_TOP_K', 10))
+app.config['SIMILAR_REFRESH_ENABLED'] = os.environ.get('SIMILAR_REFRESH_ENABLED', '1') != '0'
+app.config['SIMILAR_REFRESH_DELAY'] = float(os.environ.get('SIMILAR_REFRESH_DELAY', 1))
+app.config['SIMILAR_MODEL_TTL'] = int(os.environ.get('SIMILAR_MODEL_TTL', 300))
+
+# Most recipes one POST /shopping-list may merge
+app.config['SHOPPING_LIST_MAX_RECIPES'] = int(os.environ.get('SHOPPING_LIST_MAX_RECIPES', 500))
+
+# Request metrics on /metrics (per process), and an optional Server-Timing
+# header with each response's SQL and parse stage timings
+app.config['METRICS_ENABLED'] = os.environ.get('METRICS_ENABLED', '1') != '0'
+app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING', '0') == '1'
+app.config['METRICS_DIR'] = os.environ.get('METRICS_DIR')  # Shared by worker processes (see gunicorn.conf.py)
 
 # Define metadata, instantiate db
 metadata = MetaData(naming_convention={
+    "ix": "ix_%(column_0_label)s",
     "fk": "fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s",
 })
 db = SQLAlchemy(metadata=metadata)
 migrate = Migrate(app, db)
 db.init_app(app)
+init_engine_profile(app, db)
+
+# Instantiate response cache
+response_cache = ResponseCache(app)
+
+# Instantiate password hasher
+password_hasher = PasswordHasher(app)
+
+# Instantiate request metrics
+metrics = Metrics(app)
 
 # Instantiate REST API
 api = Api(app)
 
 # Instantiate CORS
-CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True, methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"])
+CORS(app, resources={r"/*": {"origins": "*"}}, supports_credentials=True, methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"], expose_headers=["X-Next-Cursor", "Link", "ETag", "Server-Timing"])
@@ -0,0 +1,57 @@
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+
+
+def engine_profile(uri):
+    # "sqlite" for SQLite files, "server" for PostgreSQL, MySQL and friends
+    return "sqlite" if make_url(uri).get_backend_name() == "sqlite" else "server"
+
+
+def sqlite_pragmas(config):
+    # Applied to every new SQLite connection, in this order. WAL lets readers
+    # run alongside the single writer, and busy_timeout makes a blocked
+    # writer wait instead of failing with "database is locked".
+    return [
+        ("journal_mode", config['SQLITE_JOURNAL_MODE']),
+        ("synchronous", config['SQLITE_SYNCHRONOUS']),
+        ("busy_timeout", config['SQLITE_BUSY_TIMEOUT']),
+        ("mmap_size", config['SQLITE_MMAP_SIZE']),
+        ("cache_size", config['SQLITE_CACHE_SIZE']),
+        ("foreign_keys", "ON"),  # Off by default in SQLite; the ON DELETE CASCADE rules need it
+    ]
+
+
+def engine_options(config):
+    # Keyword arguments for create_engine (SQLALCHEMY_ENGINE_OPTIONS)
+    if engine_profile(config['SQLALCHEMY_DATABASE_URI']) == "sqlite":
+        # pysqlite has its own busy wait; keep it in step with the pragma
+        return {"connect_args": {"timeout": config['SQLITE_BUSY_TIMEOUT'] / 1000}}
+    return {
+        "pool_size": config['DB_POOL_SIZE'],
+        "max_overflow": config['DB_MAX_OVERFLOW'],
+        "pool_timeout": config['DB_POOL_TIMEOUT'],
+        "pool_recycle": config['DB_POOL_RECYCLE'],  # Close connections before the server drops them
+        "pool_pre_ping": True,  # Replace connections that died while idle in the pool
+    }
+
+
+def apply_sqlite_pragmas(engine, pragmas):
+    if engine.dialect.name != "sqlite":
+        return
+
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas:
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+def init_engine_profile(app, db):
+    # Flask-SQLAlchemy creates its engines in init_app; hook the SQLite ones
+    # before any connection is opened
+    with app.app_context():
+        for engine in db.engines.values():
+            apply_sqlite_pragmas(engine, sqlite_pragmas(app.config))
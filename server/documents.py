@@ -0,0 +1,77 @@
+from sqlalchemy.orm import selectinload
+
+from config import db
+from models import Recipe, recipe_documents
+from serializers import dumps_json, encode_recipe
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def encode_document(recipe):
+    return dumps_json(encode_recipe(recipe))
+
+
+def store_documents(documents):
+    # Replace the document rows for {recipe_id: body}. Runs inside the
+    # caller's transaction so documents commit (or roll back) with the recipe.
+    if not documents:
+        return
+    db.session.execute(recipe_documents.delete().where(recipe_documents.c.recipe_id.in_(list(documents))))
+    db.session.execute(recipe_documents.insert(), [
+        {"recipe_id": recipe_id, "body": body} for recipe_id, body in documents.items()
+    ])
+
+
+def build_documents(recipe_ids):
+    # Encode recipes from the base tables; ids that don't exist are skipped
+    db.session.flush()
+    recipes = Recipe.query.options(
+        selectinload(Recipe.ingredients),
+        selectinload(Recipe.categories),
+    ).filter(Recipe.id.in_(recipe_ids)).execution_options(populate_existing=True).all()
+    return {recipe.id: encode_document(recipe) for recipe in recipes}
+
+
+def refresh_documents(recipe_ids):
+    # Rebuild the documents of recipes whose rows were just written
+    store_documents(build_documents(list(recipe_ids)))
+
+
+def get_documents(recipe_ids):
+    # Document bodies for `recipe_ids`, in that order. Recipes written
+    # before the documents were backfilled are encoded on the fly.
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return []
+    bodies = dict(db.session.execute(
+        db.select(recipe_documents.c.recipe_id, recipe_documents.c.body)
+        .where(recipe_documents.c.recipe_id.in_(recipe_ids))
+    ).all())
+    missing = [recipe_id for recipe_id in recipe_ids if recipe_id not in bodies]
+    if missing:
+        bodies.update(build_documents(missing))
+    return [bodies[recipe_id] for recipe_id in recipe_ids if recipe_id in bodies]
+
+
+def get_document(recipe_id):
+    documents = get_documents([recipe_id])
+    return documents[0] if documents else None
+
+
+def rebuild_documents(batch_size=DEFAULT_BATCH_SIZE):
+    # Backfill: rebuild every document from the base tables, committing per
+    # batch. Returns the number of documents written.
+    count = 0
+    last_id = 0
+    while True:
+        recipe_ids = db.session.execute(
+            db.select(Recipe.id).where(Recipe.id > last_id).order_by(Recipe.id).limit(batch_size)
+        ).scalars().all()
+        if not recipe_ids:
+            break
+        refresh_documents(recipe_ids)
+        db.session.commit()
+        db.session.expunge_all()
+        count += len(recipe_ids)
+        last_id = recipe_ids[-1]
+    return count
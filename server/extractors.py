@@ -0,0 +1,164 @@
+import html
+import json
+import re
+
+from quantities import parse_servings
+
+# Rough characters-per-token ratio used to keep LLM prompts within budget
+CHARS_PER_TOKEN = 4
+DEFAULT_TOKEN_BUDGET = 3000
+
+# Page chrome that never holds the recipe itself
+BOILERPLATE_TAGS = {"nav", "header", "footer", "aside", "form", "iframe", "svg", "button"}
+
+TAG_PATTERN = re.compile(r"<[^>]+>")
+SPACE_PATTERN = re.compile(r"\s+")
+
+# Leading amount and unit of an ingredient line, e.g. "1 1/2 cups" or "200 g"
+QUANTITY_PATTERN = re.compile(
+    r"^\s*((?:[\d½¼¾⅓⅔⅛]+(?:[./\s-]+[\d½¼¾⅓⅔⅛]+)*)\s*"
+    r"(?:(?:cups?|tbsps?|tablespoons?|tsps?|teaspoons?|g|grams?|kg|ml|l|litres?|liters?|oz|ounces?|lbs?|pounds?|"
+    r"pinch(?:es)?|cloves?|cans?|slices?|sticks?|bunch(?:es)?|handfuls?)\b\.?)?)\s*(.*)$",
+    re.IGNORECASE,
+)
+
+
+def clean_text(value):
+    if value is None:
+        return ""
+    text = TAG_PATTERN.sub(" ", html.unescape(str(value)))
+    return SPACE_PATTERN.sub(" ", text).strip()
+
+
+def split_ingredient_line(line):
+    # "2 cups flour" -> ("2 cups", "flour"); lines without an amount keep
+    # everything in the name
+    line = clean_text(line)
+    match = QUANTITY_PATTERN.match(line)
+    if match and match.group(1).strip() and match.group(2):
+        return match.group(1).strip(), match.group(2).strip()
+    return "", line
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return value if isinstance(value, list) else [value]
+
+
+def _is_recipe_type(value):
+    return any(str(t).split("/")[-1].split(":")[-1] == "Recipe" for t in _as_list(value))
+
+
+def _instruction_steps(value):
+    # recipeInstructions may be text, a list of text, HowToStep objects or
+    # HowToSection objects wrapping more steps
+    steps = []
+    for item in _as_list(value):
+        if isinstance(item, dict):
+            if "itemListElement" in item:
+                steps.extend(_instruction_steps(item["itemListElement"]))
+            else:
+                steps.append(clean_text(item.get("text") or item.get("name")))
+        elif isinstance(item, str) and "\n" in item:
+            steps.extend(clean_text(part) for part in item.split("\n"))
+        else:
+            steps.append(clean_text(item))
+    return [step for step in steps if step]
+
+
+def recipe_from_schema(data):
+    # Map a schema.org Recipe (as a dict) onto our recipe fields
+    categories = []
+    for key in ("recipeCategory", "recipeCuisine"):
+        for value in _as_list(data.get(key)):
+            categories.extend(clean_text(part) for part in str(value).split(","))
+
+    ingredients = []
+    for line in _as_list(data.get("recipeIngredient") or data.get("ingredients")):
+        quantity, name = split_ingredient_line(line)
+        if name:
+            ingredients.append({"name": name, "quantity": quantity})
+
+    return {
+        "title": clean_text(data.get("name")) or "Untitled",
+        "description": clean_text(data.get("description")),
+        "instructions": _instruction_steps(data.get("recipeInstructions")),
+        "servings": parse_servings(data.get("recipeYield") or data.get("yield")),
+        "ingredients": ingredients,
+        "categories": [category for category in dict.fromkeys(categories) if category],
+    }
+
+
+def _find_jsonld_recipe(node):
+    if isinstance(node, list):
+        for item in node:
+            found = _find_jsonld_recipe(item)
+            if found is not None:
+                return found
+    elif isinstance(node, dict):
+        if _is_recipe_type(node.get("@type")):
+            return node
+        for key in ("@graph", "mainEntity", "mainEntityOfPage", "itemListElement"):
+            if key in node:
+                found = _find_jsonld_recipe(node[key])
+                if found is not None:
+                    return found
+    return None
+
+
+def extract_jsonld(scripts):
+    # scripts: text of every <script type="application/ld+json"> on the page
+    for script in scripts:
+        try:
+            data = json.loads(script, strict=False)
+        except ValueError:
+            continue
+        found = _find_jsonld_recipe(data)
+        if found is not None:
+            return recipe_from_schema(found)
+    return None
+
+
+def _property_value(element):
+    for attr in ("content", "datetime", "href", "src"):
+        if element.get(attr):
+            return element[attr]
+    return element.get_text(" ", strip=True)
+
+
+def _extract_scoped(root, prop_attr, scope_attr):
+    # Collect schema.org properties from a microdata (itemprop/itemscope) or
+    # RDFa (property/typeof) Recipe element into a dict for recipe_from_schema
+    data = {}
+    for element in root.find_all(attrs={prop_attr: True}):
+        # Skip properties of nested items (author, nutrition, the inside of a
+        # HowToStep); the nested element itself is read as a whole
+        owner = element.find_parent(attrs={scope_attr: True})
+        if owner is not None and owner is not root:
+            continue
+        for name in element[prop_attr].split():
+            name = name.split(":")[-1]
+            if name in ("recipeIngredient", "ingredients", "recipeInstructions", "recipeCategory", "recipeCuisine"):
+                data.setdefault(name, []).append(_property_value(element))
+            else:
+                data.setdefault(name, _property_value(element))
+    return data
+
+
+def extract_microdata(soup):
+    for root in soup.find_all(attrs={"itemscope": True, "itemtype": True}):
+        if _is_recipe_type(root["itemtype"].split()):
+            return recipe_from_schema(_extract_scoped(root, "itemprop", "itemscope"))
+    return None
+
+
+def extract_rdfa(soup):
+    for root in soup.find_all(attrs={"typeof": True}):
+        if _is_recipe_type(root["typeof"].split()):
+            return recipe_from_schema(_extract_scoped(root, "property", "typeof"))
+    return None
+
+
+def is_complete(recipe):
+    return bool(recipe and recipe["ingredients"] and recipe["instructions"])
@@ -0,0 +1,143 @@
+import hashlib
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class OfflineCacheMiss(Exception):
+    pass
+
+
+class FetchCache:
+    # On-disk HTTP cache for recipe pages. Bodies are stored once per content
+    # hash under objects/, and a small SQLite index maps each URL to its body
+    # plus the validators needed to revalidate it.
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES, offline=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.offline = offline
+        self._lock = threading.Lock()
+        os.makedirs(os.path.join(directory, "objects"), exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "url TEXT PRIMARY KEY, digest TEXT NOT NULL, etag TEXT, last_modified TEXT, "
+                "size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_accessed ON entries (accessed)")
+            conn.execute("CREATE INDEX IF NOT EXISTS ix_entries_digest ON entries (digest)")
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(os.path.join(self.directory, "index.sqlite"), timeout=30)
+        try:
+            with conn:  # commits on success, rolls back on error
+                yield conn
+        finally:
+            conn.close()
+
+    def _object_path(self, digest):
+        return os.path.join(self.directory, "objects", digest[:2], digest)
+
+    def _read(self, digest):
+        try:
+            with open(self._object_path(digest), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def _write(self, body):
+        digest = hashlib.sha256(body).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+            with os.fdopen(fd, "wb") as f:
+                f.write(body)
+            os.replace(tmp_path, path)
+        return digest
+
+    def lookup(self, url):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT digest, etag, last_modified FROM entries WHERE url = ?", (url,)
+            ).fetchone()
+        if row is None:
+            return None
+        body = self._read(row[0])
+        if body is None:
+            return None
+        return {"body": body, "etag": row[1], "last_modified": row[2]}
+
+    def store(self, url, body, etag=None, last_modified=None):
+        digest = self._write(body)
+        with self._lock, self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (url, digest, etag, last_modified, size, accessed) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (url, digest, etag, last_modified, len(body), time.time()),
+            )
+            self._evict(conn)
+
+    def touch(self, url):
+        with self._connect() as conn:
+            conn.execute("UPDATE entries SET accessed = ? WHERE url = ?", (time.time(), url))
+
+    def _evict(self, conn):
+        # Drop least recently used URLs until the cache fits, then remove
+        # bodies nothing points at any more
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        removed = set()
+        for url, digest, size in conn.execute(
+            "SELECT url, digest, size FROM entries ORDER BY accessed"
+        ).fetchall():
+            if total <= self.max_bytes:
+                break
+            conn.execute("DELETE FROM entries WHERE url = ?", (url,))
+            removed.add(digest)
+            total -= size
+        for digest in removed:
+            if conn.execute("SELECT 1 FROM entries WHERE digest = ? LIMIT 1", (digest,)).fetchone() is None:
+                try:
+                    os.remove(self._object_path(digest))
+                except FileNotFoundError:
+                    pass
+
+    def fetch(self, url, session, timeout=None):
+        cached = self.lookup(url)
+        if self.offline:
+            if cached is None:
+                raise OfflineCacheMiss(f"{url} is not cached and offline mode is on")
+            self.touch(url)
+            return cached["body"]
+
+        headers = {}
+        if cached is not None:
+            if cached["etag"]:
+                headers["If-None-Match"] = cached["etag"]
+            if cached["last_modified"]:
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        response = session.get(url, headers=headers, timeout=timeout)
+        if response.status_code == 304 and cached is not None:
+            self.touch(url)
+            return cached["body"]
+        response.raise_for_status()
+
+        if "no-store" not in response.headers.get("Cache-Control", ""):
+            self.store(
+                url,
+                response.content,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
+        return response.content
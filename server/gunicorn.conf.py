@@ -0,0 +1,102 @@
+# Production server settings. Run `gunicorn` from the server folder; it
+# reads this file, preloads the app once in the master and forks workers.
+import multiprocessing
+import os
+import shutil
+
+wsgi_app = "app:app"
+bind = os.environ.get("BIND", "0.0.0.0:5555")
+
+# Sync workers, one request at a time each: about two per core keeps the
+# CPUs busy while some wait on SQLite. WORKER_CLASS=gthread (with THREADS)
+# or gevent suits deployments that mostly wait on /parse-recipe(s) fetches.
+workers = int(os.environ.get("WEB_CONCURRENCY", multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get("WORKER_CLASS", "sync")
+threads = int(os.environ.get("THREADS", 4 if worker_class == "gthread" else 1))
+worker_connections = int(os.environ.get("WORKER_CONNECTIONS", 100))  # gevent only
+
+# Recycle workers now and then so slow leaks can't build up; the jitter
+# keeps them from all restarting at once
+max_requests = int(os.environ.get("MAX_REQUESTS", 2000))
+max_requests_jitter = int(os.environ.get("MAX_REQUESTS_JITTER", 200))
+# POST /parse-recipes fetches and parses its URLs before it responds
+timeout = int(os.environ.get("TIMEOUT", 120))
+graceful_timeout = 30
+keepalive = 5
+
+preload_app = True
+accesslog = os.environ.get("ACCESS_LOG")
+errorlog = "-"
+
+if worker_class == "gevent":
+    # Patch before the app is preloaded, or the master imports the
+    # unpatched socket and threading modules the workers inherit
+    from gevent import monkey
+    monkey.patch_all()
+
+# The in-process response cache can't see writes made in other workers,
+# so it stays off unless it is shared through Redis or asked for
+if workers > 1 and not os.environ.get("RESPONSE_CACHE_URL"):
+    os.environ.setdefault("RESPONSE_CACHE_ENABLED", "0")
+
+# Every worker writes its metrics here and /metrics adds them up
+os.environ.setdefault("METRICS_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "metrics"))
+
+
+def on_starting(server):
+    # Start the counts from zero, not from a previous run's workers
+    shutil.rmtree(os.environ["METRICS_DIR"], ignore_errors=True)
+    os.makedirs(os.environ["METRICS_DIR"])
+
+
+def when_ready(server):
+    # The app is loaded by now. Check the database answers before any
+    # worker exists, fail the parse jobs a previous run left unfinished
+    # (no worker can be running them yet), then close the master's
+    # connections: a pooled connection must never be shared by forked
+    # processes.
+    from config import app, db
+    from jobs import fail_unfinished_jobs
+    from sqlalchemy import text
+
+    with app.app_context():
+        db.session.execute(text("SELECT 1 FROM recipes LIMIT 1"))
+        failed = fail_unfinished_jobs()
+        db.session.remove()
+        db.engine.dispose()
+    if failed:
+        server.log.info("Marked %d unfinished parse jobs failed", failed)
+    if workers > 1 and app.config["RESPONSE_CACHE_ENABLED"] and not app.config["RESPONSE_CACHE_URL"]:
+        server.log.warning("Response cache is per process; set RESPONSE_CACHE_URL to share it between workers")
+
+
+def post_fork(server, worker):
+    from config import app, db
+
+    with app.app_context():
+        db.engine.dispose(close=False)
+
+
+def post_worker_init(worker):
+    # Open this worker's first connection (and run the SQLite pragmas) now
+    # rather than on its first request, and pick up similar-recipe
+    # refreshes a previous worker left queued
+    from config import app, db
+    from sqlalchemy import text
+
+    with app.app_context():
+        db.session.execute(text("SELECT 1"))
+        db.session.remove()
+    app.extensions["similar_refresher"].wake()
+
+
+def worker_exit(server, worker):
+    from config import app
+
+    app.extensions["metrics"].flush()
+
+
+def child_exit(server, worker):
+    from metrics import collect_dead_worker
+
+    collect_dead_worker(os.environ["METRICS_DIR"], worker.pid)
@@ -0,0 +1,221 @@
+import re
+from html.parser import HTMLParser
+
+try:
+    from lxml import etree
+except ImportError:  # lxml is optional; the stdlib parser is the fallback
+    etree = None
+
+from extractors import BOILERPLATE_TAGS, CHARS_PER_TOKEN, DEFAULT_TOKEN_BUDGET
+
+VOID_TAGS = {
+    "area", "base", "br", "col", "embed", "hr", "img", "input", "link",
+    "meta", "param", "source", "track", "wbr",
+}
+# Elements whose text is never page content
+RAW_TEXT_TAGS = {"script", "style", "noscript", "template"}
+MAIN_TAGS = {"article", "main"}
+LIST_TAGS = {"ul", "ol"}
+
+# class on the element -> field it feeds, as in the original CSS selectors
+CLASS_CAPTURES = {
+    "li": {"instruction": "instructions", "ingredient": "ingredients"},
+    "a": {"category": "categories"},
+}
+
+CHARSET_PATTERN = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+SPACE_PATTERN = re.compile(r"\s+")
+
+
+def _is_recipe_type(value):
+    return any(t.split("/")[-1].split(":")[-1] == "Recipe" for t in value.split())
+
+
+class PageScan:
+    # Everything the recipe extractors need from one page, gathered in a
+    # single pass without building a document tree
+
+    def __init__(self, token_budget=DEFAULT_TOKEN_BUDGET):
+        self.title = None
+        self.description = None
+        self.instructions = []
+        self.ingredients = []
+        self.categories = []
+        self.jsonld = []
+        self.has_microdata_recipe = False
+        self.has_rdfa_recipe = False
+        self.main_text = []
+        self.body_text = []
+        self._text_limit = token_budget * CHARS_PER_TOKEN
+        self._body_chars = 0
+        self._main_chars = 0
+        self._main_seen = False
+        self._stack = []  # (tag, role) for every open non-void element
+        self._buffers = {}  # role -> list of text pieces being captured
+        self._raw_depth = 0  # inside script/style: ignore text entirely
+        self._chrome_depth = 0  # inside nav/header/footer/...: not content text
+        self._main_depth = 0
+
+    # Parser target interface, shared by lxml and the stdlib adapter
+
+    def start(self, tag, attrs):
+        tag = tag.lower()
+        if attrs.get("itemtype") and "itemscope" in attrs and _is_recipe_type(attrs["itemtype"]):
+            self.has_microdata_recipe = True
+        if attrs.get("typeof") and _is_recipe_type(attrs["typeof"]):
+            self.has_rdfa_recipe = True
+
+        if tag == "meta":
+            if self.description is None and (attrs.get("name") or "").lower() == "description":
+                self.description = attrs.get("content", "")
+            return
+        if tag in VOID_TAGS:
+            return
+
+        if tag == "li":
+            # An open <li> in the same list is implicitly closed
+            for open_tag, _ in reversed(self._stack):
+                if open_tag in LIST_TAGS:
+                    break
+                if open_tag == "li":
+                    self.end("li")
+                    break
+
+        role = None
+        if tag == "script" and (attrs.get("type") or "").lower() == "application/ld+json":
+            role = "jsonld"
+        elif tag in RAW_TEXT_TAGS:
+            role = "raw"
+        elif tag in BOILERPLATE_TAGS:
+            role = "chrome"
+        elif tag == "h1" and self.title is None and "h1" not in self._buffers:
+            role = "h1"
+        elif tag in CLASS_CAPTURES:
+            classes = (attrs.get("class") or "").split()
+            for class_name, field in CLASS_CAPTURES[tag].items():
+                if class_name in classes:
+                    role = field
+                    break
+        if role is None and not self._main_seen and (tag in MAIN_TAGS or attrs.get("role") == "main"):
+            role = "main"
+            self._main_seen = True
+
+        if role == "raw":
+            self._raw_depth += 1
+        elif role == "chrome":
+            self._chrome_depth += 1
+        elif role == "main":
+            self._main_depth += 1
+        elif role is not None:
+            self._buffers[role] = []
+        self._stack.append((tag, role))
+
+    def end(self, tag):
+        tag = tag.lower()
+        if not any(open_tag == tag for open_tag, _ in self._stack):
+            return  # stray end tag
+        while self._stack:
+            open_tag, role = self._stack.pop()
+            self._close(role)
+            if open_tag == tag:
+                break
+
+    def data(self, text):
+        if "jsonld" in self._buffers:
+            self._buffers["jsonld"].append(text)
+            return
+        if self._raw_depth:
+            return
+        for role, buffer in self._buffers.items():
+            buffer.append(text)
+
+        text = text.strip()
+        if not text or self._chrome_depth:
+            return
+        if self._body_chars < self._text_limit:
+            self.body_text.append(text)
+            self._body_chars += len(text) + 1
+        if self._main_depth and self._main_chars < self._text_limit:
+            self.main_text.append(text)
+            self._main_chars += len(text) + 1
+
+    def close(self):
+        while self._stack:
+            self._close(self._stack.pop()[1])
+        return self
+
+    def _close(self, role):
+        if role is None:
+            return
+        if role == "raw":
+            self._raw_depth -= 1
+            return
+        if role == "chrome":
+            self._chrome_depth -= 1
+            return
+        if role == "main":
+            self._main_depth -= 1
+            return
+        pieces = self._buffers.pop(role, [])
+        if role == "jsonld":
+            self.jsonld.append("".join(pieces))
+            return
+        text = SPACE_PATTERN.sub(" ", " ".join(piece.strip() for piece in pieces)).strip()
+        if role == "h1":
+            self.title = text
+        elif text:
+            getattr(self, role).append(text)
+
+    # Derived values
+
+    def content_text(self):
+        # Main article text if the page marks one up, else the whole body,
+        # with the page heading kept in front; cut to the token budget
+        lines = self.main_text or self.body_text
+        if self.title and (not lines or lines[0] != self.title):
+            lines = [self.title] + lines
+        return "\n".join(lines)[:self._text_limit]
+
+
+class _StdlibAdapter(HTMLParser):
+    def __init__(self, target):
+        super().__init__(convert_charrefs=True)
+        self.target = target
+
+    def handle_starttag(self, tag, attrs):
+        self.target.start(tag, {name: value or "" for name, value in attrs})
+
+    def handle_startendtag(self, tag, attrs):
+        self.handle_starttag(tag, attrs)
+        if tag.lower() not in VOID_TAGS:
+            self.target.end(tag)
+
+    def handle_endtag(self, tag):
+        self.target.end(tag)
+
+    def handle_data(self, data):
+        self.target.data(data)
+
+
+def _decode(content):
+    if isinstance(content, str):
+        return content
+    match = CHARSET_PATTERN.search(content[:4096])
+    encoding = match.group(1).decode("ascii") if match else "utf-8"
+    try:
+        return content.decode(encoding, errors="replace")
+    except LookupError:
+        return content.decode("utf-8", errors="replace")
+
+
+def scan_page(content, token_budget=DEFAULT_TOKEN_BUDGET):
+    scan = PageScan(token_budget)
+    if etree is not None:
+        # libxml2 drives the same callbacks from C
+        parser = etree.HTMLParser(target=scan, recover=True)
+        etree.fromstring(content if content else b"<html></html>", parser)
+        return scan
+    adapter = _StdlibAdapter(scan)
+    adapter.feed(_decode(content))
+    adapter.close()
+    return scan.close()
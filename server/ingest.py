@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+
+import argparse
+import atexit
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from urllib.parse import urlsplit
+
+from config import db
+from parsers import fetch_page, extract_recipe, parse_with_ai
+from bulk_import import insert_recipe_batch
+from similarity import queue_similar
+
+DEFAULT_FETCH_WORKERS = 16
+DEFAULT_PER_HOST = 2
+DEFAULT_BATCH_SIZE = 50
+
+_parser_pool = None
+_parser_pool_pid = None
+_parser_pool_workers = None
+_parser_pool_lock = threading.Lock()
+
+
+class HostLimiter:
+    # Caps in-flight requests per host so one site isn't hammered
+
+    def __init__(self, per_host):
+        self.per_host = per_host
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+    def semaphore(self, url):
+        host = urlsplit(url).netloc.lower()
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(self.per_host)
+            return self._semaphores[host]
+
+
+def _start_parser_pool(workers):
+    # Spawned workers don't inherit the server's threads or DB connections
+    return ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def shared_parser_pool(workers):
+    # The server's parser pool: started on first use in each worker process
+    # and reused by every request after. A pool inherited through fork is
+    # replaced. None when parsing stays on the fetch threads.
+    global _parser_pool, _parser_pool_pid, _parser_pool_workers
+    if workers <= 1:
+        return None
+    with _parser_pool_lock:
+        if _parser_pool is None or _parser_pool_pid != os.getpid():
+            _parser_pool = _start_parser_pool(workers)
+            _parser_pool_pid = os.getpid()
+            _parser_pool_workers = workers
+        return _parser_pool
+
+
+def replace_parser_pool(broken):
+    # Swap out a shared pool that raised BrokenProcessPool (a parser process
+    # died). Requests that hit it at once share one replacement.
+    global _parser_pool
+    with _parser_pool_lock:
+        if _parser_pool is broken and _parser_pool_pid == os.getpid():
+            broken.shutdown(wait=False)
+            _parser_pool = _start_parser_pool(_parser_pool_workers)
+        return _parser_pool
+
+
+@atexit.register
+def shutdown_parser_pool():
+    global _parser_pool
+    with _parser_pool_lock:
+        if _parser_pool is not None and _parser_pool_pid == os.getpid():
+            _parser_pool.shutdown()
+        _parser_pool = None
+
+
+def _normalize(recipe):
+    # Shape a parsed recipe like a bulk import line
+    return {
+        "title": recipe["title"] or "Untitled",
+        "description": recipe["description"],
+        "instructions": recipe["instructions"],
+        "servings": recipe.get("servings"),
+        "ingredients": [
+            {"name": ingredient["name"], "quantity": ingredient.get("quantity") or ""}
+            for ingredient in recipe["ingredients"] if ingredient.get("name")
+        ],
+        "categories": list(dict.fromkeys(name.strip() for name in recipe["categories"] if name.strip())),
+    }
+
+
+def ingest_urls(urls, fetch_workers=DEFAULT_FETCH_WORKERS, per_host=DEFAULT_PER_HOST,
+                parse_workers=None, batch_size=DEFAULT_BATCH_SIZE, parser_pool=None):
+    # Fetch on a thread pool, parse HTML on a process pool, run AI fallbacks
+    # back on the threads, and insert finished recipes in batches. Must be
+    # called inside an app context. Returns one result per URL, in order.
+    # Without a `parser_pool`, one of `parse_workers` processes is started
+    # for this call and shut down after it.
+    urls = list(dict.fromkeys(urls))
+    parse_workers = os.cpu_count() if parse_workers is None else parse_workers
+    limiter = HostLimiter(per_host)
+    results = {url: {"url": url, "status": "failed", "recipe_id": None, "error": None} for url in urls}
+    ready = []  # (url, recipe) waiting to be inserted
+
+    def fetch(url):
+        with limiter.semaphore(url):
+            return fetch_page(url)
+
+    def commit_ready():
+        batch = [_normalize(recipe) for _, recipe in ready]
+        try:
+            recipe_ids = insert_recipe_batch(batch)
+            queue_similar(recipe_ids)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Error: {e}")
+            for url, _ in ready:
+                results[url]["error"] = "Database error while saving this batch."
+        else:
+            for (url, _), recipe_id in zip(ready, recipe_ids):
+                results[url].update(status="created", recipe_id=recipe_id)
+        ready.clear()
+
+    own_pool = parser_pool is None and parse_workers > 1
+    if own_pool:
+        parser_pool = _start_parser_pool(parse_workers)
+
+    def submit_extract(html):
+        nonlocal parser_pool
+        if parser_pool is None:
+            return io_pool.submit(extract_recipe, html)
+        try:
+            return parser_pool.submit(extract_recipe, html)
+        except BrokenProcessPool:
+            # A parser process died and took the pool with it; parses
+            # already handed to it fail, the rest go to a new pool
+            if own_pool:
+                parser_pool.shutdown(wait=False)
+                parser_pool = _start_parser_pool(parse_workers)
+            else:
+                parser_pool = replace_parser_pool(parser_pool)
+            return (parser_pool or io_pool).submit(extract_recipe, html)
+
+    with ThreadPoolExecutor(fetch_workers, thread_name_prefix="ingest-fetch") as io_pool:
+        pending = {io_pool.submit(fetch, url): ("fetch", url) for url in urls}
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, url = pending.pop(future)
+                    try:
+                        value = future.result()
+                    except Exception as e:
+                        print(f"Error parsing URL: {e}")
+                        results[url]["error"] = str(e)
+                        continue
+
+                    if stage == "fetch":
+                        pending[submit_extract(value)] = ("extract", url)
+                    elif stage == "extract":
+                        recipe, text_content = value
+                        if text_content is None:
+                            ready.append((url, recipe))
+                        else:
+                            pending[io_pool.submit(parse_with_ai, text_content, recipe)] = ("ai", url)
+                    else:
+                        ready.append((url, value))
+
+                if len(ready) >= batch_size:
+                    commit_ready()
+            if ready:
+                commit_ready()
+        finally:
+            # Drop this call's work that hasn't started, so neither pool
+            # runs it (shutdown's cancel_futures needs Python 3.9)
+            for future in pending:
+                future.cancel()
+            if own_pool:
+                parser_pool.shutdown()
+
+    return [results[url] for url in urls]
+
+
+def main():
+    from app import app
+    from config import response_cache
+    from maintenance import STALE_CACHE_NOTE
+
+    parser = argparse.ArgumentParser(description="Parse and save recipes from many URLs.")
+    parser.add_argument("urls", nargs="*", help="Recipe page URLs")
+    parser.add_argument("-f", "--file", help="File with one URL per line")
+    parser.add_argument("--fetch-workers", type=int, default=app.config["INGEST_FETCH_WORKERS"])
+    parser.add_argument("--per-host", type=int, default=app.config["INGEST_PER_HOST"])
+    parser.add_argument("--parse-workers", type=int, default=app.config["INGEST_PARSE_WORKERS"])
+    parser.add_argument("--batch-size", type=int, default=app.config["INGEST_BATCH_SIZE"])
+    args = parser.parse_args()
+
+    urls = list(args.urls)
+    if args.file:
+        with open(args.file) as f:
+            urls.extend(line.strip() for line in f if line.strip() and not line.startswith("#"))
+    if not urls:
+        parser.error("no URLs given")
+
+    started = time.perf_counter()
+    with app.app_context():
+        results = ingest_urls(urls, args.fetch_workers, args.per_host, args.parse_workers, args.batch_size)
+        created = sum(1 for result in results if result["status"] == "created")
+        cache_reached = not created or response_cache.bump_shared("recipes", "categories")
+
+    for result in results:
+        if result["status"] != "created":
+            print(f"Failed: {result['url']}: {result['error']}")
+    print(f"Created {created} of {len(results)} recipes in {time.perf_counter() - started:.1f}s.")
+    if not cache_reached:
+        print(STALE_CACHE_NOTE)
+
+
+if __name__ == '__main__':
+    main()
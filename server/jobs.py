@@ -0,0 +1,82 @@
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from sqlalchemy import update
+
+from config import db
+from models import ParseJob
+
+UNFINISHED_ERROR = "The server stopped before this job finished."
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class ParseJobQueue:
+    # Runs `handler(url) -> recipe_id` on a bounded thread pool. Jobs are
+    # persisted in parse_jobs so any server process can report their status.
+
+    def __init__(self, app, handler, max_workers=4, max_queued=100):
+        self.app = app
+        self.handler = handler
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="parse-worker")
+        # Running plus waiting jobs; beyond this, enqueue is refused
+        self._slots = threading.BoundedSemaphore(max_workers + max_queued)
+
+    def enqueue(self, url):
+        if not self._slots.acquire(blocking=False):
+            raise QueueFullError("Parse queue is full.")
+        try:
+            job = ParseJob(id=uuid.uuid4().hex, url=url, status="queued")
+            db.session.add(job)
+            db.session.commit()
+            future = self.executor.submit(self._run, job.id)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return job
+
+    def _run(self, job_id):
+        with self.app.app_context():
+            job = db.session.get(ParseJob, job_id)
+            job.status = "running"
+            db.session.commit()
+            url = job.url
+
+            try:
+                recipe_id = self.handler(url)
+            except Exception as e:
+                db.session.rollback()
+                print(f"Error: {e}")
+                job = db.session.get(ParseJob, job_id)
+                job.status = "failed"
+                job.error = str(e) or e.__class__.__name__
+                db.session.commit()
+                return
+
+            job = db.session.get(ParseJob, job_id)
+            job.status = "succeeded"
+            job.recipe_id = recipe_id
+            db.session.commit()
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
+
+
+def fail_unfinished_jobs(older_than=None):
+    # Jobs are only run by the process that queued them, so ones left queued
+    # or running by a process that died never finish. Marks them failed:
+    # all of them when no server process is running, otherwise only those
+    # not updated in `older_than` seconds. Returns how many.
+    unfinished = update(ParseJob).where(ParseJob.status.in_(("queued", "running")))
+    if older_than is not None:
+        unfinished = unfinished.where(ParseJob.updated_at < datetime.utcnow() - timedelta(seconds=older_than))
+    result = db.session.execute(
+        unfinished.values(status="failed", error=UNFINISHED_ERROR).execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
@@ -0,0 +1,277 @@
+import time
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import delete, exists, func, select, text, update
+
+from ai_models import completion_cache
+from config import db, response_cache
+from models import Recipe, Ingredient, Category, association_table
+from pantry import rebuild_pantry_index
+from documents import rebuild_documents, refresh_documents, DEFAULT_BATCH_SIZE
+from jobs import fail_unfinished_jobs
+from quantities import parse_quantity
+from similarity import rebuild_similar, refresh_pending_similar
+from search import fts_enabled, rebuild_search_index
+
+DEFAULT_CHUNK_SIZE = 1000
+# Printed when a command changed data the server may still serve from its
+# in-process response cache
+STALE_CACHE_NOTE = (
+    "The server may still serve cached responses from before this change: "
+    "restart it, or set RESPONSE_CACHE_URL so commands can reach a shared cache."
+)
+
+maintenance_cli = AppGroup("maintenance", help="Bulk data maintenance for the recipe database.")
+
+
+class MaintenanceError(Exception):
+    pass
+
+
+def ensure_cascades():
+    # The set-based deletes leave ingredients, category links, documents and
+    # index rows to ON DELETE CASCADE, which SQLite only honours with foreign_keys on
+    if db.engine.dialect.name == "sqlite" and not db.session.execute(text("PRAGMA foreign_keys")).scalar():
+        raise MaintenanceError("SQLite foreign keys are off, so deletes would not cascade")
+
+
+def delete_recipes_in_range(start_id, end_id, chunk_size=DEFAULT_CHUNK_SIZE, dry_run=False):
+    # Delete recipes with start_id <= id <= end_id using one DELETE per chunk
+    # of chunk_size recipes, committing after each so no transaction holds
+    # the write lock for long. Returns the number of recipes deleted.
+    if dry_run:
+        return db.session.execute(
+            select(func.count()).select_from(Recipe).where(Recipe.id.between(start_id, end_id))
+        ).scalar()
+
+    ensure_cascades()
+    deleted = 0
+    low = start_id
+    while low <= end_id:
+        # The id that ends this chunk, so sparse ids still give full chunks
+        high = db.session.execute(
+            select(Recipe.id).where(Recipe.id.between(low, end_id)).order_by(Recipe.id)
+            .offset(chunk_size - 1).limit(1)
+        ).scalar()
+        if high is None:
+            high = end_id
+        if fts_enabled():
+            db.session.execute(text("DELETE FROM recipes_fts WHERE rowid BETWEEN :low AND :high"), {"low": low, "high": high})
+        result = db.session.execute(
+            delete(Recipe).where(Recipe.id.between(low, high)).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        deleted += result.rowcount
+        low = high + 1
+    return deleted
+
+
+def delete_orphan_categories(dry_run=False):
+    # Categories no recipe links to any more
+    orphaned = ~exists().where(association_table.c.category_id == Category.id)
+    if dry_run:
+        return db.session.execute(select(func.count()).select_from(Category).where(orphaned)).scalar()
+    result = db.session.execute(delete(Category).where(orphaned).execution_options(synchronize_session=False))
+    db.session.commit()
+    return result.rowcount
+
+
+def reindex():
+    # Rebuild the full-text and pantry indexes from the base tables, then
+    # the database's own indexes. Returns (search rows, pantry postings).
+    search_rows = rebuild_search_index()
+    postings = rebuild_pantry_index()
+    if db.engine.dialect.name == "sqlite":
+        db.session.execute(text("REINDEX"))
+        db.session.commit()
+    elif db.engine.dialect.name == "postgresql":
+        with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            conn.execute(text(f"REINDEX DATABASE {conn.engine.url.database}"))
+    return search_rows, postings
+
+
+def parse_quantities(batch_size=DEFAULT_BATCH_SIZE):
+    # Backfill the parsed quantity columns from each ingredient's raw string,
+    # one batch of recipes per transaction, and rebuild those recipes'
+    # documents. Returns (ingredients parsed, ingredients changed).
+    parsed = changed = 0
+    last_id = 0
+    while True:
+        recipe_ids = db.session.execute(
+            select(Recipe.id).where(Recipe.id > last_id).order_by(Recipe.id).limit(batch_size)
+        ).scalars().all()
+        if not recipe_ids:
+            break
+        rows = db.session.execute(
+            select(Ingredient.id, Ingredient.quantity, Ingredient.amount, Ingredient.amount_max, Ingredient.unit, Ingredient.note)
+            .where(Ingredient.recipe_id.between(recipe_ids[0], recipe_ids[-1]))
+        ).all()
+        updates = []
+        for ingredient_id, quantity, *stored in rows:
+            values = parse_quantity(quantity)
+            if tuple(stored) != values:
+                updates.append({"id": ingredient_id, **values._asdict()})
+        if updates:
+            # One executemany UPDATE by primary key
+            db.session.execute(update(Ingredient), updates)
+        refresh_documents(recipe_ids)
+        db.session.commit()
+        db.session.expunge_all()
+        parsed += len(rows)
+        changed += len(updates)
+        last_id = recipe_ids[-1]
+    return parsed, changed
+
+
+def database_size():
+    if db.engine.dialect.name != "sqlite":
+        return None
+    page_count = db.session.execute(text("PRAGMA page_count")).scalar()
+    page_size = db.session.execute(text("PRAGMA page_size")).scalar()
+    db.session.commit()
+    return page_count * page_size
+
+
+def vacuum(analyze_only=False):
+    # VACUUM can't run inside a transaction, so use an autocommit connection
+    db.session.remove()
+    dialect = db.engine.dialect.name
+    with db.engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if dialect == "sqlite":
+            if not analyze_only:
+                conn.execute(text("VACUUM"))
+            conn.execute(text("ANALYZE"))
+        elif dialect == "postgresql":
+            conn.execute(text("ANALYZE" if analyze_only else "VACUUM (ANALYZE)"))
+        elif dialect in ("mysql", "mariadb"):
+            tables = ", ".join(db.metadata.tables)
+            conn.execute(text(f"{'ANALYZE' if analyze_only else 'OPTIMIZE'} TABLE {tables}"))
+        else:
+            raise MaintenanceError(f"No VACUUM/ANALYZE support for {dialect}")
+
+
+def _report(message, started):
+    click.echo(f"{message} in {time.perf_counter() - started:.2f}s")
+
+
+def bump_server_cache(*scopes):
+    # Commands can't reach the server's default in-process response cache
+    if not response_cache.bump_shared(*scopes):
+        click.echo(STALE_CACHE_NOTE)
+
+
+@maintenance_cli.command("delete-recipes")
+@click.option("--from", "start_id", type=int, required=True, help="First recipe id to delete")
+@click.option("--to", "end_id", type=int, required=True, help="Last recipe id to delete")
+@click.option("--chunk-size", type=click.IntRange(min=1), default=DEFAULT_CHUNK_SIZE, show_default=True, help="Recipes per transaction")
+@click.option("--dry-run", is_flag=True, help="Only count the recipes that would be deleted")
+def delete_recipes_command(start_id, end_id, chunk_size, dry_run):
+    """Delete a range of recipes along with their ingredients and links."""
+    started = time.perf_counter()
+    try:
+        count = delete_recipes_in_range(start_id, end_id, chunk_size, dry_run)
+    except MaintenanceError as e:
+        raise click.ClickException(str(e))
+    _report(f"{'Would delete' if dry_run else 'Deleted'} {count} recipes with ids {start_id}-{end_id}", started)
+    if count and not dry_run:
+        bump_server_cache("recipes", "categories")
+
+
+@maintenance_cli.command("orphan-categories")
+@click.option("--dry-run", is_flag=True, help="Only count the orphaned categories")
+def orphan_categories_command(dry_run):
+    """Delete categories that no recipe uses."""
+    started = time.perf_counter()
+    count = delete_orphan_categories(dry_run)
+    _report(f"{'Would delete' if dry_run else 'Deleted'} {count} orphaned categories", started)
+    if count and not dry_run:
+        bump_server_cache("categories")
+
+
+@maintenance_cli.command("reindex")
+def reindex_command():
+    """Rebuild the search and pantry indexes and the database indexes."""
+    started = time.perf_counter()
+    search_rows, postings = reindex()
+    _report(f"Indexed {search_rows} recipes for search and {postings} pantry tokens", started)
+
+
+@maintenance_cli.command("rebuild-documents")
+@click.option("--batch-size", type=click.IntRange(min=1), default=DEFAULT_BATCH_SIZE, show_default=True, help="Recipes per transaction")
+def rebuild_documents_command(batch_size):
+    """Rebuild every recipe's pre-encoded document from the base tables."""
+    started = time.perf_counter()
+    count = rebuild_documents(batch_size)
+    _report(f"Rebuilt {count} recipe documents", started)
+    bump_server_cache("recipes", "categories")
+
+
+@maintenance_cli.command("parse-quantities")
+@click.option("--batch-size", type=click.IntRange(min=1), default=DEFAULT_BATCH_SIZE, show_default=True, help="Recipes per transaction")
+def parse_quantities_command(batch_size):
+    """Parse every ingredient quantity into amount, unit and note."""
+    started = time.perf_counter()
+    parsed, changed = parse_quantities(batch_size)
+    _report(f"Parsed {parsed} ingredient quantities ({changed} changed)", started)
+    if changed:
+        bump_server_cache("recipes", "categories")
+
+
+@maintenance_cli.command("rebuild-similar")
+def rebuild_similar_command():
+    """Recompute every recipe's similar-recipe list (needs numpy and scipy)."""
+    started = time.perf_counter()
+    try:
+        count = rebuild_similar()
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    _report(f"Stored {count} similar-recipe pairs", started)
+
+
+@maintenance_cli.command("refresh-similar")
+@click.option("--batch-size", type=click.IntRange(min=1), default=500, show_default=True, help="Queued recipes per transaction")
+def refresh_similar_command(batch_size):
+    """Recompute queued similar-recipe lists now, e.g. after a load with the server stopped (needs numpy and scipy)."""
+    started = time.perf_counter()
+    try:
+        count = refresh_pending_similar(batch_size)
+    except RuntimeError as e:
+        raise click.ClickException(str(e))
+    _report(f"Refreshed similar recipes for {count} recipes", started)
+
+
+@maintenance_cli.command("fail-stale-jobs")
+@click.option("--older-than", type=click.IntRange(min=0), default=3600, show_default=True, help="Seconds since the job last changed")
+def fail_stale_jobs_command(older_than):
+    """Mark parse jobs stuck queued or running (their server process died) as failed."""
+    started = time.perf_counter()
+    count = fail_unfinished_jobs(older_than)
+    _report(f"Marked {count} stale parse jobs failed", started)
+
+
+@maintenance_cli.command("purge-ai-cache")
+def purge_ai_cache_command():
+    """Delete AI completions older than AI_CACHE_TTL from the on-disk cache."""
+    started = time.perf_counter()
+    if completion_cache is None:
+        raise click.ClickException("The AI completion cache is off (AI_CACHE=0)")
+    count = completion_cache.purge_expired()
+    _report(f"Purged {count} expired AI completions", started)
+
+
+@maintenance_cli.command("vacuum")
+@click.option("--analyze-only", is_flag=True, help="Refresh planner statistics without rewriting the database")
+def vacuum_command(analyze_only):
+    """Reclaim free space and refresh the query planner's statistics."""
+    started = time.perf_counter()
+    before = database_size()
+    try:
+        vacuum(analyze_only)
+    except MaintenanceError as e:
+        raise click.ClickException(str(e))
+    after = database_size()
+    done = "Analyzed" if analyze_only else "Vacuumed and analyzed"
+    if before is not None:
+        done += f" ({before / 1048576:.1f} MB -> {after / 1048576:.1f} MB)"
+    _report(done, started)
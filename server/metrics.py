@@ -0,0 +1,347 @@
+import fcntl
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import Response, current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+STAGE_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# With METRICS_DIR set, how often a worker writes its numbers out
+FLUSH_INTERVAL = 1.0  # seconds
+ARCHIVE_FILE = "archive.json"
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs):
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value):
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _sum_series(series):
+    # Adds up histogram series that share label values
+    merged = {}
+    for key, counts, total, count in series:
+        state = merged.get(tuple(key))
+        if state is None:
+            merged[tuple(key)] = [list(counts), total, count]
+        else:
+            state[0] = [a + b for a, b in zip(state[0], counts)]
+            state[1] += total
+            state[2] += count
+    return merged
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, description, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label values -> [per-bucket counts, sum, count]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels[name]) for name in self.labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def snapshot(self):
+        # [[label values, per-bucket counts, sum, count], ...], JSON-safe
+        with self._lock:
+            return [[list(key), list(counts), total, count] for key, (counts, total, count) in self._values.items()]
+
+    def merge(self, series):
+        return [[list(key), *state] for key, state in _sum_series(series).items()]
+
+    def lines(self, series):
+        for key, (counts, total, count) in sorted(_sum_series(series).items()):
+            pairs = list(zip(self.labels, key))
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                yield f"{self.name}_bucket{_format_labels(pairs + [('le', _format_value(bound))])} {cumulative}"
+            yield f"{self.name}_bucket{_format_labels(pairs + [('le', '+Inf')])} {count}"
+            yield f"{self.name}_sum{_format_labels(pairs)} {_format_value(total)}"
+            yield f"{self.name}_count{_format_labels(pairs)} {count}"
+
+
+class Sampled:
+    # Values kept by other code, read from `collect()` (a {label values:
+    # number} dict) whenever metrics are snapshotted. A "counter" only goes
+    # up, and a replaced worker's last counts stay in the totals; a "gauge"
+    # is a current level, and goes with its worker.
+
+    def __init__(self, name, description, collect, kind="counter", labels=()):
+        self.name = name
+        self.description = description
+        self.collect = collect
+        self.kind = kind
+        self.labels = tuple(labels)
+
+    def snapshot(self):
+        return [[[str(value) for value in key], number] for key, number in self.collect().items()]
+
+    def _totals(self, series):
+        totals = {}
+        for key, number in series:
+            totals[tuple(key)] = totals.get(tuple(key), 0) + number
+        return totals
+
+    def merge(self, series):
+        if self.kind != "counter":
+            return []
+        return [[list(key), number] for key, number in self._totals(series).items()]
+
+    def lines(self, series):
+        for key, number in sorted(self._totals(series).items()):
+            yield f"{self.name}{_format_labels(list(zip(self.labels, key)))} {_format_value(number)}"
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def snapshot(self):
+        return {metric.name: metric.snapshot() for metric in self.metrics}
+
+    def render(self, snapshots=None):
+        # Prometheus text exposition format. `snapshots` from several
+        # processes are summed; by default this process's own values.
+        snapshots = [self.snapshot()] if snapshots is None else snapshots
+        out = []
+        for metric in self.metrics:
+            out.append(f"# HELP {metric.name} {metric.description}")
+            out.append(f"# TYPE {metric.name} {metric.kind}")
+            out.extend(metric.lines([series for snapshot in snapshots for series in snapshot.get(metric.name, [])]))
+        return "\n".join(out) + "\n"
+
+
+def _write_json(path, value):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(value, f)
+    os.replace(tmp, path)
+
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def _locked(directory):
+    # Keeps a reader from seeing a dead worker's numbers both in its own
+    # file and in the archive while the master folds one into the other
+    with open(os.path.join(directory, ".lock"), "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def collect_dead_worker(directory, pid):
+    # Called in the gunicorn master when a worker exits: folds its last
+    # snapshot into archive.json so totals keep counting up
+    path = os.path.join(directory, f"{pid}.json")
+    with _locked(directory):
+        snapshot = _read_json(path)
+        if snapshot is None:
+            return
+        archive_path = os.path.join(directory, ARCHIVE_FILE)
+        archive = _read_json(archive_path) or {}
+        for metric in registry.metrics:
+            series = archive.get(metric.name, []) + snapshot.get(metric.name, [])
+            archive[metric.name] = metric.merge(series)
+        _write_json(archive_path, archive)
+        os.remove(path)
+
+
+# Collectors live at module level so code that runs outside a request
+# (parse workers, ingest) can record into them without the app
+registry = Registry()
+REQUEST_SECONDS = registry.register(Histogram(
+    "smartchef_http_request_duration_seconds", "Time spent handling a request, by route.",
+    labels=("method", "route", "status"),
+))
+RESPONSE_BYTES = registry.register(Histogram(
+    "smartchef_http_response_size_bytes", "Response body size, by route. Streamed responses are not counted.",
+    labels=("method", "route"), buckets=SIZE_BUCKETS,
+))
+REQUEST_QUERIES = registry.register(Histogram(
+    "smartchef_db_queries_per_request", "SQL statements executed per request, by route.",
+    labels=("method", "route"), buckets=QUERY_BUCKETS,
+))
+REQUEST_DB_SECONDS = registry.register(Histogram(
+    "smartchef_db_seconds_per_request", "Time spent in SQL statements per request, by route.",
+    labels=("method", "route"),
+))
+PARSE_STAGE_SECONDS = registry.register(Histogram(
+    "smartchef_parse_stage_duration_seconds", "Time spent in each recipe parsing stage (fetch, html_parse, llm).",
+    labels=("stage", "outcome"), buckets=STAGE_BUCKETS,
+))
+
+
+def add_server_timing(name, seconds, description=None):
+    # Adds an entry to the current request's Server-Timing header, if any
+    if has_request_context() and "request_metrics" in g:
+        g.request_metrics["timings"].append((name, seconds, description))
+
+
+def timed_stage(stage):
+    # Records how long each call takes in PARSE_STAGE_SECONDS. Calls made
+    # in ingest's spawned parser processes land in that process's registry
+    # and aren't exported.
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            outcome = "error"
+            try:
+                result = fn(*args, **kwargs)
+                outcome = "ok"
+                return result
+            finally:
+                elapsed = time.perf_counter() - started
+                PARSE_STAGE_SECONDS.observe(elapsed, stage=stage, outcome=outcome)
+                add_server_timing(stage, elapsed)
+        return wrapper
+    return decorator
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.metrics_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if has_request_context() and "request_metrics" in g:
+        g.request_metrics["queries"] += 1
+        g.request_metrics["db_seconds"] += time.perf_counter() - context.metrics_started
+
+
+class Metrics:
+    # Per-request latency, response size and SQL counts, served in
+    # Prometheus text format on /metrics. Counts are per process unless
+    # METRICS_DIR is set: then each process writes its numbers there and
+    # /metrics adds up every process's file.
+
+    def __init__(self, app=None):
+        self.directory = None
+        self._flush_timer = None
+        self._flush_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions["metrics"] = self
+        self.directory = app.config.get("METRICS_DIR")
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+        if not app.config.get("METRICS_ENABLED", True):
+            return
+        if not event.contains(Engine, "before_cursor_execute", _before_cursor_execute):
+            event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+            event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+        app.add_url_rule("/metrics", "metrics", self.export)
+
+    def flush(self):
+        if self.directory:
+            _write_json(os.path.join(self.directory, f"{os.getpid()}.json"), registry.snapshot())
+
+    def _schedule_flush(self):
+        # Write at most once per FLUSH_INTERVAL, but never leave the last
+        # requests unwritten
+        with self._flush_lock:
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(FLUSH_INTERVAL, self._scheduled_flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def _scheduled_flush(self):
+        with self._flush_lock:
+            self._flush_timer = None
+        self.flush()
+
+    def export(self):
+        if not self.directory:
+            return Response(registry.render(), content_type=CONTENT_TYPE)
+        self.flush()
+        with _locked(self.directory):
+            names = [name for name in os.listdir(self.directory) if name.endswith(".json")]
+            snapshots = [_read_json(os.path.join(self.directory, name)) for name in names]
+        return Response(registry.render([snapshot for snapshot in snapshots if snapshot]), content_type=CONTENT_TYPE)
+
+    def _start(self):
+        g.request_metrics = {"started": time.perf_counter(), "queries": 0, "db_seconds": 0.0, "timings": [], "done": False}
+
+    def _record(self, status, response=None):
+        stats = g.request_metrics
+        stats["done"] = True
+        elapsed = time.perf_counter() - stats["started"]
+        method = request.method
+        # The URL rule, not the path, so ids don't make a series per recipe
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        REQUEST_SECONDS.observe(elapsed, method=method, route=route, status=status)
+        REQUEST_QUERIES.observe(stats["queries"], method=method, route=route)
+        REQUEST_DB_SECONDS.observe(stats["db_seconds"], method=method, route=route)
+        if response is not None and not response.is_streamed and response.content_length is not None:
+            RESPONSE_BYTES.observe(response.content_length, method=method, route=route)
+        if self.directory:
+            self._schedule_flush()
+        return elapsed
+
+    def _finish(self, response):
+        if "request_metrics" not in g or request.endpoint == "metrics":
+            return response
+        elapsed = self._record(response.status_code, response)
+        if current_app.config.get("SERVER_TIMING", False):
+            stats = g.request_metrics
+            entries = [f'db;dur={stats["db_seconds"] * 1000:.1f};desc="{stats["queries"]} SQL statements"']
+            for name, seconds, description in stats["timings"]:
+                entry = f"{name};dur={seconds * 1000:.1f}"
+                entries.append(entry + f';desc="{description}"' if description else entry)
+            entries.append(f"total;dur={elapsed * 1000:.1f}")
+            response.headers["Server-Timing"] = ", ".join(entries)
+        return response
+
+    def _teardown(self, exc):
+        # Requests that raised never reach after_request
+        if exc is not None and "request_metrics" in g and not g.request_metrics["done"]:
+            self._record(500)
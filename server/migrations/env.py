@@ -97,14 +97,27 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
-        context.configure(
-            connection=connection,
-            target_metadata=get_metadata(),
-            **conf_args
-        )
-
-        with context.begin_transaction():
-            context.run_migrations()
+        if connection.dialect.name == 'sqlite':
+            # Batch migrations rebuild SQLite tables by copy and drop, and
+            # dropping a table with foreign keys on would cascade deletes
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            connection.commit()
+
+        try:
+            context.configure(
+                connection=connection,
+                target_metadata=get_metadata(),
+                **conf_args
+            )
+
+            with context.begin_transaction():
+                context.run_migrations()
+        finally:
+            if connection.dialect.name == 'sqlite':
+                # The connection goes back to the app's pool, even when a
+                # migration fails; restore the setting
+                connection.exec_driver_sql('PRAGMA foreign_keys=ON')
+                connection.commit()
 
 
 if context.is_offline_mode():
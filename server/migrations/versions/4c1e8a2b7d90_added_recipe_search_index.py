@@ -0,0 +1,43 @@
+"""Added recipe search index
+
+Revision ID: 4c1e8a2b7d90
+Revises: a07b645f4571
+Create Date: 2024-10-02 10:12:41.218734
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4c1e8a2b7d90'
+down_revision = 'a07b645f4571'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # FTS5 is SQLite-only; other backends fall back to title matching
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS recipes_fts USING fts5("
+        "title, description, instructions, ingredients, "
+        "tokenize = 'porter unicode61 remove_diacritics 2')"
+    )
+    # Backfill from existing recipes
+    op.execute(
+        "INSERT INTO recipes_fts (rowid, title, description, instructions, ingredients) "
+        "SELECT r.id, r.title, COALESCE(r.description, ''), "
+        "       COALESCE((SELECT group_concat(j.value, char(10)) FROM json_each(r.instructions) j), ''), "
+        "       COALESCE((SELECT group_concat(i.name, char(10)) FROM ingredients i WHERE i.recipe_id = r.id), '') "
+        "FROM recipes r"
+    )
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+
+    op.execute("DROP TABLE IF EXISTS recipes_fts")
@@ -1,11 +1,52 @@
+from sqlalchemy.orm import validates
 from sqlalchemy_serializer import SerializerMixin
-from config import db
+from config import db, password_hasher
+from quantities import parse_quantity
 from sqlalchemy.dialects.postgresql import JSON  # Import JSON type for lists
 
+# Ingredients are numbered this far apart so one can be inserted between two
+# others without renumbering the rest (see recipe_diff.sync_ingredients)
+INGREDIENT_POSITION_GAP = 1024
+
 # Association table for many-to-many relationship between Recipe and Category
 association_table = db.Table('recipe_category',
     db.Column('recipe_id', db.Integer, db.ForeignKey('recipes.id', ondelete="CASCADE"), primary_key=True),
-    db.Column('category_id', db.Integer, db.ForeignKey('categories.id', ondelete="CASCADE"), primary_key=True)
+    db.Column('category_id', db.Integer, db.ForeignKey('categories.id', ondelete="CASCADE"), primary_key=True),
+    db.Index('ix_recipe_category_category_id', 'category_id', 'recipe_id'),  # The primary key only covers lookups by recipe
+)
+
+# Inverted index for pantry matching: one row per (normalized token, ingredient)
+ingredient_postings = db.Table('ingredient_postings',
+    db.Column('token', db.String(64), primary_key=True),
+    db.Column('recipe_id', db.Integer, db.ForeignKey('recipes.id', ondelete="CASCADE"), primary_key=True),
+    db.Column('ingredient_id', db.Integer, db.ForeignKey('ingredients.id', ondelete="CASCADE"), primary_key=True),
+    db.Index('ix_ingredient_postings_recipe_id', 'recipe_id'),
+    db.Index('ix_ingredient_postings_ingredient_id', 'ingredient_id'),  # ON DELETE CASCADE from ingredients looks rows up by this
+)
+
+# Read model: each recipe's API representation, pre-encoded as JSON, so
+# reads are one primary key lookup instead of three joined queries
+recipe_documents = db.Table('recipe_documents',
+    db.Column('recipe_id', db.Integer, db.ForeignKey('recipes.id', ondelete="CASCADE"), primary_key=True),
+    db.Column('body', db.LargeBinary, nullable=False),
+)
+
+# Precomputed nearest neighbours for GET /recipes/<id>/similar: the top
+# SIMILAR_TOP_K recipes for each recipe, by cosine similarity
+recipe_similarities = db.Table('recipe_similarities',
+    db.Column('recipe_id', db.Integer, db.ForeignKey('recipes.id', ondelete="CASCADE"), primary_key=True),
+    db.Column('similar_id', db.Integer, db.ForeignKey('recipes.id', ondelete="CASCADE"), primary_key=True),
+    db.Column('score', db.Float, nullable=False),
+    db.Index('ix_recipe_similarities_similar_id', 'similar_id'),  # Finds the lists a changed recipe appears in
+)
+
+# Recipes whose similar-recipe lists need recomputing. Writes add a row in
+# their own transaction and `flask maintenance refresh-similar` works
+# through them; a recipe may be queued more than once.
+similar_refresh_queue = db.Table('similar_refresh_queue',
+    db.Column('id', db.Integer, primary_key=True),
+    db.Column('recipe_id', db.Integer, db.ForeignKey('recipes.id', ondelete="CASCADE"), nullable=False),
+    db.Index('ix_similar_refresh_queue_recipe_id', 'recipe_id'),  # ON DELETE CASCADE looks rows up by this
 )
 
 class User(db.Model, SerializerMixin):
@@ -23,10 +64,13 @@ class User(db.Model, SerializerMixin):
 
     @password.setter
     def password(self, password):
-        self._password = password
+        self._password = password_hasher.hash(password)
 
     def verify_password(self, password):
-        return self._password == password
+        return password_hasher.verify(password, self._password)
+
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self._password)
 
     serialize_rules = ('-_password',)
 
@@ -34,10 +78,11 @@ class Recipe(db.Model, SerializerMixin):
     __tablename__ = 'recipes'
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    title = db.Column(db.String(255), nullable=False)
+    title = db.Column(db.String(255), nullable=False, index=True)
     description = db.Column(db.Text, nullable=True)
+    servings = db.Column(db.Integer, nullable=True)  # What GET /recipes/<id>?servings= scales from
     
-    ingredients = db.relationship('Ingredient', backref='recipe', lazy=True, cascade="all, delete")
+    ingredients = db.relationship('Ingredient', backref='recipe', lazy=True, cascade="all, delete", order_by='[Ingredient.position, Ingredient.id]')
     instructions = db.Column(JSON, nullable=True)
     
     categories = db.relationship(
@@ -56,16 +101,27 @@ class Ingredient(db.Model, SerializerMixin):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     name = db.Column(db.String(255), nullable=False)
     quantity = db.Column(db.String(100), nullable=False)
+    position = db.Column(db.Integer, nullable=False, default=0, server_default='0')  # Sort key within the recipe
+    # `quantity` parsed by quantities.parse_quantity; kept in step by the validator below
+    amount = db.Column(db.Float, nullable=True)
+    amount_max = db.Column(db.Float, nullable=True)  # Upper end of a range like "2-3"
+    unit = db.Column(db.String(20), nullable=True)
+    note = db.Column(db.String(100), nullable=True)
     
-    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id', ondelete="CASCADE"), nullable=False)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id', ondelete="CASCADE"), nullable=False, index=True)
 
     serialize_rules = ('-recipe',)
 
+    @validates('quantity')
+    def validate_quantity(self, key, quantity):
+        self.amount, self.amount_max, self.unit, self.note = parse_quantity(quantity)
+        return quantity
+
 class Category(db.Model, SerializerMixin):
     __tablename__ = 'categories'
     
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    name = db.Column(db.String(255), nullable=False)
+    name = db.Column(db.String(255), nullable=False, unique=True, index=True)
     
     # recipes = db.relationship(
     #     'Recipe',
@@ -76,3 +132,14 @@ class Category(db.Model, SerializerMixin):
     # )
 
     serialize_rules = ('-recipes',)
+
+class ParseJob(db.Model, SerializerMixin):
+    __tablename__ = 'parse_jobs'
+
+    id = db.Column(db.String(32), primary_key=True)
+    url = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    error = db.Column(db.Text, nullable=True)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipes.id', ondelete="SET NULL"), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now())
+    updated_at = db.Column(db.DateTime, nullable=False, server_default=db.func.now(), onupdate=db.func.now())
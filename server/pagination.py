@@ -0,0 +1,56 @@
+import base64
+import binascii
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def encode_cursor(value, kind="id"):
+    # Opaque to clients; only the server knows it wraps the last seen id
+    # (or, for ranked results, the offset of the next row)
+    return base64.urlsafe_b64encode(f"{kind}:{value}".encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor, kind="id"):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        prefix, _, value = base64.urlsafe_b64decode(padded.encode()).decode().partition(":")
+        if prefix != kind:
+            raise ValueError(cursor)
+        return int(value)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise PaginationError("Invalid cursor.")
+
+
+def parse_page_args(args, kind="id"):
+    # Read ?limit= and ?after= from the query string
+    limit = args.get("limit", DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise PaginationError("limit must be an integer.")
+    if limit < 1:
+        raise PaginationError("limit must be positive.")
+    limit = min(limit, MAX_PAGE_SIZE)
+
+    after = args.get("after")
+    after_value = decode_cursor(after, kind) if after else None
+    return limit, after_value
+
+
+def keyset_page(query, id_column, limit, after_id=None):
+    # Seek past the cursor instead of OFFSET so every page costs the same,
+    # and fetch one extra row to know whether another page exists
+    if after_id is not None:
+        query = query.filter(id_column > after_id)
+    rows = query.order_by(id_column).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].id)
+    return rows, next_cursor
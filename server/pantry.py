@@ -0,0 +1,168 @@
+import re
+from collections import defaultdict
+
+from config import db
+from models import Recipe, Ingredient, ingredient_postings
+
+# Words that describe how an ingredient is prepared or sized rather than what
+# it is; "2 large ripe tomatoes, chopped" should match a pantry "tomato"
+DESCRIPTOR_WORDS = {
+    "a", "an", "and", "or", "of", "the", "to", "for", "with", "in",
+    "fresh", "freshly", "dried", "frozen", "canned", "raw", "cooked",
+    "large", "medium", "small", "big", "whole", "ripe", "extra",
+    "chopped", "diced", "minced", "sliced", "grated", "shredded", "crushed",
+    "ground", "peeled", "seeded", "melted", "softened", "beaten", "finely",
+    "roughly", "thinly", "optional", "taste", "about", "plus",
+    "cup", "cups", "tbsp", "tsp", "tablespoon", "tablespoons", "teaspoon",
+    "teaspoons", "g", "kg", "ml", "l", "oz", "lb", "lbs", "pinch", "clove",
+    "cloves", "can", "cans", "package", "pound", "pounds", "ounce", "ounces",
+}
+
+WORD_PATTERN = re.compile(r"[a-z]+")
+
+DEFAULT_RESULT_LIMIT = 20
+MAX_RESULT_LIMIT = 100
+# Each pantry item is one SELECT in a UNION, and SQLite allows at most 500
+MAX_PANTRY_ITEMS = 200
+
+
+def singularize(word):
+    if len(word) <= 3:
+        return word
+    if word.endswith("ies"):
+        return word[:-3] + "y"
+    if word.endswith("oes") or word.endswith(("ches", "shes", "sses", "xes")):
+        return word[:-2]
+    if word.endswith("s") and not word.endswith(("ss", "us")):
+        return word[:-1]
+    return word
+
+
+def normalize_tokens(name):
+    tokens = []
+    for word in WORD_PATTERN.findall((name or "").lower()):
+        if word in DESCRIPTOR_WORDS:
+            continue
+        token = singularize(word)
+        if token not in tokens:
+            tokens.append(token)
+    return tokens
+
+
+def index_ingredients(recipe_id):
+    # Replace the recipe's posting rows. Runs inside the caller's transaction.
+    db.session.flush()
+    db.session.execute(ingredient_postings.delete().where(ingredient_postings.c.recipe_id == recipe_id))
+
+    rows = db.session.execute(
+        db.select(Ingredient.id, Ingredient.name).filter_by(recipe_id=recipe_id)
+    ).all()
+    index_ingredients_bulk((recipe_id, ingredient_id, name) for ingredient_id, name in rows)
+
+
+def index_ingredients_bulk(rows):
+    # rows: (recipe_id, ingredient_id, name) for ingredients not indexed yet
+    postings = [
+        {"token": token, "recipe_id": recipe_id, "ingredient_id": ingredient_id}
+        for recipe_id, ingredient_id, name in rows
+        for token in normalize_tokens(name)
+    ]
+    if postings:
+        db.session.execute(ingredient_postings.insert(), postings)
+
+
+def rebuild_pantry_index(batch_size=5000):
+    db.session.execute(ingredient_postings.delete())
+    postings = []
+    count = 0
+    result = db.session.execute(
+        db.select(Ingredient.id, Ingredient.recipe_id, Ingredient.name)
+        .execution_options(yield_per=batch_size)
+    )
+    for ingredient_id, recipe_id, name in result:
+        for token in normalize_tokens(name):
+            postings.append({"token": token, "recipe_id": recipe_id, "ingredient_id": ingredient_id})
+        if len(postings) >= batch_size:
+            db.session.execute(ingredient_postings.insert(), postings)
+            count += len(postings)
+            postings = []
+    if postings:
+        db.session.execute(ingredient_postings.insert(), postings)
+        count += len(postings)
+    db.session.commit()
+    return count
+
+
+def _covered_ingredients(item_tokens):
+    # (recipe_id, ingredient_id) for every ingredient some pantry item
+    # covers: the ingredient's postings contain all of the item's tokens
+    selects = [
+        db.select(ingredient_postings.c.recipe_id, ingredient_postings.c.ingredient_id)
+        .where(ingredient_postings.c.token.in_(tokens))
+        .group_by(ingredient_postings.c.recipe_id, ingredient_postings.c.ingredient_id)
+        .having(db.func.count() == len(tokens))
+        for tokens in item_tokens
+    ]
+    # UNION also drops ingredients covered by more than one item
+    return selects[0] if len(selects) == 1 else db.union(*selects)
+
+
+def find_cookable_recipes(pantry_items, limit=DEFAULT_RESULT_LIMIT, min_coverage=0.0):
+    # A pantry item satisfies an ingredient when every one of the item's
+    # tokens appears in the ingredient, so "chicken" covers "chicken breast"
+    # but "chicken stock" does not cover "chicken".
+    item_tokens = [tokens for tokens in (normalize_tokens(item) for item in pantry_items) if tokens]
+    if not item_tokens:
+        return []
+
+    # Matching, counting and ranking all happen in one statement, so no
+    # recipe ids are bound back into the query
+    covered = _covered_ingredients(item_tokens).subquery()
+    matched = (
+        db.select(covered.c.recipe_id, db.func.count().label("matched"))
+        .group_by(covered.c.recipe_id)
+        .subquery()
+    )
+    total = (
+        db.select(db.func.count())
+        .select_from(Ingredient)
+        .where(Ingredient.recipe_id == matched.c.recipe_id)
+        .scalar_subquery()
+    )
+    counts = db.select(matched.c.recipe_id, matched.c.matched, total.label("total")).subquery()
+    coverage = (counts.c.matched * 1.0 / counts.c.total).label("coverage")
+    scored = db.session.execute(
+        db.select(counts.c.recipe_id, Recipe.title, coverage, counts.c.matched, counts.c.total)
+        .join(Recipe, Recipe.id == counts.c.recipe_id)
+        .where(counts.c.total > 0, coverage >= min_coverage)
+        .order_by(coverage.desc(), counts.c.matched.desc(), counts.c.recipe_id)
+        .limit(limit)
+    ).all()
+    if not scored:
+        return []
+
+    # Only the winners need their missing ingredients
+    top_ids = [row.recipe_id for row in scored]
+    covered_top = _covered_ingredients(item_tokens).subquery()
+    missing = defaultdict(list)
+    for recipe_id, name, quantity in db.session.execute(
+        db.select(Ingredient.recipe_id, Ingredient.name, Ingredient.quantity)
+        .where(
+            Ingredient.recipe_id.in_(top_ids),
+            Ingredient.id.not_in(db.select(covered_top.c.ingredient_id)),
+        )
+        .order_by(Ingredient.position, Ingredient.id)
+    ):
+        missing[recipe_id].append({"name": name, "quantity": quantity})
+
+    return [
+        {
+            "id": row.recipe_id,
+            "title": row.title,
+            "coverage": round(row.coverage, 4),
+            "matched": row.matched,
+            "total": row.total,
+            "missing": missing[row.recipe_id],
+        }
+        for row in scored
+    ]
@@ -1,60 +1,129 @@
+import os
 from bs4 import BeautifulSoup
 import requests
+from requests.adapters import HTTPAdapter
 from ai_models import use_gpt_for_parsing  # Import AI model function
+from fetch_cache import FetchCache, DEFAULT_MAX_BYTES
+from extractors import extract_jsonld, extract_microdata, extract_rdfa, is_complete, DEFAULT_TOKEN_BUDGET
+from html_scan import scan_page, etree
+from metrics import timed_stage
+
+REQUEST_TIMEOUT = 15  # seconds
+POOL_SIZE = 32
+# Tree builder for the microdata/RDFa fallback
+SOUP_FEATURES = "lxml" if etree is not None else "html.parser"
+# Upper bound on the page text sent to the AI model
+AI_TOKEN_BUDGET = int(os.environ.get("AI_TOKEN_BUDGET", DEFAULT_TOKEN_BUDGET))
+
+# One pooled session for every fetch so connections to a host are reused
+http_session = requests.Session()
+http_session.mount("http://", HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE))
+http_session.mount("https://", HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE))
+http_session.headers["User-Agent"] = "SmartChefAi recipe parser"
+
+# Pages we've fetched before are revalidated instead of re-downloaded.
+# FETCH_CACHE=0 turns this off; FETCH_CACHE_OFFLINE=1 serves only from cache.
+fetch_cache = None
+if os.environ.get("FETCH_CACHE", "1") != "0":
+    fetch_cache = FetchCache(
+        os.environ.get("FETCH_CACHE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "instance", "fetch_cache")),
+        max_bytes=int(os.environ.get("FETCH_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+        offline=os.environ.get("FETCH_CACHE_OFFLINE", "0") == "1",
+    )
+
+
+@timed_stage("fetch")
+def fetch_page(url):
+    if fetch_cache is not None:
+        return fetch_cache.fetch(url, http_session, timeout=REQUEST_TIMEOUT)
+    response = http_session.get(url, timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.content
+
+
+@timed_stage("html_parse")
+def extract_recipe(content):
+    # CPU-bound half of parsing: returns the recipe found in the markup and,
+    # when it is incomplete, the trimmed page text to hand to the AI model.
+    # One pass over the markup feeds every extractor.
+    scan = scan_page(content, AI_TOKEN_BUDGET)
+
+    # Most recipe sites embed a schema.org Recipe; when they do we're done
+    structured = extract_jsonld(scan.jsonld)
+    if not is_complete(structured) and (scan.has_microdata_recipe or scan.has_rdfa_recipe):
+        # Rare enough that building a tree for it is fine
+        soup = BeautifulSoup(content, SOUP_FEATURES)
+        structured = extract_microdata(soup) if scan.has_microdata_recipe else None
+        if not is_complete(structured) and scan.has_rdfa_recipe:
+            structured = extract_rdfa(soup)
+    if is_complete(structured):
+        return structured, None
+
+    recipe = {
+        "title": scan.title or "Untitled",
+        "description": scan.description or "",
+        "instructions": scan.instructions,
+        "ingredients": [{"name": name, "quantity": ""} for name in scan.ingredients],
+        "categories": scan.categories
+    }
+
+    if not recipe["instructions"] or not recipe["ingredients"]:
+        return recipe, scan.content_text()
+    return recipe, None
+
+
+@timed_stage("llm")
+def parse_with_ai(text_content, recipe):
+    # I/O-bound half: ask the model, falling back to what the markup gave us
+    ai_parsed_recipe = use_gpt_for_parsing(text_content)
+
+    if not ai_parsed_recipe:
+        return recipe
+
+    sections = ai_parsed_recipe.split("\n")
+    title = sections[0].strip() if sections else "Untitled"
+    description = sections[1].strip() if len(sections) > 1 else ""
+
+    instructions_section = ""
+    ingredients_section = ""
+    categories_section = ""
+    current_section = None
+
+    for line in sections[2:]:
+        if line.startswith("Instructions:"):
+            current_section = "instructions"
+        elif line.startswith("Ingredients:"):
+            current_section = "ingredients"
+        elif line.startswith("Categories:"):
+            current_section = "categories"
+        elif current_section == "instructions":
+            instructions_section += line + "\n"
+        elif current_section == "ingredients":
+            ingredients_section += line + "\n"
+        elif current_section == "categories":
+            categories_section += line + "\n"
+
+    instructions = instructions_section.strip().split("\n") if instructions_section else []
+    ingredients = [{"name": i.strip(), "quantity": ""} for i in ingredients_section.strip().split("\n") if ingredients_section]
+    categories = [cat.strip() for cat in categories_section.strip().split("\n") if categories_section]
+
+    return {
+        "title": title,
+        "description": description,
+        "instructions": instructions,
+        "ingredients": ingredients,
+        "categories": categories
+    }
+
 
 def parse_recipe_from_url(url):
     try:
-        response = requests.get(url)
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.content, "html.parser")
-
-        title = soup.find("h1").get_text(strip=True) if soup.find("h1") else "Untitled"
-        description = soup.find("meta", {"name": "description"}).get("content", "") if soup.find("meta", {"name": "description"}) else ""
-
-        instructions = [step.get_text(strip=True) for step in soup.find_all("li", {"class": "instruction"})]
-        ingredients = [{"name": ing.get_text(strip=True), "quantity": ""} for ing in soup.find_all("li", {"class": "ingredient"})]
-        categories = [cat.get_text(strip=True) for cat in soup.find_all("a", {"class": "category"})]
-
-        if not instructions or not ingredients:
-            text_content = soup.get_text(separator="\n", strip=True)
-            ai_parsed_recipe = use_gpt_for_parsing(text_content)
-
-            if ai_parsed_recipe:
-                sections = ai_parsed_recipe.split("\n")
-                title = sections[0].strip() if sections else "Untitled"
-                description = sections[1].strip() if len(sections) > 1 else ""
-                
-                instructions_section = ""
-                ingredients_section = ""
-                categories_section = ""
-                current_section = None
-
-                for line in sections[2:]:
-                    if line.startswith("Instructions:"):
-                        current_section = "instructions"
-                    elif line.startswith("Ingredients:"):
-                        current_section = "ingredients"
-                    elif line.startswith("Categories:"):
-                        current_section = "categories"
-                    elif current_section == "instructions":
-                        instructions_section += line + "\n"
-                    elif current_section == "ingredients":
-                        ingredients_section += line + "\n"
-                    elif current_section == "categories":
-                        categories_section += line + "\n"
-
-                instructions = instructions_section.strip().split("\n") if instructions_section else []
-                ingredients = [{"name": i.strip(), "quantity": ""} for i in ingredients_section.strip().split("\n") if ingredients_section]
-                categories = [cat.strip() for cat in categories_section.strip().split("\n") if categories_section]
-
-        return {
-            "title": title,
-            "description": description,
-            "instructions": instructions,
-            "ingredients": ingredients,
-            "categories": categories
-        }
+        recipe, text_content = extract_recipe(fetch_page(url))
+
+        if text_content is not None:
+            recipe = parse_with_ai(text_content, recipe)
+
+        return recipe
 
     except Exception as e:
         print(f"Error parsing URL: {e}")
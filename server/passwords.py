@@ -0,0 +1,82 @@
+import hmac
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask_bcrypt import Bcrypt
+
+BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+
+
+class HasherBusyError(Exception):
+    pass
+
+
+def hash_cost(stored):
+    # "$2b$12$..." -> 12; None for anything that isn't a bcrypt hash
+    if not stored or not stored.startswith(BCRYPT_PREFIXES):
+        return None
+    try:
+        return int(stored.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    # bcrypt hashing on a small dedicated thread pool. bcrypt releases the
+    # GIL, so the pool runs hashes in parallel while capping how many cores
+    # logins can take; request threads wait on the result. Work beyond the
+    # pool plus PASSWORD_HASH_QUEUE waiting hashes is refused with
+    # HasherBusyError instead of piling up.
+
+    def __init__(self, app=None):
+        self.bcrypt = Bcrypt()
+        self._executor = None
+        self._slots = None
+        self._dummy_hash = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.bcrypt.init_app(app)
+        self.rounds = app.config['BCRYPT_LOG_ROUNDS']
+        workers = app.config['PASSWORD_HASH_WORKERS']
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password-hash")
+        self._slots = threading.BoundedSemaphore(workers + app.config['PASSWORD_HASH_QUEUE'])
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise HasherBusyError("Too many password hashes in progress")
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def hash(self, password):
+        return self._submit(self.bcrypt.generate_password_hash, password, self.rounds).decode()
+
+    def verify(self, password, stored):
+        if not password or not stored:
+            return False
+        if hash_cost(stored) is None:
+            # Accounts created before hashing hold the plain password;
+            # needs_rehash() upgrades them on the next good login
+            return hmac.compare_digest(stored.encode(), password.encode())
+        return self._submit(self.bcrypt.check_password_hash, stored, password)
+
+    def needs_rehash(self, stored):
+        # True for plain passwords and hashes made with another work factor
+        return hash_cost(stored) != self.rounds
+
+    def burn(self, password):
+        # Spend the time a real check would take, so a login for an unknown
+        # email can't be told apart from a wrong password by its timing
+        if self._dummy_hash is None:
+            self._dummy_hash = self.hash("not a real password")
+        self.verify(password or "x", self._dummy_hash)
+
+    def shutdown(self, wait=True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait)
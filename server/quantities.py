@@ -0,0 +1,273 @@
+import re
+from bisect import bisect_right
+from collections import namedtuple
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; scaling falls back to plain Python
+    np = None
+
+Quantity = namedtuple("Quantity", "amount amount_max unit note")
+EMPTY = Quantity(None, None, None, None)
+
+# Canonical units. Volumes are in millilitres and masses in grams; units
+# without a dimension (cloves, cans...) are kept but never converted.
+# tsp and tbsp belong to both systems and stay as they are.
+Unit = namedtuple("Unit", "dimension to_base system plural")
+UNITS = {
+    "tsp": Unit("volume", 4.92892, None, "tsp"),
+    "tbsp": Unit("volume", 14.7868, None, "tbsp"),
+    "fl oz": Unit("volume", 29.5735, "us", "fl oz"),
+    "cup": Unit("volume", 236.588, "us", "cups"),
+    "pint": Unit("volume", 473.176, "us", "pints"),
+    "quart": Unit("volume", 946.353, "us", "quarts"),
+    "gallon": Unit("volume", 3785.41, "us", "gallons"),
+    "ml": Unit("volume", 1.0, "metric", "ml"),
+    "l": Unit("volume", 1000.0, "metric", "l"),
+    "oz": Unit("mass", 28.3495, "us", "oz"),
+    "lb": Unit("mass", 453.592, "us", "lb"),
+    "g": Unit("mass", 1.0, "metric", "g"),
+    "kg": Unit("mass", 1000.0, "metric", "kg"),
+    "pinch": Unit(None, None, None, "pinches"),
+    "dash": Unit(None, None, None, "dashes"),
+    "clove": Unit(None, None, None, "cloves"),
+    "can": Unit(None, None, None, "cans"),
+    "slice": Unit(None, None, None, "slices"),
+    "stick": Unit(None, None, None, "sticks"),
+    "bunch": Unit(None, None, None, "bunches"),
+    "handful": Unit(None, None, None, "handfuls"),
+    "sprig": Unit(None, None, None, "sprigs"),
+    "piece": Unit(None, None, None, "pieces"),
+    "package": Unit(None, None, None, "packages"),
+}
+
+UNIT_ALIASES = {
+    "teaspoon": "tsp", "teaspoons": "tsp", "tsps": "tsp",
+    "tablespoon": "tbsp", "tablespoons": "tbsp", "tbsps": "tbsp", "tbs": "tbsp", "tbl": "tbsp",
+    "fluid ounce": "fl oz", "fluid ounces": "fl oz", "fl. oz": "fl oz",
+    "cups": "cup", "pints": "pint", "pt": "pint", "quarts": "quart", "qt": "quart", "gallons": "gallon", "gal": "gallon",
+    "millilitre": "ml", "millilitres": "ml", "milliliter": "ml", "milliliters": "ml",
+    "litre": "l", "litres": "l", "liter": "l", "liters": "l",
+    "ounce": "oz", "ounces": "oz", "pound": "lb", "pounds": "lb", "lbs": "lb",
+    "gram": "g", "grams": "g", "gramme": "g", "grammes": "g",
+    "kilogram": "kg", "kilograms": "kg", "kilo": "kg", "kilos": "kg",
+    "pinches": "pinch", "dashes": "dash", "cloves": "clove", "cans": "can", "tins": "can", "tin": "can",
+    "slices": "slice", "sticks": "stick", "bunches": "bunch", "handfuls": "handful", "sprigs": "sprig",
+    "pieces": "piece", "packages": "package", "packets": "package", "packet": "package",
+}
+UNIT_ALIASES.update({unit: unit for unit in UNITS})
+
+# Which unit a converted amount is shown in, by size in ml or g
+TARGET_UNITS = {
+    "metric": {"volume": ((0, "ml"), (1000, "l")), "mass": ((0, "g"), (1000, "kg"))},
+    "us": {"volume": ((0, "tsp"), (14.7868, "tbsp"), (59.1471, "cup")), "mass": ((0, "oz"), (453.592, "lb"))},
+}
+SYSTEMS = tuple(TARGET_UNITS)
+
+VULGAR_FRACTIONS = {
+    "½": "1/2", "⅓": "1/3", "⅔": "2/3", "¼": "1/4", "¾": "3/4", "⅕": "1/5", "⅖": "2/5", "⅗": "3/5",
+    "⅘": "4/5", "⅙": "1/6", "⅚": "5/6", "⅛": "1/8", "⅜": "3/8", "⅝": "5/8", "⅞": "7/8",
+}
+
+# "1,500" is fifteen hundred; only a comma followed by one or two digits
+# ("1,5") is a decimal comma
+THOUSANDS = r"\d{1,3}(?:,\d{3})+(?!\d)"
+NUMBER = rf"\d+\s+\d+/\d+|\d+/\d+|{THOUSANDS}|\d+,\d{{1,2}}(?!\d)|\d*\.\d+|\d+"
+THOUSANDS_PATTERN = re.compile(THOUSANDS)
+AMOUNT_PATTERN = re.compile(rf"({NUMBER})(?:\s*(?:-|–|—|to|or)\s*({NUMBER}))?")
+ARTICLE_PATTERN = re.compile(r"an?\s+(?=[a-z])", re.IGNORECASE)
+UNIT_PATTERN = re.compile(
+    r"(" + "|".join(re.escape(alias) for alias in sorted(UNIT_ALIASES, key=len, reverse=True)) + r")\b\.?",
+    re.IGNORECASE,
+)
+VULGAR_PATTERN = re.compile(r"(\d)?\s*([" + "".join(VULGAR_FRACTIONS) + "])")
+
+
+def _number(text):
+    text = text.replace(",", "") if THOUSANDS_PATTERN.fullmatch(text) else text.replace(",", ".")
+    if "/" not in text:
+        return float(text)
+    whole, _, fraction = text.rpartition(" ")
+    numerator, denominator = fraction.split("/")
+    return (float(whole) if whole.strip() else 0.0) + float(numerator) / float(denominator)
+
+
+def _spell_fraction(match):
+    whole, fraction = match.groups()
+    return f"{whole} {VULGAR_FRACTIONS[fraction]}" if whole else VULGAR_FRACTIONS[fraction]
+
+
+def parse_quantity(text):
+    # "1 1/2 cups, sifted" -> Quantity(1.5, None, "cup", "sifted"). Ranges
+    # ("2-3", "2 to 3") fill amount_max; whatever isn't an amount or a
+    # known unit ends up in the note.
+    text = VULGAR_PATTERN.sub(_spell_fraction, (text or "").replace("⁄", "/")).strip()
+    if not text:
+        return EMPTY
+
+    amount = amount_max = None
+    rest = text
+    match = AMOUNT_PATTERN.match(rest)
+    if match:
+        try:
+            amount = _number(match.group(1))
+            amount_max = _number(match.group(2)) if match.group(2) else None
+            rest = rest[match.end():].lstrip()
+        except ZeroDivisionError:
+            amount = amount_max = None
+    else:
+        # "a pinch" or "a can" reads as one of the unit
+        article = ARTICLE_PATTERN.match(rest)
+        if article and UNIT_PATTERN.match(rest, article.end()):
+            amount = 1.0
+            rest = rest[article.end():]
+
+    unit = None
+    match = UNIT_PATTERN.match(rest)
+    if match:
+        unit = UNIT_ALIASES[match.group(1).lower()]
+        rest = rest[match.end():]
+
+    note = re.sub(r"^(?:[,;:]\s*|of\s+)", "", rest.strip()).strip() or None
+    return Quantity(amount, amount_max, unit, note)
+
+
+def quantity_columns(text):
+    # The Ingredient columns parse_quantity fills, for core inserts
+    return parse_quantity(text)._asdict()
+
+
+def clean_servings(value):
+    # A servings count sent by a client: None when blank, otherwise a
+    # positive whole number or ValueError
+    if value is None or value == "":
+        return None
+    if isinstance(value, bool) or isinstance(value, float) and not value.is_integer():
+        raise ValueError("servings must be a positive whole number.")
+    try:
+        servings = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("servings must be a positive whole number.")
+    if servings < 1:
+        raise ValueError("servings must be a positive whole number.")
+    return servings
+
+
+def parse_servings(value):
+    # schema.org recipeYield is a number, a string like "4 servings" or
+    # "Makes 12", or a list of either; the first whole number is used
+    for item in value if isinstance(value, list) else [value]:
+        match = re.search(r"\d+", str(item or ""))
+        if match and int(match.group()) > 0:
+            return int(match.group())
+    return None
+
+
+def _format_number(value, unit):
+    if UNITS.get(unit, Unit(None, None, None, None)).system == "metric":
+        # Metric amounts read as decimals, to about three figures
+        if value >= 10:
+            return str(int(round(value)))
+        return f"{value:.2f}".rstrip("0").rstrip(".")
+    # Everything else as a whole number and the nearest eighth or third
+    whole = int(value)
+    candidates = [(abs(value - whole - n / d), n, d) for d in (8, 3) for n in range(d + 1)]
+    _, numerator, denominator = min(candidates)
+    if numerator == denominator:
+        whole, numerator = whole + 1, 0
+    if numerator == 0:
+        return str(whole)
+    step = 4 if denominator == 8 and numerator % 4 == 0 else 2 if denominator == 8 and numerator % 2 == 0 else 1
+    fraction = f"{numerator // step}/{denominator // step}"
+    return f"{whole} {fraction}" if whole else fraction
+
+
+def format_quantity(amount, amount_max, unit, note):
+    # The display string for parsed values: (1.5, None, "cup", "sifted")
+    # -> "1 1/2 cups sifted"
+    parts = []
+    if amount is not None:
+        parts.append(_format_number(amount, unit))
+        if amount_max is not None:
+            parts[-1] += "-" + _format_number(amount_max, unit)
+    if unit is not None:
+        plural = amount is not None and (amount_max or amount) > 1
+        parts.append(UNITS[unit].plural if plural else unit)
+    if note:
+        parts.append(note)
+    return " ".join(parts)
+
+
+def pick_unit(ladder, base):
+    return ladder[max(0, bisect_right([threshold for threshold, _ in ladder], base) - 1)][1]
+
+
+def _convert_python(amounts, highs, units, factor, system):
+    out = []
+    for amount, high, unit in zip(amounts, highs, units):
+        if amount is None:
+            out.append((None, None, unit))
+            continue
+        amount *= factor
+        high = high * factor if high is not None else None
+        spec = UNITS.get(unit)
+        if system and spec is not None and spec.dimension and spec.system not in (None, system):
+            to_base = spec.to_base
+            unit = pick_unit(TARGET_UNITS[system][spec.dimension], amount * to_base)
+            amount = amount * to_base / UNITS[unit].to_base
+            high = high * to_base / UNITS[unit].to_base if high is not None else None
+        out.append((amount, high, unit))
+    return out
+
+
+def _convert_numpy(amounts, highs, units, factor, system):
+    low = np.array([np.nan if amount is None else amount for amount in amounts], dtype=np.float64) * factor
+    high = np.array([np.nan if amount is None else amount for amount in highs], dtype=np.float64) * factor
+    units = list(units)
+    if system:
+        specs = [UNITS.get(unit) for unit in units]
+        for dimension, ladder in TARGET_UNITS[system].items():
+            rows = np.array([
+                row for row, spec in enumerate(specs)
+                if spec is not None and spec.dimension == dimension and spec.system not in (None, system)
+            ], dtype=np.intp)
+            if not len(rows):
+                continue
+            to_base = np.array([specs[row].to_base for row in rows])
+            base = low[rows] * to_base
+            # Pick each row's display unit by size, then rescale into it
+            names = [name for _, name in ladder]
+            picked = np.maximum(np.searchsorted([threshold for threshold, _ in ladder], np.nan_to_num(base), side="right") - 1, 0)
+            scale = to_base / np.array([UNITS[name].to_base for name in names])[picked]
+            low[rows] *= scale
+            high[rows] *= scale
+            for row, index in zip(rows, picked):
+                if not np.isnan(low[row]):
+                    units[row] = names[index]
+    return [
+        (None if np.isnan(a) else float(a), None if np.isnan(b) else float(b), unit)
+        for a, b, unit in zip(low, high, units)
+    ]
+
+
+def scale_ingredients(ingredients, factor=1.0, system=None):
+    # Scale encoded ingredients by `factor` and, with `system` ("metric" or
+    # "us"), convert them into its units. Amounts are worked out a column
+    # at a time; rows without a parsed amount keep their quantity as is.
+    convert = _convert_numpy if np is not None else _convert_python
+    columns = convert(
+        [ingredient.get("amount") for ingredient in ingredients],
+        [ingredient.get("amount_max") for ingredient in ingredients],
+        [ingredient.get("unit") for ingredient in ingredients],
+        factor, system,
+    )
+    scaled = []
+    for ingredient, (amount, amount_max, unit) in zip(ingredients, columns):
+        ingredient = dict(ingredient)
+        if amount is not None:
+            amount = round(amount, 3)
+            amount_max = round(amount_max, 3) if amount_max is not None else None
+            ingredient.update(amount=amount, amount_max=amount_max, unit=unit)
+            ingredient["quantity"] = format_quantity(amount, amount_max, unit, ingredient.get("note"))
+        scaled.append(ingredient)
+    return scaled
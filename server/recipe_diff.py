@@ -0,0 +1,142 @@
+from bisect import bisect_left
+from collections import defaultdict
+
+from sqlalchemy.orm.attributes import flag_modified
+
+from config import db
+from models import Ingredient, INGREDIENT_POSITION_GAP
+from categories import get_or_create_categories
+
+_INGREDIENT_COLUMNS = ("name", "quantity", "position", "amount", "amount_max", "unit", "note")
+
+
+def _ingredient_key(name):
+    return " ".join(name.split()).casefold()
+
+
+def _match_rows(existing, items):
+    # The existing row to reuse for each item, or None for a new one: same
+    # name and quantity first, then same name, then leftover rows in order
+    # (so a typo fix edits its row). Also returns the rows nothing matched.
+    matched = [None] * len(items)
+    unmatched = dict.fromkeys(existing)
+    for key in (lambda name, quantity: (_ingredient_key(name), quantity), lambda name, quantity: _ingredient_key(name)):
+        rows = defaultdict(list)
+        for row in unmatched:
+            rows[key(row.name, row.quantity)].append(row)
+        for index, item in enumerate(items):
+            candidates = rows[key(*item)]
+            if matched[index] is None and candidates:
+                matched[index] = candidates.pop(0)
+                del unmatched[matched[index]]
+    leftovers = iter(list(unmatched))
+    for index in range(len(items)):
+        if matched[index] is None:
+            matched[index] = next(leftovers, None)
+            if matched[index] is not None:
+                del unmatched[matched[index]]
+    return matched, list(unmatched)
+
+
+def _in_order(positions):
+    # Indexes of a longest increasing run of positions (None for new
+    # items); the rows on it can stay where they are
+    tails, tail_indexes, previous = [], [], {}
+    for index, position in enumerate(positions):
+        if position is None:
+            continue
+        at = bisect_left(tails, position)
+        previous[index] = tail_indexes[at - 1] if at else None
+        tails[at:at + 1] = [position]
+        tail_indexes[at:at + 1] = [index]
+    kept = set()
+    index = tail_indexes[-1] if tail_indexes else None
+    while index is not None:
+        kept.add(index)
+        index = previous[index]
+    return kept
+
+
+def _place(positions, kept):
+    # Positions for every item: kept ones unchanged, the rest spread between
+    # the kept ones around them. Renumbers everything when two kept
+    # neighbours have no room left between them.
+    gap = INGREDIENT_POSITION_GAP
+    placed = list(positions)
+    index = 0
+    while index < len(placed):
+        if index in kept:
+            index += 1
+            continue
+        end = index
+        while end < len(placed) and end not in kept:
+            end += 1
+        count = end - index
+        low = placed[index - 1] if index else None
+        high = placed[end] if end < len(placed) else None
+        if low is None and high is None:
+            slots = [n * gap for n in range(count)]
+        elif high is None:
+            slots = [low + (n + 1) * gap for n in range(count)]
+        elif low is None:
+            slots = [high - (count - n) * gap for n in range(count)]
+        else:
+            step = (high - low) // (count + 1)
+            if step < 1:
+                return [n * gap for n in range(len(placed))]
+            slots = [low + (n + 1) * step for n in range(count)]
+        placed[index:end] = slots
+        index = end
+    return placed
+
+
+def sync_ingredients(recipe, incoming):
+    # Bring recipe.ingredients in line with `incoming` (dicts with name and
+    # quantity), keeping the order it was sent in. Existing rows are reused
+    # by name (see _match_rows), so only the real difference is inserted or
+    # deleted. Rows still in order keep their positions and moved or new
+    # ones take a position between their neighbours, so adding or moving
+    # one ingredient doesn't rewrite the rest. Returns True on change.
+    existing = sorted(recipe.ingredients, key=lambda ingredient: (ingredient.position, ingredient.id or 0))
+    items = [(item["name"], item.get("quantity") or "") for item in incoming]
+    matched, surplus = _match_rows(existing, items)
+
+    changed = False
+    for ingredient in surplus:
+        recipe.ingredients.remove(ingredient)
+        db.session.delete(ingredient)
+        changed = True
+
+    positions = [ingredient.position if ingredient is not None else None for ingredient in matched]
+    for (name, quantity), ingredient, position in zip(items, matched, _place(positions, _in_order(positions))):
+        if ingredient is None:
+            recipe.ingredients.append(Ingredient(name=name, quantity=quantity, position=position))
+            changed = True
+            continue
+        if (ingredient.name, ingredient.quantity, ingredient.position) != (name, quantity, position):
+            ingredient.name, ingredient.quantity, ingredient.position = name, quantity, position
+            # SQLite rewrites the whole row either way; writing every column
+            # lets all the changed rows share one executemany UPDATE
+            for column in _INGREDIENT_COLUMNS:
+                flag_modified(ingredient, column)
+            changed = True
+    # The documents and search index are built from the loaded collection
+    recipe.ingredients.sort(key=lambda ingredient: ingredient.position)
+    return changed
+
+
+def sync_categories(recipe, names):
+    # Add and remove only the category links that differ. Returns True on change.
+    names = list(dict.fromkeys(name.strip() for name in names if name and name.strip()))
+    current = {category.name: category for category in recipe.categories}
+
+    changed = False
+    for name, category in current.items():
+        if name not in names:
+            recipe.categories.remove(category)
+            changed = True
+    to_add = [name for name in names if name not in current]
+    if to_add:
+        recipe.categories.extend(get_or_create_categories(to_add))
+        changed = True
+    return changed
@@ -0,0 +1,145 @@
+import re
+
+from sqlalchemy import text
+
+from config import db
+from models import Recipe, Ingredient
+
+# Column weights for bm25(): a hit in the title counts far more than one
+# buried in the instructions
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 4.0
+INSTRUCTIONS_WEIGHT = 1.0
+INGREDIENTS_WEIGHT = 6.0
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_enabled():
+    return db.engine.dialect.name == "sqlite"
+
+
+def _instructions_text(instructions):
+    if not instructions:
+        return ""
+    if isinstance(instructions, str):
+        return instructions
+    return "\n".join(str(step) for step in instructions)
+
+
+def index_recipe(recipe):
+    # Replace the recipe's row in the FTS index. Runs inside the caller's
+    # transaction so the index commits (or rolls back) with the recipe.
+    if not fts_enabled():
+        return
+    db.session.flush()
+    ingredient_names = db.session.execute(
+        db.select(Ingredient.name).filter_by(recipe_id=recipe.id)
+    ).scalars().all()
+
+    db.session.execute(text("DELETE FROM recipes_fts WHERE rowid = :id"), {"id": recipe.id})
+    db.session.execute(
+        text(
+            "INSERT INTO recipes_fts (rowid, title, description, instructions, ingredients) "
+            "VALUES (:id, :title, :description, :instructions, :ingredients)"
+        ),
+        {
+            "id": recipe.id,
+            "title": recipe.title or "",
+            "description": recipe.description or "",
+            "instructions": _instructions_text(recipe.instructions),
+            "ingredients": "\n".join(ingredient_names),
+        },
+    )
+
+
+def index_recipes_bulk(documents):
+    # documents: dicts with id, title, description, instructions and a list
+    # of ingredient names, for recipes that are not indexed yet
+    if not fts_enabled() or not documents:
+        return
+    db.session.execute(
+        text(
+            "INSERT INTO recipes_fts (rowid, title, description, instructions, ingredients) "
+            "VALUES (:id, :title, :description, :instructions, :ingredients)"
+        ),
+        [
+            {
+                "id": document["id"],
+                "title": document["title"] or "",
+                "description": document["description"] or "",
+                "instructions": _instructions_text(document["instructions"]),
+                "ingredients": "\n".join(document["ingredients"]),
+            }
+            for document in documents
+        ],
+    )
+
+
+def unindex_recipe(recipe_id):
+    if not fts_enabled():
+        return
+    db.session.execute(text("DELETE FROM recipes_fts WHERE rowid = :id"), {"id": recipe_id})
+
+
+def rebuild_search_index():
+    # Repopulate the whole index from the base tables in one statement
+    if not fts_enabled():
+        return 0
+    db.session.execute(text("DELETE FROM recipes_fts"))
+    result = db.session.execute(text(
+        "INSERT INTO recipes_fts (rowid, title, description, instructions, ingredients) "
+        "SELECT r.id, r.title, COALESCE(r.description, ''), "
+        "       COALESCE((SELECT group_concat(j.value, char(10)) FROM json_each(r.instructions) j), ''), "
+        "       COALESCE((SELECT group_concat(i.name, char(10)) FROM ingredients i WHERE i.recipe_id = r.id), '') "
+        "FROM recipes r"
+    ))
+    db.session.commit()
+    return result.rowcount
+
+
+def build_match_query(q):
+    # Quote every token so user input can't inject FTS operators, and make the
+    # last one a prefix match for search-as-you-type
+    tokens = TOKEN_PATTERN.findall(q or "")
+    if not tokens:
+        return None
+    terms = ['"{}"'.format(token) for token in tokens]
+    terms[-1] += "*"
+    return " ".join(terms)
+
+
+def search_recipe_ids(q, limit, offset=0):
+    # Returns (ids ranked best first, whether more matches exist)
+    match = build_match_query(q)
+    if match is None:
+        return [], False
+
+    if fts_enabled():
+        rows = db.session.execute(
+            text(
+                "SELECT rowid FROM recipes_fts WHERE recipes_fts MATCH :match "
+                "ORDER BY bm25(recipes_fts, :w_title, :w_description, :w_instructions, :w_ingredients), rowid "
+                "LIMIT :limit OFFSET :offset"
+            ),
+            {
+                "match": match,
+                "w_title": TITLE_WEIGHT,
+                "w_description": DESCRIPTION_WEIGHT,
+                "w_instructions": INSTRUCTIONS_WEIGHT,
+                "w_ingredients": INGREDIENTS_WEIGHT,
+                "limit": limit + 1,
+                "offset": offset,
+            },
+        ).scalars().all()
+    else:
+        # No FTS5 outside SQLite; fall back to a plain title match
+        rows = db.session.execute(
+            db.select(Recipe.id)
+            .filter(Recipe.title.ilike(f"%{q.strip()}%"))
+            .order_by(Recipe.id)
+            .limit(limit + 1)
+            .offset(offset)
+        ).scalars().all()
+
+    return rows[:limit], len(rows) > limit
@@ -1,17 +1,14 @@
 #!/usr/bin/env python3
 
 from app import app
-from models import db, Recipe, Ingredient, Category
+from maintenance import delete_recipes_in_range
 
 def delete_recipes_by_id_range(start_id, end_id):
     with app.app_context():
-        # Delete recipes with IDs from start_id to end_id
-        recipes_to_delete = Recipe.query.filter(Recipe.id.between(start_id, end_id)).all()
-        for recipe in recipes_to_delete:
-            db.session.delete(recipe)
-        
-        db.session.commit()  # Commit the deletion
-        print(f"Deleted recipes with IDs between {start_id} and {end_id}.")
+        # Set-based delete; ingredients and category links go with the
+        # recipes through ON DELETE CASCADE
+        count = delete_recipes_in_range(start_id, end_id)
+        print(f"Deleted {count} recipes with IDs between {start_id} and {end_id}.")
 
 if __name__ == '__main__':
     delete_recipes_by_id_range(3, 10)
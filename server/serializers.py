@@ -0,0 +1,155 @@
+import datetime
+import decimal
+import json
+import uuid
+
+from flask import Response, request
+from flask.json.provider import DefaultJSONProvider, JSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional; the stdlib encoder is the fallback
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional; without it only JSON is offered
+    msgpack = None
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+MSGPACK_MIMETYPES = (MSGPACK_MIMETYPE, "application/x-msgpack")
+
+
+# Per-model encoders. Each reads its attributes directly instead of walking
+# serialize_rules the way SerializerMixin.to_dict() does, and every endpoint
+# that returns the model goes through the same one.
+
+def encode_ingredient(ingredient):
+    return {
+        "name": ingredient.name,
+        "quantity": ingredient.quantity,
+        "amount": ingredient.amount,
+        "amount_max": ingredient.amount_max,
+        "unit": ingredient.unit,
+        "note": ingredient.note,
+    }
+
+
+def encode_recipe(recipe):
+    return {
+        "id": recipe.id,
+        "title": recipe.title,
+        "description": recipe.description,
+        "instructions": recipe.instructions,
+        "servings": recipe.servings,
+        "ingredients": [encode_ingredient(ingredient) for ingredient in recipe.ingredients],
+        "categories": [category.name for category in recipe.categories],
+    }
+
+
+def encode_category(category):
+    return {"id": category.id, "name": category.name}
+
+
+def encode_parse_job(job, recipe=None):
+    return {
+        "id": job.id,
+        "url": job.url,
+        "status": job.status,
+        "error": job.error,
+        "recipe": encode_recipe(recipe) if recipe is not None else None,
+    }
+
+
+# Wire formats
+
+def _default(value):
+    # Types neither orjson nor msgpack handle natively
+    if isinstance(value, decimal.Decimal):
+        return str(value)
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (set, frozenset)):
+        return list(value)
+    if hasattr(value, "__html__"):
+        return str(value.__html__())
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def dumps_json(value):
+    # Compact JSON as bytes
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(",", ":")).encode()
+
+
+def loads_json(body):
+    if orjson is not None:
+        return orjson.loads(body)
+    return json.loads(body)
+
+
+def join_json(bodies):
+    # A JSON array built from already encoded values
+    return b"[" + b",".join(bodies) + b"]"
+
+
+def dumps_msgpack(value):
+    return msgpack.packb(value, default=_default, use_bin_type=True)
+
+
+class FastJSONProvider(JSONProvider):
+    # Flask JSON provider backed by orjson, so jsonify() everywhere is compact
+    # and fast
+    mimetype = JSON_MIMETYPE
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(orjson.dumps(obj, default=_default), mimetype=self.mimetype)
+
+
+def make_json_provider(app):
+    if orjson is not None:
+        return FastJSONProvider(app)
+    provider = DefaultJSONProvider(app)
+    provider.compact = True
+    return provider
+
+
+def offered_mimetypes():
+    return (JSON_MIMETYPE,) + (MSGPACK_MIMETYPES if msgpack is not None else ())
+
+
+def negotiate():
+    # JSON unless the client asks for MessagePack and it is available
+    best = request.accept_mimetypes.best_match(offered_mimetypes(), default=JSON_MIMETYPE)
+    return MSGPACK_MIMETYPE if best in MSGPACK_MIMETYPES else JSON_MIMETYPE
+
+
+def render(value, status=200, headers=None):
+    # Response in the format the client negotiated via Accept
+    mimetype = negotiate()
+    body = dumps_msgpack(value) if mimetype == MSGPACK_MIMETYPE else dumps_json(value)
+    response = Response(body, status=status, mimetype=mimetype, headers=headers)
+    response.vary.add("Accept")
+    return response
+
+
+def render_encoded(body, status=200, headers=None):
+    # render() for a value that is already JSON bytes: sent as it is, or
+    # decoded and packed for MessagePack clients
+    mimetype = negotiate()
+    if mimetype == MSGPACK_MIMETYPE:
+        body = dumps_msgpack(loads_json(body))
+    response = Response(body, status=status, mimetype=mimetype, headers=headers)
+    response.vary.add("Accept")
+    return response
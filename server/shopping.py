@@ -0,0 +1,122 @@
+from collections import Counter
+
+from config import db
+from models import Recipe, Ingredient
+from pantry import normalize_tokens
+from quantities import UNITS, TARGET_UNITS, format_quantity, pick_unit
+
+try:
+    import numpy as np
+except ImportError:  # numpy is optional; totals fall back to plain Python
+    np = None
+
+
+def ingredient_key(name):
+    # "2 large ripe Tomatoes" and "tomato" land on the same line
+    tokens = normalize_tokens(name)
+    return " ".join(tokens) if tokens else (name or "").strip().lower()
+
+
+def load_ingredients(recipe_ids):
+    # Every ingredient of every recipe in one query; a recipe without
+    # ingredients still gives a row, so missing ids can be told apart
+    return db.session.execute(
+        db.select(Recipe.id, Ingredient.name, Ingredient.quantity, Ingredient.amount, Ingredient.amount_max, Ingredient.unit)
+        .outerjoin(Ingredient, Ingredient.recipe_id == Recipe.id)
+        .where(Recipe.id.in_(recipe_ids))
+        .order_by(Recipe.id, Ingredient.position, Ingredient.id)
+    ).all()
+
+
+def _sum_by_group(groups, values, size):
+    if np is not None:
+        return np.bincount(np.asarray(groups, dtype=np.intp), weights=np.asarray(values, dtype=np.float64), minlength=size).tolist()
+    totals = [0.0] * size
+    for group, value in zip(groups, values):
+        totals[group] += value
+    return totals
+
+
+def _display_unit(units, total, system):
+    # The unit a group's total (in ml or g for measured units) is shown in
+    if len(units) == 1:
+        unit = next(iter(units))
+        spec = UNITS[unit]
+        if not system or spec.system in (None, system):
+            return unit
+    else:
+        spec = UNITS[next(iter(units))]
+        # Mixed units: the system asked for, or the one the recipes used
+        system = system or ("us" if all(UNITS[unit].system in (None, "us") for unit in units) else "metric")
+    return pick_unit(TARGET_UNITS[system][spec.dimension], total)
+
+
+def build_shopping_list(recipe_ids, system=None):
+    # Merge the ingredients of `recipe_ids` into one list: lines with the
+    # same normalized name and a compatible unit are added up. Volumes and
+    # masses are summed in ml and g, so "1 cup" and "200 ml" of milk make
+    # one line. A recipe listed twice counts twice.
+    servings = Counter(recipe_ids)
+    rows = load_ingredients(list(servings))
+
+    found = set()
+    name_keys = {}  # The same names come up across recipes; normalize each once
+    index = {}  # (name key, unit key) -> group
+    groups, lows, highs = [], [], []
+    members = []  # Per group: names, units, recipe ids and unmeasured quantities
+    for recipe_id, name, quantity, amount, amount_max, unit in rows:
+        found.add(recipe_id)
+        if name is None:
+            continue
+        spec = UNITS.get(unit)
+        measured = amount is not None
+        # Unmeasured lines ("to taste", "") are listed once per ingredient
+        unit_key = (spec.dimension if spec and spec.dimension else unit or "") if measured else None
+        name_key = name_keys.get(name)
+        if name_key is None:
+            name_key = name_keys[name] = ingredient_key(name)
+        key = (name_key, unit_key)
+        group = index.get(key)
+        if group is None:
+            group = index[key] = len(members)
+            members.append({"names": Counter(), "units": set(), "recipe_ids": set(), "quantities": [], "key": key})
+        member = members[group]
+        member["names"][name] += 1
+        member["recipe_ids"].add(recipe_id)
+        if not measured:
+            if quantity and quantity not in member["quantities"]:
+                member["quantities"].append(quantity)
+            continue
+        member["units"].add(unit)
+        to_base = spec.to_base if spec and spec.dimension else 1.0
+        groups.append(group)
+        lows.append(amount * to_base * servings[recipe_id])
+        highs.append((amount_max if amount_max is not None else amount) * to_base * servings[recipe_id])
+
+    low_totals = _sum_by_group(groups, lows, len(members))
+    high_totals = _sum_by_group(groups, highs, len(members))
+
+    items = []
+    for group, member in sorted(enumerate(members), key=lambda pair: (pair[1]["key"][0], pair[1]["key"][1] or "")):
+        name = member["names"].most_common(1)[0][0]
+        item = {"name": name, "quantity": ", ".join(member["quantities"]), "amount": None, "amount_max": None, "unit": None}
+        if member["key"][1] is not None:
+            low, high = low_totals[group], high_totals[group]
+            unit = next(iter(member["units"])) if len(member["units"]) == 1 else None
+            if member["key"][1] in ("volume", "mass"):
+                unit = _display_unit(member["units"], low, system)
+                low, high = low / UNITS[unit].to_base, high / UNITS[unit].to_base
+            amount = round(low, 3)
+            amount_max = round(high, 3) if round(high, 3) != amount else None
+            item.update(
+                amount=amount, amount_max=amount_max, unit=unit,
+                quantity=format_quantity(amount, amount_max, unit, None),
+            )
+        item["recipe_ids"] = sorted(member["recipe_ids"])
+        items.append(item)
+
+    return {
+        "items": items,
+        "recipe_ids": [recipe_id for recipe_id in servings if recipe_id in found],
+        "missing": [recipe_id for recipe_id in servings if recipe_id not in found],
+    }
@@ -0,0 +1,518 @@
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from flask import current_app
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from config import app, db
+from models import Recipe, association_table, ingredient_postings, recipe_similarities, similar_refresh_queue
+
+try:
+    import numpy as np
+    from scipy import sparse
+except ImportError:  # numpy/scipy are optional; without them neighbour lists aren't computed
+    np = None
+    sparse = None
+
+# Dense score cells per matrix product, which bounds memory on big catalogs
+BATCH_CELLS = 1 << 24
+INSERT_BATCH_SIZE = 10000
+REFRESH_BATCH_SIZE = 500
+# Niceness added to the background refresh worker
+REFRESH_NICENESS = 10
+
+
+def similarity_available():
+    return np is not None
+
+
+def load_features(recipe_ids=None):
+    # {recipe_id: set of features}. Features are the normalized ingredient
+    # tokens from the pantry index plus the recipe's categories.
+    recipes = db.select(Recipe.id)
+    tokens = db.select(ingredient_postings.c.recipe_id, ingredient_postings.c.token).distinct()
+    links = db.select(association_table.c.recipe_id, association_table.c.category_id)
+    if recipe_ids is not None:
+        recipes = recipes.where(Recipe.id.in_(recipe_ids))
+        tokens = tokens.where(ingredient_postings.c.recipe_id.in_(recipe_ids))
+        links = links.where(association_table.c.recipe_id.in_(recipe_ids))
+
+    features = {recipe_id: set() for recipe_id in db.session.execute(recipes).scalars()}
+    for recipe_id, token in db.session.execute(tokens):
+        if recipe_id in features:
+            features[recipe_id].add(f"i:{token}")
+    for recipe_id, category_id in db.session.execute(links):
+        if recipe_id in features:
+            features[recipe_id].add(f"c:{category_id}")
+    return features
+
+
+class SimilarityModel:
+    # L2-normalized TF-IDF rows, one per recipe, so a sparse product of rows
+    # gives cosine similarities. The vocabulary and IDF weights are fixed
+    # when the model is fitted; features first seen later are ignored until
+    # the model is refitted.
+
+    def __init__(self, features, top_k):
+        self.top_k = top_k
+        self.ids = np.array(sorted(features), dtype=np.int64)
+        self.rows = {int(recipe_id): row for row, recipe_id in enumerate(self.ids)}
+        self.vocabulary = {}
+        for feature_set in features.values():
+            for feature in feature_set:
+                self.vocabulary.setdefault(feature, len(self.vocabulary))
+
+        binary = self._binary([features[recipe_id] for recipe_id in self.rows])
+        document_frequency = np.bincount(binary.indices, minlength=len(self.vocabulary))
+        self.idf = (np.log((1 + len(self.ids)) / (1 + document_frequency)) + 1).astype(np.float32)
+        self.matrix = self._weight(binary)
+        # Score of each recipe's k-th neighbour; 0 while its list has room
+        self.kth = np.zeros(len(self.ids), dtype=np.float32)
+
+    def _binary(self, feature_sets):
+        indptr = [0]
+        indices = []
+        for feature_set in feature_sets:
+            indices.extend(sorted(self.vocabulary[feature] for feature in feature_set if feature in self.vocabulary))
+            indptr.append(len(indices))
+        data = np.ones(len(indices), dtype=np.float32)
+        return sparse.csr_matrix((data, indices, indptr), shape=(len(feature_sets), len(self.vocabulary)))
+
+    def _weight(self, binary):
+        weighted = binary.multiply(self.idf[np.newaxis, :]).tocsr()
+        norms = np.sqrt(np.asarray(weighted.multiply(weighted).sum(axis=1)).ravel())
+        norms[norms == 0] = 1
+        return sparse.csr_matrix(sparse.diags((1 / norms).astype(np.float32)) @ weighted, dtype=np.float32)
+
+    def knows(self, feature_sets):
+        return all(feature in self.vocabulary for feature_set in feature_sets for feature in feature_set)
+
+    def vectors(self, feature_sets):
+        return self._weight(self._binary(feature_sets))
+
+    def _batch_rows(self):
+        return max(1, BATCH_CELLS // max(1, *self.matrix.shape))
+
+    def neighbours(self, recipe_ids):
+        # [(recipe_id, [(similar_id, score), ...])], best first
+        results = []
+        rows = [self.rows[recipe_id] for recipe_id in recipe_ids]
+        step = self._batch_rows()
+        for start in range(0, len(rows), step):
+            batch = rows[start:start + step]
+            # Scores come out nearly dense, so multiply by a dense block: far
+            # cheaper than building a sparse product and densifying it
+            scores = np.ascontiguousarray((self.matrix @ self.matrix[batch].T.toarray()).T)
+            scores[np.arange(len(batch)), batch] = 0  # Not its own neighbour
+            k = min(self.top_k, scores.shape[1])
+            if k == 0:
+                results.extend((int(self.ids[row]), []) for row in batch)
+                continue
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            for offset, row in enumerate(batch):
+                best = top[offset][np.argsort(-scores[offset, top[offset]], kind="stable")]
+                results.append((int(self.ids[row]), [
+                    (int(self.ids[column]), float(scores[offset, column]))
+                    for column in best if scores[offset, column] > 0
+                ]))
+        return results
+
+    def rows_gaining(self, vectors):
+        # Rows for which one of `vectors` scores above their k-th neighbour
+        gaining = np.zeros(self.matrix.shape[0], dtype=bool)
+        step = self._batch_rows()
+        for start in range(0, vectors.shape[0], step):
+            best = (self.matrix @ vectors[start:start + step].T.toarray()).max(axis=1)
+            gaining |= (best > self.kth) & (best > 0)
+        return [int(self.ids[row]) for row in np.flatnonzero(gaining) if self.rows.get(int(self.ids[row])) == row]
+
+    def scores(self, recipe_ids, vectors):
+        # Dense scores of each of `recipe_ids` against each of `vectors`
+        return (self.matrix[[self.rows[recipe_id] for recipe_id in recipe_ids]] @ vectors.T).toarray()
+
+    def _zero_rows(self, rows):
+        if rows:
+            mask = np.ones(self.matrix.shape[0], dtype=np.float32)
+            mask[rows] = 0
+            self.matrix = sparse.csr_matrix(sparse.diags(mask) @ self.matrix)
+            self.matrix.eliminate_zeros()
+
+    def set_rows(self, recipe_ids, vectors):
+        # Rewritten recipes get fresh rows at the end; their old rows are
+        # zeroed so they never score again
+        self._zero_rows([self.rows[recipe_id] for recipe_id in recipe_ids if recipe_id in self.rows])
+        first = self.matrix.shape[0]
+        self.matrix = sparse.csr_matrix(sparse.vstack([self.matrix, vectors]))
+        self.ids = np.concatenate([self.ids, np.array(recipe_ids, dtype=np.int64)])
+        self.kth = np.concatenate([self.kth, np.zeros(len(recipe_ids), dtype=np.float32)])
+        for offset, recipe_id in enumerate(recipe_ids):
+            self.rows[recipe_id] = first + offset
+
+    def remove(self, recipe_id):
+        row = self.rows.pop(recipe_id, None)
+        if row is not None:
+            self._zero_rows([row])
+
+
+def _fit_model():
+    model = SimilarityModel(load_features(), current_app.config["SIMILAR_TOP_K"])
+    # Pick up where the stored lists left off
+    full = db.session.execute(
+        db.select(recipe_similarities.c.recipe_id, db.func.min(recipe_similarities.c.score))
+        .group_by(recipe_similarities.c.recipe_id)
+        .having(db.func.count() >= model.top_k)
+    ).all()
+    for recipe_id, score in full:
+        if recipe_id in model.rows:
+            model.kth[model.rows[recipe_id]] = score
+    return model
+
+
+def _compute(model, recipe_ids, check_existing=True):
+    # New neighbour lists for `recipe_ids`, as rows for recipe_similarities.
+    # Only reads, so callers can do this before taking the write lock.
+    rows = []
+    recipe_ids = [recipe_id for recipe_id in recipe_ids if recipe_id in model.rows]
+    while recipe_ids:
+        results = model.neighbours(recipe_ids)
+        recipe_ids = []
+        if check_existing:
+            # Recipes deleted since the model was fitted may still be in it,
+            # both as neighbours and among `recipe_ids`. They are dropped
+            # from the model, and lists that had them go round again.
+            candidates = {recipe_id for recipe_id, _ in results}
+            candidates.update(similar_id for _, similar in results for similar_id, _ in similar)
+            existing = set()
+            candidate_list = sorted(candidates)
+            for start in range(0, len(candidate_list), INSERT_BATCH_SIZE):
+                existing.update(db.session.execute(
+                    db.select(Recipe.id).where(Recipe.id.in_(candidate_list[start:start + INSERT_BATCH_SIZE]))
+                ).scalars())
+            gone = candidates - existing
+            for recipe_id in gone:
+                model.remove(recipe_id)
+            recipe_ids = [
+                recipe_id for recipe_id, similar in results
+                if recipe_id in existing and any(similar_id in gone for similar_id, _ in similar)
+            ]
+            results = [
+                (recipe_id, similar) for recipe_id, similar in results
+                if recipe_id in existing and recipe_id not in recipe_ids
+            ]
+
+        for recipe_id, similar in results:
+            model.kth[model.rows[recipe_id]] = similar[-1][1] if len(similar) >= model.top_k else 0
+            rows.extend({"recipe_id": recipe_id, "similar_id": similar_id, "score": score} for similar_id, score in similar)
+    return rows
+
+
+def _stored(recipe_ids):
+    # {recipe_id: {similar_id: score}} for the stored lists of `recipe_ids`
+    recipe_ids = sorted(recipe_ids)
+    stored = {recipe_id: {} for recipe_id in recipe_ids}
+    for start in range(0, len(recipe_ids), INSERT_BATCH_SIZE):
+        chunk = recipe_ids[start:start + INSERT_BATCH_SIZE]
+        for recipe_id, similar_id, score in db.session.execute(
+            db.select(recipe_similarities).where(recipe_similarities.c.recipe_id.in_(chunk))
+        ):
+            stored[recipe_id][similar_id] = score
+    return stored
+
+
+def _merge(model, stored, recipe_ids, changed_ids, scores):
+    # Fold the new scores of `changed_ids` (columns of `scores`, one row per
+    # recipe in `recipe_ids`) into those recipes' stored lists, which saves
+    # scoring them against the whole catalog. Anything not in a list scores
+    # at most its k-th neighbour, so this is exact unless a full list loses
+    # a neighbour; those come back to be recomputed.
+    # Returns the rows of the merged lists, and the ids to recompute.
+    rows, recompute = [], []
+    for offset, recipe_id in enumerate(recipe_ids):
+        kth = model.kth[model.rows[recipe_id]]
+        similar = dict(stored[recipe_id])
+        # A list that was full and is now short lost a deleted neighbour
+        full = kth > 0
+        if full and len(similar) < model.top_k:
+            recompute.append(recipe_id)
+            continue
+        for column, changed_id in enumerate(changed_ids):
+            score = float(scores[offset, column])
+            if changed_id in similar:
+                if full and score < kth:
+                    break
+                if score > 0:
+                    similar[changed_id] = score
+                else:
+                    del similar[changed_id]
+            elif score > kth and score > 0:
+                similar[changed_id] = score
+        else:
+            best = sorted(similar.items(), key=lambda pair: -pair[1])[:model.top_k]
+            model.kth[model.rows[recipe_id]] = best[-1][1] if len(best) >= model.top_k else 0
+            rows.extend({"recipe_id": recipe_id, "similar_id": similar_id, "score": score} for similar_id, score in best)
+            continue
+        recompute.append(recipe_id)
+    return rows, recompute
+
+
+def _write(rows, stored=None):
+    # Store `rows`, replacing the lists in `stored` (from _stored). Only the
+    # pairs that were added, dropped or rescored are written; most
+    # refreshed lists gain one neighbour and lose another.
+    if stored:
+        wanted = {(row["recipe_id"], row["similar_id"]): row for row in rows}
+        old = {
+            (recipe_id, similar_id): score
+            for recipe_id, similar in stored.items() for similar_id, score in similar.items()
+        }
+        dropped = [{"b_recipe_id": recipe_id, "b_similar_id": similar_id} for recipe_id, similar_id in old.keys() - wanted.keys()]
+        rescored = [
+            {"b_recipe_id": row["recipe_id"], "b_similar_id": row["similar_id"], "b_score": row["score"]}
+            for key, row in wanted.items() if key in old and old[key] != row["score"]
+        ]
+        rows = [row for key, row in wanted.items() if key not in old]
+        pair = (
+            (recipe_similarities.c.recipe_id == db.bindparam("b_recipe_id"))
+            & (recipe_similarities.c.similar_id == db.bindparam("b_similar_id"))
+        )
+        if dropped:
+            db.session.execute(recipe_similarities.delete().where(pair), dropped)
+        if rescored:
+            db.session.execute(recipe_similarities.update().where(pair).values(score=db.bindparam("b_score")), rescored)
+    for start in range(0, len(rows), INSERT_BATCH_SIZE):
+        db.session.execute(recipe_similarities.insert(), rows[start:start + INSERT_BATCH_SIZE])
+
+
+def _holding(recipe_ids):
+    # Recipes whose stored lists include any of `recipe_ids`
+    return db.session.execute(
+        db.select(recipe_similarities.c.recipe_id).distinct().where(recipe_similarities.c.similar_id.in_(recipe_ids))
+    ).scalars().all()
+
+
+def queue_similar(recipe_ids):
+    # Queue recipes that were created or changed. Runs inside the caller's
+    # transaction; once it commits, the process's SimilarRefresher
+    # recomputes their lists. A no-op without numpy/scipy.
+    rows = [{"recipe_id": recipe_id} for recipe_id in recipe_ids]
+    if np is None or not rows:
+        return
+    db.session.execute(similar_refresh_queue.insert(), rows)
+    db.session.info["similar_queued"] = True
+
+
+def queue_similar_holders(recipe_id):
+    # Call before deleting a recipe: queues the recipes whose lists include
+    # it (its own list goes with the ON DELETE CASCADE)
+    if np is None:
+        return
+    db.session.execute(similar_refresh_queue.insert().from_select(
+        ["recipe_id"],
+        db.select(recipe_similarities.c.recipe_id)
+        .where(recipe_similarities.c.similar_id == recipe_id, recipe_similarities.c.recipe_id != recipe_id),
+    ))
+    db.session.info["similar_queued"] = True
+
+
+def _peek(batch_size):
+    # The first `batch_size` queue rows, as (id, recipe_id)
+    return db.session.execute(
+        db.select(similar_refresh_queue.c.id, similar_refresh_queue.c.recipe_id)
+        .order_by(similar_refresh_queue.c.id)
+        .limit(batch_size)
+    ).all()
+
+
+def _refresh(model, rows, features=None):
+    # Recompute the lists of the recipes in queue `rows`: theirs, the lists
+    # they were in, and the lists they now belong in. Everything is worked
+    # out first; the write lock is only taken for the final writes, which
+    # also take the rows off the queue (two processes taking the same rows
+    # only recompute them twice). `features` may hold the queued recipes'
+    # features, already loaded. Commits, and returns how many of the
+    # queued recipes still exist.
+    queued = sorted({row.recipe_id for row in rows})
+    if features is None:
+        features = load_features(queued)
+    recipe_ids = [recipe_id for recipe_id in queued if recipe_id in features]
+    for recipe_id in queued:
+        if recipe_id not in features:
+            model.remove(recipe_id)
+    stored, new_rows = {}, []
+    if recipe_ids:
+        vectors = model.vectors([features[recipe_id] for recipe_id in recipe_ids])
+        model.set_rows(recipe_ids, vectors)
+        others = (set(_holding(recipe_ids)) | set(model.rows_gaining(vectors))) - set(recipe_ids)
+        others = sorted(recipe_id for recipe_id in others if recipe_id in model.rows)
+        stored = _stored(recipe_ids + others)
+        new_rows, recompute = _merge(model, stored, others, recipe_ids, model.scores(others, vectors))
+        new_rows += _compute(model, recipe_ids + recompute)
+
+    db.session.execute(similar_refresh_queue.delete().where(similar_refresh_queue.c.id.in_([row.id for row in rows])))
+    _write(new_rows, stored)
+    db.session.commit()
+    return len(recipe_ids)
+
+
+def refresh_pending_similar(batch_size=REFRESH_BATCH_SIZE):
+    # Work through the whole queue with a freshly fitted model, one
+    # transaction per `batch_size` queue rows. Returns how many recipes
+    # were refreshed.
+    if np is None:
+        raise RuntimeError("numpy and scipy are needed to compute similar recipes")
+    if not _peek(1):
+        return 0
+    model = _fit_model()
+    refreshed = 0
+    while True:
+        rows = _peek(batch_size)
+        if not rows:
+            return refreshed
+        refreshed += _refresh(model, rows)
+
+
+def _start_refresh_pool():
+    # Spawned, so the worker doesn't inherit the server's threads or DB
+    # connections. It is niced before the refresh code (and numpy) is
+    # imported, so the server's requests come first on a busy machine.
+    return ProcessPoolExecutor(
+        1, mp_context=multiprocessing.get_context("spawn"),
+        initializer=getattr(os, "nice", None), initargs=(REFRESH_NICENESS,),
+    )
+
+
+# The refresh worker's model, kept between runs. Only ever set in the
+# worker process.
+_model = None
+_fitted_at = 0.0
+
+
+def _drain(settings):
+    # One refresher run, in the worker process: wait a moment so a burst of
+    # writes shares the run, then work through the queue
+    global _model, _fitted_at
+    app.config.update(settings)
+    time.sleep(settings["SIMILAR_REFRESH_DELAY"])
+    with app.app_context():
+        try:
+            while True:
+                rows = _peek(REFRESH_BATCH_SIZE)
+                if not rows:
+                    return
+                # Refit, before taking any write lock, when the model is
+                # old or the queued recipes have features it never saw
+                features = load_features(sorted({row.recipe_id for row in rows}))
+                if (_model is None
+                        or time.monotonic() - _fitted_at > settings["SIMILAR_MODEL_TTL"]
+                        or not _model.knows(features.values())):
+                    _model = _fit_model()
+                    _fitted_at = time.monotonic()
+                _refresh(_model, rows, features)
+        except Exception as e:
+            # Its rows may no longer match the database
+            db.session.rollback()
+            _model = None
+            print(f"Error: {e}")
+
+
+class SimilarRefresher:
+    # Drains similar_refresh_queue in a background worker process, one per
+    # server process, so lists are recomputed soon after a write commits
+    # without the request waiting on it. The worker runs at a lower
+    # priority and outside the server's GIL, so requests keep their share
+    # of the CPU. It keeps its model between runs and refits it once it is
+    # SIMILAR_MODEL_TTL seconds old or meets features it has never seen.
+
+    def __init__(self, app=None):
+        self.app = None
+        self._executor = None
+        self._pid = None
+        self._next = None
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        app.extensions["similar_refresher"] = self
+
+    def wake(self):
+        # Returns the run that will pick up everything committed so far, or
+        # None when refreshing is off
+        if self.app is None or np is None or not self.app.config["SIMILAR_REFRESH_ENABLED"]:
+            return None
+        settings = {key: value for key, value in self.app.config.items() if key.startswith("SIMILAR_")}
+        with self._lock:
+            if self._pid != os.getpid():
+                # A worker inherited through fork isn't ours; each server
+                # process starts its own
+                self._executor = _start_refresh_pool()
+                self._pid = os.getpid()
+                self._next = None
+            # A run that hasn't been handed to the worker yet will see this
+            # commit too
+            if self._next is None or self._next.running() or self._next.done():
+                try:
+                    self._next = self._executor.submit(_drain, settings)
+                except BrokenProcessPool:
+                    self._executor = _start_refresh_pool()
+                    self._next = self._executor.submit(_drain, settings)
+            return self._next
+
+    def wait(self, timeout=None):
+        # Block until everything queued so far has been processed
+        future = self.wake()
+        if future is not None:
+            future.result(timeout)
+
+
+similar_refresher = SimilarRefresher()
+
+
+@event.listens_for(Session, "after_commit")
+def _wake_refresher(session):
+    if session.info.pop("similar_queued", False):
+        # The write has already committed and its ids stay queued for the
+        # next wake, so a worker that fails to start mustn't fail the request
+        try:
+            similar_refresher.wake()
+        except Exception as e:
+            print(f"Error: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_queued(session):
+    session.info.pop("similar_queued", None)
+
+
+def rebuild_similar():
+    # Fit a fresh model on every recipe and recompute all neighbour lists.
+    # Returns the number of (recipe, neighbour) pairs stored.
+    if np is None:
+        raise RuntimeError("numpy and scipy are needed to compute similar recipes")
+    queued = db.session.execute(db.select(db.func.max(similar_refresh_queue.c.id))).scalar()
+    model = SimilarityModel(load_features(), current_app.config["SIMILAR_TOP_K"])
+    rows = _compute(model, [int(recipe_id) for recipe_id in model.ids], check_existing=False)
+    db.session.execute(recipe_similarities.delete())
+    if queued is not None:
+        # Whatever was queued before the fit is covered by it
+        db.session.execute(similar_refresh_queue.delete().where(similar_refresh_queue.c.id <= queued))
+    _write(rows)
+    count = db.session.execute(db.select(db.func.count()).select_from(recipe_similarities)).scalar()
+    db.session.commit()
+    return count
+
+
+def similar_recipe_ids(recipe_id, limit):
+    # Precomputed neighbours, most similar first
+    return db.session.execute(
+        db.select(recipe_similarities.c.similar_id)
+        .where(recipe_similarities.c.recipe_id == recipe_id)
+        .order_by(recipe_similarities.c.score.desc(), recipe_similarities.c.similar_id)
+        .limit(limit)
+    ).scalars().all()
@@ -0,0 +1,56 @@
+from flask import Response, stream_with_context
+
+from serializers import dumps_json
+
+NDJSON_MIMETYPE = "application/x-ndjson"
+# Rows fetched from the cursor per round trip
+STREAM_BATCH_SIZE = 500
+# Encoded bytes collected before a chunk is written out
+CHUNK_BYTES = 64 * 1024
+
+
+def wants_stream(request):
+    # ?stream=1 streams a JSON array; Accept: application/x-ndjson streams
+    # one object per line
+    if wants_ndjson(request):
+        return True
+    return request.args.get("stream", "").lower() in ("1", "true", "yes")
+
+
+def wants_ndjson(request):
+    return request.accept_mimetypes.best_match(["application/json", NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def stream_query(query, render, ndjson=False, batch_size=STREAM_BATCH_SIZE, encoded=False):
+    # Encode rows as they come off a server-side cursor; nothing but the
+    # current batch of rows and one output chunk is held in memory. With
+    # encoded=True, render returns JSON bytes itself.
+    def generate():
+        parts = [] if ndjson else [b"["]
+        size = 0
+        first = True
+        try:
+            for row in query.yield_per(batch_size):
+                piece = render(row) if encoded else dumps_json(render(row))
+                if ndjson:
+                    piece += b"\n"
+                elif not first:
+                    piece = b"," + piece
+                parts.append(piece)
+                size += len(piece)
+                # The first row goes out at once so clients see data straight away
+                if first or size >= CHUNK_BYTES:
+                    yield b"".join(parts)
+                    parts, size = [], 0
+                first = False
+        except Exception as e:
+            # Headers are already sent; the truncated body is all we can signal with
+            print(f"Error: {e}")
+            return
+        if not ndjson:
+            parts.append(b"]")
+        if parts:
+            yield b"".join(parts)
+
+    mimetype = NDJSON_MIMETYPE if ndjson else "application/json"
+    return Response(stream_with_context(generate()), mimetype=mimetype)
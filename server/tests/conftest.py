@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+# config.py reads these when it is imported, so set them first: a scratch
+# database per test run, no response cache between requests, and no wait
+# before background similar-recipe refreshes
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'test.db')}"
+os.environ["RESPONSE_CACHE_ENABLED"] = "0"
+os.environ["SIMILAR_REFRESH_DELAY"] = "0"
+
+
+@pytest.fixture(scope="session")
+def app():
+    from flask_migrate import upgrade
+
+    from app import app as flask_app
+
+    with flask_app.app_context():
+        upgrade(directory=os.path.join(SERVER_DIR, "migrations"))
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
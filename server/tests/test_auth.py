@@ -0,0 +1,18 @@
+import pytest
+
+
+@pytest.mark.parametrize("body", [
+    {"email": "cook@example.com", "password": 12345678},
+    {"email": "cook@example.com", "password": ["secret"]},
+    {"email": {"$ne": ""}, "password": "secret"},
+    {"email": "cook@example.com"},
+    ["cook@example.com", "secret"],
+])
+def test_login_rejects_malformed_credentials(client, body):
+    assert client.post("/login", json=body).status_code == 400
+
+
+@pytest.mark.parametrize("password", [12345678, None, ""])
+def test_register_rejects_malformed_password(client, password):
+    body = {"first_name": "Ada", "last_name": "Cook", "email": "ada@example.com", "password": password}
+    assert client.post("/register", json=body).status_code == 400
@@ -0,0 +1,49 @@
+import pytest
+
+import app as app_module
+from config import db
+from models import Recipe
+
+
+def fail_documents(recipe_ids):
+    raise RuntimeError("document store unavailable")
+
+
+def recipe_count():
+    return db.session.scalar(db.select(db.func.count()).select_from(Recipe))
+
+
+def test_create_recipe_failure_saves_nothing(app, client, monkeypatch):
+    with app.app_context():
+        before = recipe_count()
+    monkeypatch.setattr(app_module, "refresh_documents", fail_documents)
+
+    response = client.post("/recipes", data={
+        "title": "Half saved",
+        "instructions": "Cook",
+        "categories": "Soup",
+        "ingredients[0][name]": "Leek",
+        "ingredients[0][quantity]": "2",
+    })
+
+    assert response.status_code == 500
+    with app.app_context():
+        assert recipe_count() == before
+
+
+def test_save_parsed_recipe_failure_saves_nothing(app, monkeypatch):
+    monkeypatch.setattr(app_module, "refresh_documents", fail_documents)
+    recipe_data = {
+        "title": "Half parsed",
+        "description": "",
+        "instructions": ["Cook"],
+        "ingredients": [{"name": "Leek", "quantity": "2"}],
+        "categories": ["Soup"],
+    }
+
+    with app.app_context():
+        before = recipe_count()
+        with pytest.raises(RuntimeError):
+            app_module.save_parsed_recipe(recipe_data)
+        db.session.rollback()
+        assert recipe_count() == before
@@ -0,0 +1,123 @@
+import hashlib
+import itertools
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+import fetch_cache as fetch_cache_module
+from fetch_cache import FetchCache, OfflineCacheMiss
+
+
+class RecipeSite(BaseHTTPRequestHandler):
+    # Stand-in recipe site: serves self.server.pages (path -> body and
+    # validators) and answers conditional requests with 304
+
+    def do_GET(self):
+        page = self.server.pages[self.path]
+        self.server.requests.append((self.path, dict(self.headers)))
+        etag, last_modified = page.get("etag"), page.get("last_modified")
+        if (etag and self.headers.get("If-None-Match") == etag) or (
+            last_modified and self.headers.get("If-Modified-Since") == last_modified
+        ):
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        if etag:
+            self.send_header("ETag", etag)
+        if last_modified:
+            self.send_header("Last-Modified", last_modified)
+        self.send_header("Content-Length", str(len(page["body"])))
+        self.end_headers()
+        self.wfile.write(page["body"])
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RecipeSite)
+    server.pages = {}
+    server.requests = []
+    server.url = f"http://127.0.0.1:{server.server_port}"
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def session():
+    with requests.Session() as session:
+        yield session
+
+
+def test_etag_revalidation_serves_the_cached_body(tmp_path, site, session):
+    site.pages["/soup"] = {"body": b"<html>soup</html>", "etag": '"v1"'}
+    cache = FetchCache(str(tmp_path))
+
+    assert cache.fetch(f"{site.url}/soup", session) == b"<html>soup</html>"
+    assert cache.fetch(f"{site.url}/soup", session) == b"<html>soup</html>"
+
+    assert len(site.requests) == 2
+    assert site.requests[1][1].get("If-None-Match") == '"v1"'
+
+
+def test_last_modified_revalidation_serves_the_cached_body(tmp_path, site, session):
+    modified = "Tue, 15 Oct 2024 08:00:00 GMT"
+    site.pages["/stew"] = {"body": b"<html>stew</html>", "last_modified": modified}
+    cache = FetchCache(str(tmp_path))
+
+    cache.fetch(f"{site.url}/stew", session)
+    assert cache.fetch(f"{site.url}/stew", session) == b"<html>stew</html>"
+
+    assert site.requests[1][1].get("If-Modified-Since") == modified
+    assert "If-None-Match" not in site.requests[1][1]
+
+
+def test_changed_page_replaces_the_cached_body(tmp_path, site, session):
+    site.pages["/soup"] = {"body": b"old", "etag": '"v1"'}
+    cache = FetchCache(str(tmp_path))
+    cache.fetch(f"{site.url}/soup", session)
+
+    site.pages["/soup"] = {"body": b"new", "etag": '"v2"'}
+
+    assert cache.fetch(f"{site.url}/soup", session) == b"new"
+    assert cache.lookup(f"{site.url}/soup")["etag"] == '"v2"'
+
+
+def test_offline_mode_only_serves_cached_pages(tmp_path, site, session):
+    site.pages["/soup"] = {"body": b"<html>soup</html>", "etag": '"v1"'}
+    FetchCache(str(tmp_path)).fetch(f"{site.url}/soup", session)
+    offline = FetchCache(str(tmp_path), offline=True)
+
+    assert offline.fetch(f"{site.url}/soup", session) == b"<html>soup</html>"
+    with pytest.raises(OfflineCacheMiss):
+        offline.fetch(f"{site.url}/stew", session)
+    assert len(site.requests) == 1
+
+
+def test_evicts_least_recently_used_pages_by_size(tmp_path, site, session, monkeypatch):
+    # A clock that always moves forward, so access order is unambiguous
+    ticks = itertools.count()
+    monkeypatch.setattr(fetch_cache_module, "time", SimpleNamespace(time=lambda: next(ticks)))
+    for name in ("a", "b", "c"):
+        site.pages[f"/{name}"] = {"body": name.encode() * 100, "etag": f'"{name}"'}
+    cache = FetchCache(str(tmp_path), max_bytes=250)
+
+    cache.fetch(f"{site.url}/a", session)
+    cache.fetch(f"{site.url}/b", session)
+    cache.fetch(f"{site.url}/a", session)  # a 304 counts as a use
+    evicted_path = cache._object_path(hashlib.sha256(b"b" * 100).hexdigest())
+    cache.fetch(f"{site.url}/c", session)
+
+    assert cache.lookup(f"{site.url}/b") is None
+    assert not os.path.exists(evicted_path)
+    assert cache.lookup(f"{site.url}/a")["body"] == b"a" * 100
+    assert cache.lookup(f"{site.url}/c")["body"] == b"c" * 100
@@ -0,0 +1,28 @@
+from datetime import datetime, timedelta
+
+from config import db
+from jobs import UNFINISHED_ERROR, fail_unfinished_jobs
+from models import ParseJob
+
+
+def add_job(job_id, status, age=timedelta(0)):
+    db.session.add(ParseJob(id=job_id, url=f"https://example.com/{job_id}", status=status,
+                            updated_at=datetime.utcnow() - age))
+
+
+def test_fail_unfinished_jobs(app):
+    with app.app_context():
+        add_job("stale-running", "running", timedelta(hours=2))
+        add_job("stale-queued", "queued", timedelta(hours=2))
+        add_job("fresh-running", "running")
+        add_job("done", "succeeded", timedelta(hours=2))
+        db.session.commit()
+
+        assert fail_unfinished_jobs(older_than=3600) == 2
+        assert db.session.get(ParseJob, "stale-running").status == "failed"
+        assert db.session.get(ParseJob, "stale-queued").error == UNFINISHED_ERROR
+        assert db.session.get(ParseJob, "fresh-running").status == "running"
+
+        assert fail_unfinished_jobs() == 1
+        assert db.session.get(ParseJob, "fresh-running").status == "failed"
+        assert db.session.get(ParseJob, "done").status == "succeeded"
@@ -0,0 +1,17 @@
+import pytest
+
+from pantry import MAX_PANTRY_ITEMS
+
+
+@pytest.mark.parametrize("body", [
+    {"ingredients": ["leek"], "limit": 0},
+    {"ingredients": ["leek"], "limit": -1},
+    {"ingredients": [f"item {index}" for index in range(MAX_PANTRY_ITEMS + 1)]},
+])
+def test_what_can_i_cook_rejects_out_of_range_input(client, body):
+    assert client.post("/what-can-i-cook", json=body).status_code == 400
+
+
+def test_what_can_i_cook_accepts_a_full_pantry(client):
+    body = {"ingredients": [f"item {index}" for index in range(MAX_PANTRY_ITEMS)], "limit": 1}
+    assert client.post("/what-can-i-cook", json=body).status_code == 200
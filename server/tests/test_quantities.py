@@ -0,0 +1,36 @@
+import pytest
+
+from quantities import Quantity, parse_quantity
+
+
+@pytest.mark.parametrize("text, expected", [
+    # Thousands separators
+    ("1,500 g flour", Quantity(1500.0, None, "g", "flour")),
+    ("12,345 g", Quantity(12345.0, None, "g", None)),
+    ("1,000,000 ml", Quantity(1000000.0, None, "ml", None)),
+    ("1,000-1,500 g potatoes", Quantity(1000.0, 1500.0, "g", "potatoes")),
+    # Decimal commas and points
+    ("1,5 kg", Quantity(1.5, None, "kg", None)),
+    ("0,25 l milk", Quantity(0.25, None, "l", "milk")),
+    (".5 cup", Quantity(0.5, None, "cup", None)),
+    # Fractions
+    ("1/2 tsp salt", Quantity(0.5, None, "tsp", "salt")),
+    ("1 1/2 cups, sifted", Quantity(1.5, None, "cup", "sifted")),
+    ("1/0 cup", Quantity(None, None, None, "1/0 cup")),
+    # Unicode fractions
+    ("½ cup", Quantity(0.5, None, "cup", None)),
+    ("1½ cups", Quantity(1.5, None, "cup", None)),
+    ("2 ¾ oz", Quantity(2.75, None, "oz", None)),
+    ("1⁄4 tsp", Quantity(0.25, None, "tsp", None)),
+    # Ranges
+    ("2-3 tbsp", Quantity(2.0, 3.0, "tbsp", None)),
+    ("2 to 3 cloves garlic", Quantity(2.0, 3.0, "clove", "garlic")),
+    ("1–1½ lbs", Quantity(1.0, 1.5, "lb", None)),
+    # Articles, bare units and plain text
+    ("a pinch of salt", Quantity(1.0, None, "pinch", "salt")),
+    ("3 eggs", Quantity(3.0, None, None, "eggs")),
+    ("to taste", Quantity(None, None, None, "to taste")),
+    ("", Quantity(None, None, None, None)),
+])
+def test_parse_quantity(text, expected):
+    assert parse_quantity(text) == expected
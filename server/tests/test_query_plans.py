@@ -0,0 +1,72 @@
+from contextlib import contextmanager
+
+from sqlalchemy import event
+
+from categories import resolve_category_ids
+from config import db
+from pagination import encode_cursor
+from pantry import find_cookable_recipes
+
+# Plans are taken from the statements the app itself sends, so a change to
+# a query builder is checked against the indexes it relies on
+
+
+@contextmanager
+def captured_selects():
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith("SELECT"):
+            statements.append((statement, parameters))
+
+    event.listen(db.engine, "before_cursor_execute", capture)
+    try:
+        yield statements
+    finally:
+        event.remove(db.engine, "before_cursor_execute", capture)
+
+
+def query_plan(statement, parameters):
+    return [row[-1] for row in db.session.connection().exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+
+
+def scans_table(plan, *tables):
+    return any(step.startswith(f"SCAN {table}") for step in plan for table in tables)
+
+
+def test_category_lookup_uses_name_index(app):
+    with app.app_context():
+        with captured_selects() as statements:
+            resolve_category_ids(["Dinner", "Soup"])
+        plan = query_plan(*statements[0])
+        db.session.rollback()
+    assert any("INDEX ix_categories_name (name=?)" in step for step in plan), plan
+
+
+def test_pantry_match_seeks_tokens(app):
+    with app.app_context():
+        with captured_selects() as statements:
+            find_cookable_recipes(["chicken", "garlic clove"])
+        plan = query_plan(*statements[0])
+    # Each pantry item in the UNION seeks the postings primary key by token,
+    # and each recipe's ingredient count comes from the recipe_id index
+    assert sum("ingredient_postings USING COVERING INDEX" in step and "(token=?)" in step for step in plan) == 2, plan
+    assert any("INDEX ix_ingredients_recipe_id (recipe_id=?)" in step for step in plan), plan
+    assert not scans_table(plan, "ingredient_postings", "ingredients", "recipes"), plan
+
+
+def test_recipe_pages_seek_past_the_cursor(app, client):
+    with app.app_context():
+        with captured_selects() as statements:
+            client.get(f"/recipes?after={encode_cursor(0)}")
+        plan = query_plan(*statements[0])
+    assert "SEARCH recipes USING INTEGER PRIMARY KEY (rowid>?)" in plan, plan
+
+
+def test_category_pages_seek_past_the_cursor(app, client):
+    with app.app_context():
+        with captured_selects() as statements:
+            client.get(f"/recipes?category_id=1&after={encode_cursor(0)}")
+        plan = query_plan(*statements[0])
+    assert any("INDEX ix_recipe_category_category_id (category_id=? AND recipe_id>?)" in step for step in plan), plan
+    assert not scans_table(plan, "recipes", "recipe_category"), plan
@@ -0,0 +1,111 @@
+def ingredient_form(names, **fields):
+    form = dict(fields)
+    for index, name in enumerate(names):
+        form[f"ingredients[{index}][name]"] = name
+        form[f"ingredients[{index}][quantity]"] = "1"
+    return form
+
+
+def create_recipe(client, names):
+    response = client.post("/recipes", data=ingredient_form(names, title="Stew", instructions="Cook"))
+    assert response.status_code == 201
+    return response.get_json()["id"]
+
+
+def ingredient_names(client, recipe_id):
+    return [ingredient["name"] for ingredient in client.get(f"/recipes/{recipe_id}").get_json()["ingredients"]]
+
+
+def test_put_keeps_submitted_order_when_renaming_and_appending(client):
+    recipe_id = create_recipe(client, ["A", "B", "C"])
+
+    response = client.put(f"/recipes/{recipe_id}", data=ingredient_form(["B", "C", "X"]))
+
+    assert response.status_code == 200
+    assert [ingredient["name"] for ingredient in response.get_json()["ingredients"]] == ["B", "C", "X"]
+    assert ingredient_names(client, recipe_id) == ["B", "C", "X"]
+
+
+def test_put_that_only_reorders_is_saved(client):
+    recipe_id = create_recipe(client, ["A", "B", "C"])
+    client.put(f"/recipes/{recipe_id}", data=ingredient_form(["B", "C", "X"]))
+
+    response = client.put(f"/recipes/{recipe_id}", data=ingredient_form(["C", "B", "X"]))
+
+    assert response.status_code == 200
+    assert ingredient_names(client, recipe_id) == ["C", "B", "X"]
+
+
+def test_patch_keeps_submitted_order(client):
+    recipe_id = create_recipe(client, ["A", "B", "C", "D"])
+
+    response = client.patch(f"/recipes/{recipe_id}", json={"ingredients": [
+        {"name": "D", "quantity": "2"}, {"name": "A", "quantity": "1"}, {"name": "E", "quantity": "3"},
+    ]})
+
+    assert response.status_code == 200
+    assert ingredient_names(client, recipe_id) == ["D", "A", "E"]
+
+
+def test_typo_fix_keeps_ingredient_rows(app, client):
+    from config import db
+    from models import Ingredient
+
+    recipe_id = create_recipe(client, ["Onoin", "Garlic"])
+    with app.app_context():
+        before = db.session.execute(db.select(Ingredient.id).filter_by(recipe_id=recipe_id).order_by(Ingredient.id)).scalars().all()
+
+    client.put(f"/recipes/{recipe_id}", data=ingredient_form(["Onion", "Garlic"]))
+
+    with app.app_context():
+        after = db.session.execute(db.select(Ingredient.id).filter_by(recipe_id=recipe_id).order_by(Ingredient.id)).scalars().all()
+    assert after == before
+    assert ingredient_names(client, recipe_id) == ["Onion", "Garlic"]
+
+
+def ingredient_rows(app, recipe_id):
+    from config import db
+    from models import Ingredient
+
+    with app.app_context():
+        rows = db.session.execute(
+            db.select(Ingredient.name, Ingredient.id, Ingredient.position).filter_by(recipe_id=recipe_id)
+        ).all()
+    return {name: (ingredient_id, position) for name, ingredient_id, position in rows}
+
+
+def test_insert_at_the_top_leaves_other_rows_alone(app, client):
+    recipe_id = create_recipe(client, ["A", "B", "C", "D"])
+    before = ingredient_rows(app, recipe_id)
+
+    client.put(f"/recipes/{recipe_id}", data=ingredient_form(["X", "A", "B", "C", "D"]))
+
+    after = ingredient_rows(app, recipe_id)
+    assert {name: after[name] for name in before} == before
+    assert set(after) - set(before) == {"X"}
+    assert ingredient_names(client, recipe_id) == ["X", "A", "B", "C", "D"]
+
+
+def test_delete_and_move_only_touch_those_rows(app, client):
+    recipe_id = create_recipe(client, ["A", "B", "C", "D", "E"])
+    before = ingredient_rows(app, recipe_id)
+
+    client.put(f"/recipes/{recipe_id}", data=ingredient_form(["C", "B", "D", "E"]))
+
+    after = ingredient_rows(app, recipe_id)
+    assert "A" not in after
+    assert [name for name in after if after[name] != before[name]] == ["C"]
+    assert after["C"][0] == before["C"][0]
+    assert ingredient_names(client, recipe_id) == ["C", "B", "D", "E"]
+
+
+def test_matching_ignores_case_and_spacing(app, client):
+    recipe_id = create_recipe(client, ["Olive oil", "Salt"])
+    before = ingredient_rows(app, recipe_id)
+
+    client.put(f"/recipes/{recipe_id}", data=ingredient_form(["Pepper", "olive  oil", "Salt"]))
+
+    after = ingredient_rows(app, recipe_id)
+    assert after["olive  oil"] == before["Olive oil"]
+    assert after["Salt"] == before["Salt"]
+    assert ingredient_names(client, recipe_id) == ["Pepper", "olive  oil", "Salt"]
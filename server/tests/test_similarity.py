@@ -0,0 +1,76 @@
+import pytest
+
+from config import db
+from models import recipe_similarities, similar_refresh_queue
+from similarity import refresh_pending_similar, similar_refresher, similarity_available
+
+pytestmark = pytest.mark.skipif(not similarity_available(), reason="needs numpy and scipy")
+
+
+def create_recipe(client, title, names):
+    form = {"title": title, "instructions": "Cook", "categories": "Soup"}
+    for index, name in enumerate(names):
+        form[f"ingredients[{index}][name]"] = name
+        form[f"ingredients[{index}][quantity]"] = "1"
+    response = client.post("/recipes", data=form)
+    assert response.status_code == 201
+    return response.get_json()["id"]
+
+
+def queued_ids():
+    return set(db.session.execute(db.select(similar_refresh_queue.c.recipe_id)).scalars())
+
+
+def similar_ids(client, recipe_id):
+    return [recipe["id"] for recipe in client.get(f"/recipes/{recipe_id}/similar").get_json()]
+
+
+def test_writes_refresh_lists_in_the_background(app, client):
+    leek_soup = create_recipe(client, "Leek soup", ["leek", "potato", "stock"])
+    potato_soup = create_recipe(client, "Potato soup", ["potato", "leek", "cream"])
+
+    similar_refresher.wait(timeout=30)
+
+    with app.app_context():
+        assert queued_ids() == set()
+    assert potato_soup in similar_ids(client, leek_soup)
+    assert leek_soup in similar_ids(client, potato_soup)
+
+
+def test_deleting_a_recipe_refreshes_the_lists_it_was_in(app, client):
+    first = create_recipe(client, "Bean stew", ["bean", "tomato", "onion"])
+    second = create_recipe(client, "Bean chili", ["bean", "tomato", "chili"])
+    similar_refresher.wait(timeout=30)
+    assert second in similar_ids(client, first)
+
+    assert client.delete(f"/recipes/{second}").status_code == 200
+    similar_refresher.wait(timeout=30)
+
+    with app.app_context():
+        stored = db.session.execute(
+            db.select(recipe_similarities.c.similar_id).where(recipe_similarities.c.recipe_id == first)
+        ).scalars().all()
+    assert second not in stored
+
+
+def test_queue_can_be_drained_without_the_refresher(app, client, monkeypatch):
+    monkeypatch.setitem(app.config, "SIMILAR_REFRESH_ENABLED", False)
+    first = create_recipe(client, "Pea soup", ["pea", "mint", "stock"])
+    second = create_recipe(client, "Pea risotto", ["pea", "mint", "rice"])
+
+    with app.app_context():
+        assert {first, second} <= queued_ids()
+        assert refresh_pending_similar() >= 2
+        assert queued_ids() == set()
+    assert second in similar_ids(client, first)
+
+
+def test_write_succeeds_when_the_refresher_cannot_start(app, client, monkeypatch):
+    def fail():
+        raise OSError("cannot spawn")
+
+    monkeypatch.setattr(similar_refresher, "wake", fail)
+    first = create_recipe(client, "Corn soup", ["corn", "onion", "stock"])
+
+    with app.app_context():
+        assert first in queued_ids()